@@ -0,0 +1,179 @@
+"""
+Benchmark of the latency of the assistant: a new chat client per question with the answer shown once complete,
+as before, against the chat client of the `Model` reused with its connections and the answer streamed
+by `Model.rag_stream`.
+
+By default, questions are answered by a local stand-in of the OpenAI chat completions endpoint, which waits
+`--first-token-delay` seconds then streams `--nb-tokens` tokens every `--token-delay` seconds, and embeddings
+are computed offline by the hashing stand-in of `bench_retrieval`. With `--base-url`, questions are sent to
+another OpenAI compatible endpoint with the `OPENAI_API_KEY` environment variable.
+For each method, the time to first token, the total time and the number of opened connections are reported.
+
+Run from the repository root:
+    python -m benchmarks.bench_assistant_latency --nb-questions 20
+    python -m benchmarks.bench_assistant_latency --base-url https://api.openai.com/v1 --nb-questions 5
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain_openai import ChatOpenAI
+
+from benchmarks.bench_retrieval import HashingEmbeddings, make_questions
+from src.answer_cache import AnswerCache
+from src.embedding_cache import EmbeddingCache
+from src.model import Model
+
+
+class StandInChatServer(ThreadingHTTPServer):
+    """
+    A local stand-in of the OpenAI chat completions endpoint, answering every prompt with the same tokens.
+    """
+    def __init__(self, first_token_delay=0.3, token_delay=0.01, nb_tokens=100):
+        """
+        Args:
+            first_token_delay (float): Number of seconds before the first token.
+            token_delay (float): Number of seconds between two tokens.
+            nb_tokens (int): Number of tokens of each answer.
+        """
+        super().__init__(("127.0.0.1", 0), StandInChatHandler)
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.nb_tokens = nb_tokens
+        self.nb_connections = 0
+        self.lock = threading.Lock()
+
+    def get_base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+
+class StandInChatHandler(BaseHTTPRequestHandler):
+    # keeps connections open between requests, like the OpenAI API
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.nb_connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _make_chunk(self, request, delta, finish_reason=None):
+        return {'id': "chatcmpl-stand-in", 'object': "chat.completion.chunk", 'created': int(time.time()),
+                'model': request['model'], 'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]}
+
+    def _write_chunked(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        tokens = [f"token{i} " for i in range(self.server.nb_tokens)]
+        time.sleep(self.server.first_token_delay)
+
+        if not request.get('stream', False):
+            time.sleep(self.server.token_delay * (len(tokens) - 1))
+            body = json.dumps({
+                'id': "chatcmpl-stand-in", 'object': "chat.completion", 'created': int(time.time()),
+                'model': request['model'],
+                'choices': [{'index': 0, 'message': {'role': "assistant", 'content': "".join(tokens)},
+                             'finish_reason': "stop"}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': len(tokens), 'total_tokens': len(tokens)},
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', "application/json")
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', "text/event-stream")
+        self.send_header('Transfer-Encoding', "chunked")
+        self.end_headers()
+        try:
+            self._write_chunked(f"data: {json.dumps(self._make_chunk(request, {'role': 'assistant'}))}\n\n".encode())
+            for i, token in enumerate(tokens):
+                if i > 0:
+                    time.sleep(self.server.token_delay)
+                self._write_chunked(f"data: {json.dumps(self._make_chunk(request, {'content': token}))}\n\n".encode())
+            self._write_chunked(f"data: {json.dumps(self._make_chunk(request, {}, 'stop'))}\n\n".encode())
+            self._write_chunked(b"data: [DONE]\n\n")
+            self._write_chunked(b"")
+        except (BrokenPipeError, ConnectionResetError):
+            # the client stopped reading the stream
+            self.close_connection = True
+
+
+def summarize(method, measures, nb_connections):
+    return {
+        'method': method, 'count': len(measures), 'connections': nb_connections,
+        'p50_first_token_ms': round(statistics.median(m['first_token'] for m in measures) * 1000, 1),
+        'p50_total_ms': round(statistics.median(m['total'] for m in measures) * 1000, 1),
+        'max_first_token_ms': round(max(m['first_token'] for m in measures) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--base-url', help="OpenAI compatible endpoint, a local stand-in by default")
+    parser.add_argument('--llm-model', default="gpt-4.1-mini")
+    parser.add_argument('--nb-questions', type=int, default=20)
+    parser.add_argument('--first-token-delay', type=float, default=0.3, help="seconds, of the stand-in")
+    parser.add_argument('--token-delay', type=float, default=0.01, help="seconds, of the stand-in")
+    parser.add_argument('--nb-tokens', type=int, default=100, help="tokens per answer, of the stand-in")
+    parser.add_argument('--data-dir', default="src/data")
+    args = parser.parse_args()
+
+    server = None
+    base_url, api_key = args.base_url, os.environ.get("OPENAI_API_KEY")
+    if base_url is None:
+        server = StandInChatServer(args.first_token_delay, args.token_delay, args.nb_tokens)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url, api_key = server.get_base_url(), "stand-in"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model = Model(
+            api_key=api_key, llm_model=args.llm_model, base_url=base_url, embeddings=HashingEmbeddings(),
+            index_dir=os.path.join(tmp_dir, "faiss"), embedding_cache=EmbeddingCache(os.path.join(tmp_dir, "e.sqlite")))
+        chunks = model.prepare_csv(args.data_dir)
+        db_faiss = model.create_database(chunks)
+        questions = [question for kind, question, needed in make_questions(chunks, args.nb_questions)]
+        questions = questions[:args.nb_questions]
+
+        shared_llm = model.get_llm()
+        for method in ['client_per_call', 'shared_client_stream']:
+            # answers are never served from the cache, every question reaches the chat endpoint
+            model.answer_cache = AnswerCache(db_path=None)
+            nb_connections = None if server is None else server.nb_connections
+            measures = []
+            for question in questions:
+                start = time.perf_counter()
+                match method:
+                    case 'client_per_call':
+                        model.llm = ChatOpenAI(openai_api_key=api_key, model=args.llm_model,
+                                               temperature=model.temperature, base_url=base_url)
+                        model.rag(db_faiss, question)
+                        # the answer was only shown once complete
+                        total = time.perf_counter() - start
+                        measures.append({'first_token': total, 'total': total})
+                    case 'shared_client_stream':
+                        model.llm = shared_llm
+                        for piece in model.rag_stream(db_faiss, question):
+                            pass
+                        measures.append({'first_token': model.last_answer_latency['first_token_seconds'],
+                                         'total': model.last_answer_latency['total_seconds']})
+            nb_connections = None if server is None else server.nb_connections - nb_connections
+            print(json.dumps(summarize(method, measures, nb_connections)), flush=True)
+
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
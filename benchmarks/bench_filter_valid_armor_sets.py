@@ -0,0 +1,90 @@
+"""
+Micro-benchmark of `SetMaker.filter_valid_armor_sets` against the previous column-by-column validation.
+
+Run from the repository root:
+    python -m benchmarks.bench_filter_valid_armor_sets --sizes 10000 1000000 10000000
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+
+from src.set_maker import SetMaker
+
+
+def filter_valid_armor_sets_by_column(all_armor_sets, df_skills):
+    """
+    Previous implementation: one lookup in the skills table and one comparison per skill column.
+
+    Args:
+        all_armor_sets (pandas.DataFrame): All generated armor sets.
+        df_skills (pandas.DataFrame): Skill data containing max level for each skill.
+
+    Returns:
+        pandas.DataFrame: All valid armor sets.
+    """
+    all_armor_sets.reset_index(inplace=True, drop=True)
+    all_armor_sets = all_armor_sets.fillna(0)
+
+    filter = True
+    for skill_name in [col_skill for col_skill in all_armor_sets.columns if 'skills' in col_skill]:
+        filter &= (all_armor_sets[skill_name]
+                   <= df_skills[df_skills['Skill'] == skill_name.split('_')[1]]['skill_max_level'].item())
+    return all_armor_sets.loc[filter].reset_index(drop=True)
+
+
+def make_candidate_sets(n, df_skills, nb_skills, seed=0):
+    """
+    Builds random candidate armor sets with the layout of `SetMaker.make_armor_sets`.
+
+    Args:
+        n (int): Number of armor sets.
+        df_skills (pandas.DataFrame): Skill data containing max level for each skill.
+        nb_skills (int): Number of `skills_*` columns.
+        seed (int): Random seed.
+
+    Returns:
+        pandas.DataFrame: Candidate armor sets, with missing skills as NaN.
+    """
+    rng = np.random.default_rng(seed)
+    df_candidates = pd.DataFrame({
+        'head': 'head', 'chest': 'chest', 'arm': 'arm', 'waist': 'waist', 'leg': 'leg', 'talisman': 'talisman',
+        'defense': rng.integers(300, 500, n),
+        'nb_decorations_size_1': rng.integers(0, 6, n),
+        'nb_decorations_size_2': rng.integers(0, 6, n),
+        'nb_decorations_size_3': rng.integers(0, 6, n),
+        'decorations_score': rng.integers(0, 40, n),
+    })
+    for skill_name, max_level in df_skills.sample(nb_skills, random_state=seed)[['Skill', 'skill_max_level']].values:
+        levels = rng.integers(0, max_level + 2, n).astype(np.float64)
+        levels[levels == 0] = np.nan
+        df_candidates[f'skills_{skill_name}'] = levels
+    return df_candidates
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000])
+    parser.add_argument('--nb-skills', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    set_maker = SetMaker()
+    print(f"{'sets':>12} {'by column (s)':>14} {'vectorized (s)':>15} {'speedup':>8}")
+    for n in args.sizes:
+        df_candidates = make_candidate_sets(n, set_maker.df_skills, args.nb_skills)
+        timings = []
+        for filter_valid in [filter_valid_armor_sets_by_column, set_maker.filter_valid_armor_sets]:
+            best = float('inf')
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                all_relevant_sets = filter_valid(df_candidates, set_maker.df_skills)
+                best = min(best, time.perf_counter() - start)
+            timings.append(best)
+            del all_relevant_sets
+        print(f"{n:>12,} {timings[0]:>14.4f} {timings[1]:>15.4f} {timings[0] / timings[1]:>7.1f}x")
+        del df_candidates
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark of the retrieval of the assistant: the `k` vector search results put in the prompt as before,
+against the same results routed by `RetrievalRouter`.
+
+Questions are generated from the shipped CSV files with the rows needed to answer them, e.g.
+"What skills does the Rathalos Helm alpha have?" needs the row of that armor piece, and
+"Which armor pieces have the Agitator skill?" needs every armor row with that skill.
+For each retrieval, the recall of the needed rows, the number of documents and the size of the context
+put in the prompt, and the retrieval time are reported.
+
+Embeddings are computed offline by a hashing stand-in by default, or by OpenAI with `--embeddings openai`
+and the `OPENAI_API_KEY` environment variable.
+
+Run from the repository root:
+    python -m benchmarks.bench_retrieval --nb-questions 50
+    python -m benchmarks.bench_retrieval --embeddings openai --k 50
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+import zlib
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.answer_cache import AnswerCache
+from src.embedding_cache import EmbeddingCache
+from src.model import Model
+from src.retrieval_router import RetrievalRouter, tokenize
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Offline stand-in of an embedding model: words and character trigrams hashed into a fixed size vector.
+    """
+    def __init__(self, size=1024):
+        self.size = size
+
+    def embed_query(self, text):
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in tokenize(text):
+            vector[zlib.crc32(word.encode()) % self.size] += 1.0
+            for i in range(len(word) - 2):
+                vector[zlib.crc32(f"#{word[i:i + 3]}".encode()) % self.size] += 0.5
+        return (vector / max(np.linalg.norm(vector), 1e-12)).tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def make_questions(chunks, nb_questions, seed=0):
+    """
+    Generates questions about random rows, with the positions of the rows needed to answer each of them.
+
+    Args:
+        chunks (list): Documents of the CSV rows, see `Model.prepare_csv`.
+        nb_questions (int): Number of questions per kind of question.
+        seed (int): Random seed.
+
+    Returns:
+        list: (kind of question, question, positions of the needed rows) tuples.
+    """
+    rng = random.Random(seed)
+    positions_by_source = {}
+    for i, chunk in enumerate(chunks):
+        positions_by_source.setdefault(chunk.metadata['source'], []).append(i)
+
+    templates = {
+        'armors.csv': ["What skills does the {} have?", "how much defense does {} give"],
+        'skills.csv': ["What does the {} skill do?", "What is the max level of {}?"],
+        'talismans.csv': ["Which skill does the {} give?"],
+        'decorations.csv': ["What skill does the {} give?"],
+    }
+    questions = []
+    for source, source_templates in templates.items():
+        for template in source_templates:
+            for i in rng.sample(positions_by_source[source], min(nb_questions, len(positions_by_source[source]))):
+                name = chunks[i].metadata['name'].split("【")[0]
+                questions.append((source, template.format(name), [i]))
+
+    # questions about a skill, answered by every armor piece having it
+    armor_positions_by_skill = {}
+    for i in positions_by_source['armors.csv']:
+        for n in range(1, 4):
+            content = chunks[i].page_content
+            start = content.find(f"Skill_{n}_name: ") + len(f"Skill_{n}_name: ")
+            skill_name = content[start:content.find(",", start)]
+            if skill_name != "nan":
+                armor_positions_by_skill.setdefault(skill_name, []).append(i)
+    for skill_name in rng.sample(sorted(armor_positions_by_skill), min(nb_questions, len(armor_positions_by_skill))):
+        questions.append(('armors by skill', f"Which armor pieces have the {skill_name} skill?",
+                          armor_positions_by_skill[skill_name]))
+    return questions
+
+
+def summarize(kind, method, measures):
+    return {
+        'questions': kind, 'retrieval': method, 'count': len(measures),
+        'recall': round(statistics.mean(m['recall'] for m in measures), 3),
+        'hit_rate': round(statistics.mean(m['recall'] > 0 for m in measures), 3),
+        'mean_docs': round(statistics.mean(m['docs'] for m in measures), 1),
+        'mean_context_tokens': round(statistics.mean(m['chars'] for m in measures) / 4),
+        'p50_ms': round(statistics.median(m['time'] for m in measures) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--embeddings', choices=['hashing', 'openai'], default='hashing')
+    parser.add_argument('--embedding-model', default="text-embedding-3-large")
+    parser.add_argument('--k', type=int, default=50, help="number of vector search results")
+    parser.add_argument('--nb-questions', type=int, default=50, help="questions per kind of question")
+    parser.add_argument('--data-dir', default="src/data")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model = Model(
+            api_key=os.environ.get("OPENAI_API_KEY"), embedding_model=args.embedding_model, k=args.k,
+            embeddings=HashingEmbeddings() if args.embeddings == 'hashing' else None,
+            index_dir=os.path.join(tmp_dir, "faiss"), embedding_cache=EmbeddingCache(os.path.join(tmp_dir, "e.sqlite")),
+            answer_cache=AnswerCache(db_path=None))
+        chunks = model.prepare_csv(args.data_dir)
+        db_faiss = model.create_database(chunks)
+        router = RetrievalRouter(chunks, max_k=args.k)
+        position_by_content = {(chunk.metadata['source'], chunk.page_content): i for i, chunk in enumerate(chunks)}
+
+        measures = {}
+        for kind, question, needed in make_questions(chunks, args.nb_questions):
+            vector = model.embeddings.embed_query(question)
+            for method in ['vector', 'router']:
+                start = time.perf_counter()
+                docs = db_faiss.similarity_search_by_vector(vector, k=args.k)
+                if method == 'router':
+                    docs = router.route(question, docs)
+                elapsed = time.perf_counter() - start
+                positions = {position_by_content[(doc.metadata['source'], doc.page_content)] for doc in docs}
+                measures.setdefault((kind, method), []).append({
+                    'recall': len(positions.intersection(needed)) / len(needed), 'docs': len(docs),
+                    'chars': sum(len(doc.page_content) + 1 for doc in docs), 'time': elapsed})
+
+    for kind in dict.fromkeys(kind for kind, method in measures):
+        for method in ['vector', 'router']:
+            print(json.dumps(summarize(kind, method, measures[(kind, method)])), flush=True)
+    for method in ['vector', 'router']:
+        print(json.dumps(summarize('all', method, [m for (kind, m_), ms in measures.items() if m_ == method
+                                                   for m in ms])), flush=True)
+
+
+if __name__ == "__main__":
+    main()
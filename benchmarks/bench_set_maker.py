@@ -0,0 +1,269 @@
+"""
+Benchmark of the `SetMaker` pipeline, stage by stage, on the shipped catalog and on synthetic scaled catalogs.
+
+Every case (catalog, skill selection, engine) runs in its own process, so that its peak RSS is measured
+on its own and a case exceeding the timeout can be stopped. Results are written as JSON.
+
+Run from the repository root:
+    python -m benchmarks.bench_set_maker --scales 1 2 10 100 --nb-skills 1 2 3 --output bench_set_maker.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+
+from src.catalog_store import CatalogStore
+from src.set_engine import SetEngine
+from src.set_maker import SetMaker
+
+
+ARMORS_CSV = "src/data/armors.csv"
+TALISMANS_CSV = "src/data/talismans.csv"
+SKILLS_INFO_CSV = "src/data/skills.csv"
+EXHAUSTIVE_ENGINES = ['legacy', 'streaming', 'vectorized', 'parallel']
+
+
+def make_scaled_catalog(scale, catalog_dir, seed=0):
+    """
+    Writes a synthetic armors CSV file `scale` times bigger than the shipped one.
+
+    Each shipped armor is copied `scale` times with a slightly different defense, and with its first
+    skill replaced by another armor skill in a third of the copies, so that copies aren't all dominated.
+
+    Args:
+        scale (int): Number of copies of each shipped armor.
+        catalog_dir (str): Directory the armors CSV file is written to.
+        seed (int): Random seed.
+
+    Returns:
+        str: Path of the armors CSV file.
+    """
+    rng = np.random.default_rng(seed)
+    df_armors = pd.read_csv(ARMORS_CSV)
+    max_level_by_skill = pd.read_csv(SKILLS_INFO_CSV).set_index('Skill')['skill_max_level']
+    armor_skills = df_armors['Skill_1_name'].dropna().unique()
+
+    df_scaled_armors = pd.concat([df_armors] * scale, ignore_index=True)
+    copy_id = np.repeat(np.arange(scale), len(df_armors))
+    df_scaled_armors['Armor'] = df_scaled_armors['Armor'] + [f" #{i}" if i > 0 else "" for i in copy_id]
+    df_scaled_armors['Defense'] = np.maximum(1, df_scaled_armors['Defense'] + rng.integers(-2, 3, len(copy_id)))
+
+    replaced = (copy_id > 0) & df_scaled_armors['Skill_1_name'].notna().to_numpy() & (rng.random(len(copy_id)) < 1/3)
+    new_skills = rng.choice(armor_skills, replaced.sum())
+    df_scaled_armors.loc[replaced, 'Skill_1_name'] = new_skills
+    df_scaled_armors.loc[replaced, 'Skill_1_lvl'] = np.minimum(df_scaled_armors.loc[replaced, 'Skill_1_lvl'].to_numpy(),
+                                                               max_level_by_skill.reindex(new_skills).to_numpy())
+
+    armors_csv = os.path.join(catalog_dir, f"armors_x{scale}.csv")
+    df_scaled_armors.to_csv(armors_csv, index=False)
+    return armors_csv
+
+
+@contextmanager
+def timed(stages, stage):
+    """
+    Measures the wall time of a stage.
+
+    Args:
+        stages (dict): Wall time of each stage, in seconds, updated with the measured stage.
+        stage (str): Name of the stage.
+    """
+    start = time.perf_counter()
+    yield
+    stages[stage] = time.perf_counter() - start
+
+
+def get_peak_rss_mb():
+    """
+    Returns the peak resident set size of the current process.
+
+    Returns:
+        float: Peak RSS in megabytes.
+    """
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak_rss / 2**20 if sys.platform == 'darwin' else peak_rss / 2**10
+
+
+def run_case(armors_csv, store_dir, necessary_skills, sort_on, engine, prune, max_combinations):
+    """
+    Runs the pipeline once with the given engine and times every stage.
+
+    Args:
+        armors_csv (str): Path of the armors CSV file of the catalog.
+        store_dir (str): Directory the catalog is compiled to.
+        necessary_skills (list): Skills required in the armor set.
+        sort_on (str): Sorting criterion after skills, 'defense' or 'decorations'.
+        engine (str): Engine of `SetMaker.make_best_set`.
+        prune (bool): Whether to remove dominated armor pieces before the search.
+        max_combinations (dict): Maximum number of combinations by engine, cases above it are skipped.
+
+    Returns:
+        dict: Wall time of each stage, number of combinations and combinations per second, peak RSS.
+    """
+    stages = {}
+    with timed(stages, 'load_catalog'):
+        set_maker = SetMaker(CatalogStore(store_dir, armors_csv, TALISMANS_CSV, SKILLS_INFO_CSV))
+
+    with timed(stages, 'filter_relevant_armors_and_talismans'):
+        filtered_df_armors, filtered_df_talismans = set_maker.filter_relevant_armors_and_talismans(
+            necessary_skills, set_maker.df_scored_armors, set_maker.df_talismans)
+    with timed(stages, 'get_best_armor_for_each_type'):
+        df_best_armors = set_maker.get_best_armor_for_each_type(set_maker.df_scored_armors, sort_on)
+    df_usable_armors = pd.concat([filtered_df_armors, df_best_armors])
+    if prune:
+        with timed(stages, 'prune_dominated_armors'):
+            df_usable_armors = set_maker.prune_dominated_armors(
+                df_usable_armors, filtered_df_talismans, necessary_skills, set_maker.df_skills)[0]
+
+    combinations = len(filtered_df_talismans) * int(np.prod(
+        [(df_usable_armors['Armor_type'] == armor_type).sum() for armor_type in SetEngine.armor_cat], dtype=np.int64))
+    result = {'combinations': combinations, 'stages': stages}
+    if combinations > max_combinations.get(engine, np.inf):
+        result['skipped'] = f"more than {max_combinations[engine]} combinations"
+        return result
+
+    match engine:
+        case "legacy":
+            search_stages = ['make_armor_sets', 'filter_valid_armor_sets', 'add_defense_by_skills_to_armor_sets']
+            with timed(stages, 'make_armor_sets'):
+                relevant_sets = set_maker.make_armor_sets(df_usable_armors, filtered_df_talismans)
+            with timed(stages, 'filter_valid_armor_sets'):
+                relevant_sets = set_maker.filter_valid_armor_sets(relevant_sets, set_maker.df_skills) \
+                    if len(relevant_sets) > 0 else pd.DataFrame()
+            with timed(stages, 'add_defense_by_skills_to_armor_sets'):
+                if len(relevant_sets) > 0:
+                    relevant_sets = set_maker.add_defense_by_skills_to_armor_sets(relevant_sets)
+        case "streaming":
+            search_stages = ['make_best_sets_streaming']
+            with timed(stages, 'make_best_sets_streaming'):
+                relevant_sets = set_maker.make_best_sets_streaming(
+                    df_usable_armors, filtered_df_talismans, necessary_skills, sort_on)
+        case _:
+            search_stages = ['load_set_engine', 'search']
+            with timed(stages, 'load_set_engine'):
+                set_engine = SetEngine(df_usable_armors, filtered_df_talismans, set_maker.df_skills,
+                                       necessary_skills, set_maker.defense_rules, sort_on)
+            with timed(stages, 'search'):
+                relevant_sets = set_engine.best_sets(k=1, strategy='exhaustive' if engine == 'vectorized' else engine)
+
+    with timed(stages, 'get_best_set'):
+        if len(relevant_sets) > 0:
+            set_maker.get_best_set(relevant_sets, necessary_skills, sort_on)
+
+    search_time = sum(stages[stage] for stage in search_stages)
+    result['combinations_per_second'] = combinations / search_time if search_time > 0 else None
+    result['total_seconds'] = sum(stages.values()) - stages['load_catalog']
+    return result
+
+
+def _run_case_in_child(connection, *args):
+    """
+    Runs a case and sends back its result with the peak RSS of the process.
+    """
+    try:
+        result = run_case(*args)
+        result['peak_rss_mb'] = get_peak_rss_mb()
+    except Exception as e:
+        result = {'error': repr(e)}
+    connection.send(result)
+    connection.close()
+
+
+def run_case_in_process(args, timeout):
+    """
+    Runs a case in a fresh process, stopping it after `timeout` seconds.
+
+    Args:
+        args (tuple): Arguments of `run_case`.
+        timeout (float): Maximum wall time of the case, in seconds.
+
+    Returns:
+        dict: Result of `run_case`, or the reason why it has no result.
+    """
+    context = multiprocessing.get_context('spawn')
+    parent_connection, child_connection = context.Pipe(duplex=False)
+    process = context.Process(target=_run_case_in_child, args=(child_connection, *args))
+    process.start()
+    child_connection.close()
+    if parent_connection.poll(timeout):
+        result = parent_connection.recv()
+    else:
+        result = {'error': f"timeout after {timeout}s"}
+    process.kill()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 2, 10, 100],
+                        help="catalog sizes as multiples of the shipped armors.csv, 1 being the shipped catalog")
+    parser.add_argument('--nb-skills', type=int, nargs='+', default=[1, 2, 3],
+                        help="numbers of necessary skills of the skill selections")
+    parser.add_argument('--selections', type=int, default=2, help="number of skill selections by number of skills")
+    parser.add_argument('--engines', nargs='+', default=['legacy', 'vectorized', 'branch_and_bound',
+                                                         'meet_in_the_middle'])
+    parser.add_argument('--sort-on', default='defense', choices=['defense', 'decorations'])
+    parser.add_argument('--no-prune', action='store_true', help="don't remove dominated armor pieces")
+    parser.add_argument('--max-legacy-combinations', type=int, default=20_000)
+    parser.add_argument('--max-combinations', type=int, default=500_000_000,
+                        help="maximum number of combinations of the other exhaustive engines")
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default="bench_set_maker.json")
+    args = parser.parse_args()
+
+    max_combinations = {engine: args.max_combinations for engine in EXHAUSTIVE_ENGINES}
+    max_combinations['legacy'] = args.max_legacy_combinations
+    rng = random.Random(args.seed)
+    armor_skills = sorted(pd.read_csv(ARMORS_CSV)[['Skill_1_name', 'Skill_2_name', 'Skill_3_name']].stack().unique())
+    skill_selections = [rng.sample(armor_skills, nb_skills)
+                        for nb_skills in args.nb_skills for _ in range(args.selections)]
+
+    results = []
+    with tempfile.TemporaryDirectory() as catalog_dir:
+        for scale in args.scales:
+            armors_csv = ARMORS_CSV if scale == 1 else make_scaled_catalog(scale, catalog_dir, args.seed)
+            store_dir = os.path.join(catalog_dir, f"compiled_x{scale}")
+            CatalogStore(store_dir, armors_csv, TALISMANS_CSV, SKILLS_INFO_CSV).compile()
+            nb_armors = len(pd.read_csv(armors_csv))
+
+            for necessary_skills in skill_selections:
+                for engine in args.engines:
+                    case_args = (armors_csv, store_dir, necessary_skills, args.sort_on, engine, not args.no_prune,
+                                 max_combinations)
+                    result = {'catalog': 'shipped' if scale == 1 else f"x{scale}", 'nb_armors': nb_armors,
+                              'necessary_skills': necessary_skills, 'sort_on': args.sort_on, 'engine': engine,
+                              'prune': not args.no_prune, **run_case_in_process(case_args, args.timeout)}
+                    results.append(result)
+                    print(json.dumps({key: result.get(key) for key in [
+                        'catalog', 'necessary_skills', 'engine', 'combinations', 'total_seconds', 'peak_rss_mb',
+                        'skipped', 'error']}), flush=True)
+
+    report = {
+        'meta': {
+            'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'pandas': pd.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'results': results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2, default=float)
+
+
+if __name__ == "__main__":
+    main()
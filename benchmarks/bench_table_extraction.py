@@ -0,0 +1,144 @@
+"""
+Benchmark of the table extraction of `Scraper._get_table_from_html` against the previous BeautifulSoup one.
+
+Pages are read from saved HTML files, or replayed from the `HttpCache` of the scraper, or generated
+with the layout of Game8 pages (navigation, scripts, several tables, the wanted table in the middle).
+Parse time and peak traced memory are reported per page, and both extractions are checked to give
+the same rows.
+
+Run from the repository root:
+    python -m benchmarks.bench_table_extraction --http-cache cache/http/pages.sqlite
+    python -m benchmarks.bench_table_extraction --pages saved_pages/*.html --header Slots
+"""
+import argparse
+import json
+import statistics
+import time
+import tracemalloc
+import numpy as np
+from bs4 import BeautifulSoup
+
+from src.scraper import Scraper
+from src.sqlite_db import connect
+
+
+HEADERS = ["Slots", "Armor", "Skills", "Type", "Talisman"]
+
+
+def get_table_with_soup(html, text):
+    """
+    Previous implementation: the whole page is parsed into a BeautifulSoup tree,
+    then every table is scanned for the column header.
+
+    Args:
+        html (str): The webpage content.
+        text (str): Text content to match in one of the table headers.
+
+    Returns:
+        dict: The table as plain lists, like `Scraper._get_table_from_html`, otherwise None.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    for table in soup.find_all('table'):
+        if len(table.find_all('th', string=text)) >= 1:
+            tbody = table.find("tbody")
+            body_trs = tbody.find_all("tr") if tbody is not None else []
+            return {
+                'columns': [th.get_text(strip=True) for th in table.find_all("th")],
+                'rows': [[td.get_text(strip=True) for td in tr.find_all("td")] for tr in table.find_all("tr")],
+                'body_rows': [[td.get_text(strip=True) for td in tr.find_all("td")] for tr in body_trs],
+                'body_links': [None if tr.find("a") is None else tr.find("a").get('href') for tr in body_trs],
+            }
+
+
+def make_page(nb_rows, header, seed=0):
+    """
+    Generates a page with the layout of a Game8 page.
+
+    Args:
+        nb_rows (int): Number of rows of the wanted table.
+        header (str): Column header of the wanted table.
+        seed (int): Random seed.
+
+    Returns:
+        str: The page content.
+    """
+    rng = np.random.default_rng(seed)
+    script = "<script>window.dataLayer = window.dataLayer || []; var a = '<table><th>Slots</th></table>';</script>"
+    nav = "".join(f'<li><a href="/games/archives/{i}">Menu entry {i}</a></li>' for i in range(400))
+    filler = "".join(f"<p>Paragraph {i} with <b>bold</b> &amp; <i>italic</i> text.</p>" for i in range(300))
+
+    def table(headers, nb):
+        head = "".join(f"<th>{h}</th>" for h in headers)
+        body = "".join(
+            "<tr>" + "".join(
+                f'<td><a href="https://game8.co/archives/{rng.integers(1e6)}">Cell {r}-{c}</a><br>'
+                f'<img src="x.png"> Lv. {rng.integers(1, 6)} &#9312;</td>'
+                for c in range(len(headers))) + "</tr>" for r in range(nb))
+        return f'<table class="a-table"><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+    other_tables = [table(["Name", "Rarity", "Effect"], 40) for i in range(6)]
+    wanted = table(["Name", header, "Defense", "Resistances"], nb_rows)
+    return (f"<!DOCTYPE html><html><head>{script * 20}<style>.a-table{{color:red}}</style></head><body>"
+            f"<nav><ul>{nav}</ul></nav>{filler}{''.join(other_tables[:3])}{wanted}{''.join(other_tables[3:])}"
+            f"{filler}{script * 20}</body></html>")
+
+
+def measure(function, html, header, repeat):
+    """
+    Measures the wall time and the peak traced memory of an extraction.
+
+    Returns:
+        tuple: Extracted table, median wall time in seconds, peak traced memory in bytes.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        table = function(html, header)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    function(html, header)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return table, statistics.median(times), peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pages', nargs='*', default=[], help="saved HTML pages")
+    parser.add_argument('--http-cache', help="SQLite database of an `HttpCache` to replay pages from")
+    parser.add_argument('--header', help="column header of the wanted table, guessed among usual ones by default")
+    parser.add_argument('--rows', type=int, nargs='+', default=[20, 200, 1000],
+                        help="rows of the wanted table of generated pages")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    pages = []
+    for path in args.pages:
+        with open(path, encoding="utf-8") as f:
+            pages.append((path, f.read()))
+    if args.http_cache is not None:
+        with connect(args.http_cache) as connection:
+            pages += connection.execute("SELECT url, body FROM pages ORDER BY url").fetchall()
+    if len(pages) == 0:
+        pages = [(f"generated_{nb_rows}_rows", make_page(nb_rows, "Slots")) for nb_rows in args.rows]
+
+    scraper = Scraper(fetcher=object())
+    for name, html in pages:
+        headers = [args.header] if args.header else HEADERS
+        header = next((h for h in headers if get_table_with_soup(html, h) is not None), None)
+        if header is None:
+            continue
+        old_table, old_time, old_peak = measure(get_table_with_soup, html, header, args.repeat)
+        new_table, new_time, new_peak = measure(scraper._get_table_from_html, html, header, args.repeat)
+        result = {
+            'page': name, 'size_kb': round(len(html) / 1024), 'header': header, 'rows': len(old_table['rows']),
+            'same_rows': old_table == new_table,
+            'soup_ms': round(old_time * 1000, 2), 'streaming_ms': round(new_time * 1000, 2),
+            'speedup': round(old_time / new_time, 1),
+            'soup_peak_kb': round(old_peak / 1024), 'streaming_peak_kb': round(new_peak / 1024),
+        }
+        print(json.dumps(result), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,54 +1,78 @@
+import logging
+import os
 import streamlit as st
-import pandas as pd
-from src.scraper import Scraper
-from src.cleaner import Cleaner
-from src.set_maker import SetMaker
+from src.catalog_service import CatalogService
+from src.refresh_worker import RefreshWorker
+from src.result_cache import ResultCache
+from src.instrumentation import Instrumentation, LogSink, MemorySink, PrometheusTextSink
 
 
-if 'try_to_update' not in st.session_state:
-    st.session_state['try_to_update'] = True
+@st.cache_resource
+def get_catalog_service():
+    return CatalogService(result_cache=ResultCache(db_path="cache/set_results.sqlite"))
 
-if 'updated' not in st.session_state:
-    st.session_state['updated'] = True
 
-df_armors = pd.read_csv("src/data/armors.csv")
-df_talismans = pd.read_csv("src/data/talismans.csv")
-df_skills = pd.read_csv("src/data/skills.csv")
-scraper = Scraper()
-cleaner = Cleaner()
-set_maker = SetMaker()
+@st.cache_resource
+def get_refresh_worker():
+    return RefreshWorker()
 
-st.set_page_config(
-    page_title="Hunter Set Generator",
-)
 
-st.title("Hunter Set Generator")
+@st.cache_resource
+def get_instrumentation_sinks():
+    # set SET_MAKER_INSTRUMENTATION=0 to stop logging and exporting profiles of the runs
+    if os.environ.get("SET_MAKER_INSTRUMENTATION", "1") == "0":
+        return []
+    logger = logging.getLogger("set_maker.instrumentation")
+    if not logger.handlers:
+        logger.addHandler(logging.StreamHandler())
+        logger.setLevel(logging.INFO)
+    return [LogSink(logger), PrometheusTextSink("cache/metrics/set_maker.prom")]
 
 
-if not st.session_state['try_to_update']:
-    st.session_state['try_to_update'] = True
-    try:
-        with st.spinner("Wait for data update..", show_time=True):
-            df_decorations_temp = scraper.decorations_scraping()
-            cleaner.decorations_cleaning(df_decorations_temp)
+if 'diagnostics' not in st.session_state:
+    st.session_state['diagnostics'] = MemorySink(max_profiles=1)
 
-            df_armors_temp, df_decorations_slots_temp = scraper.armors_scraping()
-            cleaner.armors_cleaning(df_armors_temp, df_decorations_slots_temp)
+catalog_service = get_catalog_service()
+set_maker = catalog_service.get_set_maker()
+df_skills = set_maker.df_skills
 
-            df_skills_info_temp = scraper.skills_info_scraping()
-            cleaner.skills_info_cleaning(df_skills_info_temp)
+st.set_page_config(
+    page_title="Hunter Set Generator",
+)
 
-            df_talismans_temp = scraper.talismans_scraping()
-            cleaner.talismans_cleaning(df_talismans_temp)
+st.title("Hunter Set Generator")
 
-        st.session_state['updated'] = True
-    except Exception as e:
-        st.exception(e)
 
-if st.session_state['updated']:
-    st.success("Data up to date! Given armor set will be generated on latest data.")
-else:
-    st.warning("Can't update data. Given armor set will be generated on older data.")
+refresh_worker = get_refresh_worker()
+if st.button("Refresh data", disabled=refresh_worker.get_status()['state'] == 'running'):
+    refresh_worker.start()
+    # rerun to disable the button and poll the refresh status
+    st.rerun()
+
+
+@st.fragment(run_every=2 if refresh_worker.get_status()['state'] == 'running' else None)
+def show_refresh_status():
+    refresh_status = refresh_worker.get_status()
+    match refresh_status['state']:
+        case 'running':
+            st.info("Updating data in the background... Given armor set will be generated on current data meanwhile.")
+            st.session_state['refresh_running'] = True
+        case 'failed':
+            st.warning("Can't update data. Given armor set will be generated on older data.")
+            st.caption(refresh_status['error'])
+        case _:
+            st.success("Data up to date! Given armor set will be generated on latest data.")
+            refreshed = refresh_status['result']
+            if refreshed is not None and refreshed['version'] is not None:
+                refreshed_sources = [source for source in ['decorations', 'armors', 'skills', 'talismans']
+                                     if refreshed[source]]
+                st.info(f"Refreshed data: {', '.join(refreshed_sources)}.")
+    # the whole page is rerun once the refresh is over, to pick the new snapshot up
+    if refresh_status['state'] != 'running' and st.session_state.pop('refresh_running', False):
+        st.rerun()
+
+
+show_refresh_status()
 
 with st.container(border=True):
     necessary_skills = st.multiselect(
@@ -62,23 +86,41 @@ with st.container(border=True):
         options=['defense', 'decorations']
         )
 
+    use_decorations = st.toggle("Use decorations to reach skill levels")
+    skill_targets = None
+    if use_decorations and len(necessary_skills) > 0:
+        max_level_by_skill = df_skills.set_index('Skill')['skill_max_level']
+        skill_targets = {
+            skill_name: int(st.number_input(
+                label=f"Target level of {skill_name}", min_value=1,
+                max_value=int(max_level_by_skill[skill_name]), value=int(max_level_by_skill[skill_name])))
+            for skill_name in necessary_skills
+        }
+
 clicked = st.button(
     label="Generate Armor Set",
 )
 
+show_diagnostics = st.sidebar.toggle("Show diagnostics")
+
 st.divider()
 
 if clicked and len(necessary_skills) == 0:
     st.write("Choose skills before trying to generate an armor set.")
 elif clicked:
-    df_armors = set_maker.add_decorations_score_col(df_armors)
-    filtered_df_armors, filtered_df_talismans = set_maker.filter_relevant_armors_and_talismans(
-        necessary_skills, df_armors, df_talismans)
-    df_best_armors = set_maker.get_best_armor_for_each_type(df_armors, sort_on)
-    armor_sets = set_maker.make_armor_sets(filtered_df_armors, filtered_df_talismans, df_best_armors)
-    relevant_sets = set_maker.filter_valid_armor_sets(armor_sets, df_skills)
-    relevant_sets = set_maker.add_defense_by_skills_to_armor_sets(relevant_sets)
-    best_set = set_maker.get_best_set(relevant_sets, necessary_skills, sort_on)
+    # runs are always profiled when enabled, the toggle only shows the profile of the run
+    sinks = get_instrumentation_sinks() + ([st.session_state['diagnostics']] if show_diagnostics else [])
+    instrumentation = Instrumentation(sinks) if len(sinks) > 0 else None
+    best_set = set_maker.make_best_set(necessary_skills, sort_on, instrumentation=instrumentation,
+                                       skill_targets=skill_targets)
+
+    if show_diagnostics:
+        with st.expander("Diagnostics"):
+            st.json(st.session_state['diagnostics'].profiles[-1])
+
+    if best_set is None:
+        st.write("No valid armor set can be made with these skills.")
+        st.stop()
 
     newline = "\n"
     cols_skills = [col for col in best_set.columns if "skills" in col]
@@ -118,3 +160,11 @@ elif clicked:
             - Number of size 3 decorations : **{best_set['nb_decorations_size_3'].item()}**
             """
         )
+
+    if skill_targets is not None:
+        st.subheader("Decorations")
+        decorations = best_set.attrs['decorations']
+        if len(decorations) == 0:
+            st.write("No decoration needed.")
+        else:
+            st.markdown(newline.join(f"- **{decoration}**" for decoration in decorations))
@@ -8,8 +8,7 @@ def load_model():
 
 
 model = load_model()
-chunks = model.prepare_csv()
-db_faiss = model.create_database(chunks)
+db_faiss = model.get_database()
 
 st.set_page_config(
     page_title="The Guild Oracle",
@@ -21,4 +20,5 @@ with st.form("my_form"):
     text = st.text_area(label="Ask your question about Monster Hunter Wilds to The Guild Oracle.")
     submitted = st.form_submit_button("Submit")
     if submitted:
-        st.info(model.rag(db_faiss=db_faiss, query=text))
+        with st.container(border=True):
+            st.write_stream(model.rag_stream(db_faiss=db_faiss, query=text))
@@ -0,0 +1,252 @@
+import hashlib
+import json
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+
+from src.sqlite_db import connect, create_tables
+
+
+class AnswerCache:
+    """
+    A cache of the answers of the assistant, in front of retrieval and the LLM call.
+
+    Answers are scoped by chat model, temperature, number of retrieved documents, dataset version
+    and entities named in the query, so that an answer is never served for another configuration, older data
+    or another armor piece or skill.
+    - Exact tier: queries are normalized (case, accents, punctuation and spacing) before being looked up.
+    - Semantic tier, if `similarity_threshold` is given: a query whose embedding has a cosine similarity
+      of at least `similarity_threshold` with a cached query of the same scope gets its answer.
+    Answers are kept in an in-process LRU tier and an SQLite tier, both bounded in size, and expire after a TTL.
+    """
+    def __init__(self, db_path="cache/answers.sqlite", max_size=256, max_entries=10000, ttl=7 * 24 * 3600,
+                 similarity_threshold=None):
+        """
+        Args:
+            db_path (str): Path of the SQLite database of the on-disk tier, no on-disk tier if None.
+            max_size (int): Maximum number of answers kept in memory.
+            max_entries (int): Maximum number of answers kept on disk, least recently used ones being evicted.
+            ttl (float): Number of seconds an answer stays valid.
+            similarity_threshold (float): Minimum cosine similarity of two queries to share an answer,
+                no semantic lookup if None.
+        """
+        self.db_path = db_path
+        self.max_size = max_size
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.entries = OrderedDict()
+        self.vectors_by_scope = {}
+        self.lock = threading.Lock()
+        self.counts = {'exact_hits': 0, 'semantic_hits': 0, 'misses': 0}
+
+        if self.db_path is not None:
+            create_tables(self.db_path,
+                          "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, scope TEXT, query TEXT, "
+                          "vector BLOB, answer TEXT, created_at REAL, used_at REAL)")
+
+    def make_scope(self, llm_model, temperature, k, dataset_version, entities=()):
+        """
+        Builds the scope of the answers of a configuration.
+
+        Args:
+            llm_model (str): Name of the chat model.
+            temperature (float): Sampling temperature of the chat model.
+            k (int): Number of retrieved documents.
+            dataset_version (str): Version of the data the documents come from.
+            entities (list): Names of the entities the query is about, e.g. "Rathalos Helm alpha", so that
+                a similar query about "Rathalos Helm beta" doesn't get its answer.
+
+        Returns:
+            str: Scope of the answers.
+        """
+        return hashlib.sha256(json.dumps([llm_model, temperature, k, dataset_version, sorted(entities)])
+                              .encode()).hexdigest()
+
+    def normalize_query(self, query):
+        """
+        Args:
+            query (str): Query of the user.
+
+        Returns:
+            str: Query in lower case, without accents nor punctuation, words separated by single spaces.
+        """
+        query = unicodedata.normalize('NFKD', query.lower())
+        query = "".join(c for c in query if not unicodedata.combining(c))
+        return " ".join(re.sub(r"[^\w\s]", " ", query).split())
+
+    def _make_key(self, scope, query):
+        return hashlib.sha256(f"{scope}:{self.normalize_query(query)}".encode()).hexdigest()
+
+    def _get_by_key(self, key, now):
+        """
+        Looks up an answer by key, in memory first and then on disk.
+
+        Returns:
+            str or None: The cached answer, None if it isn't cached or expired.
+        """
+        with self.lock:
+            if key in self.entries:
+                created_at, answer = self.entries[key]
+                if now - created_at < self.ttl:
+                    self.entries.move_to_end(key)
+                    return answer
+                del self.entries[key]
+
+        if self.db_path is None:
+            return None
+        with connect(self.db_path) as connection:
+            row = connection.execute("SELECT created_at, answer FROM answers WHERE key = ? AND created_at > ?",
+                                     (key, now - self.ttl)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE answers SET used_at = ? WHERE key = ?", (now, key))
+        self._set_in_memory(key, row[1], row[0])
+        return row[1]
+
+    def _set_in_memory(self, key, answer, created_at):
+        with self.lock:
+            self.entries[key] = (created_at, answer)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def _get_scope_vectors(self, scope, now):
+        """
+        Returns the normalized query embeddings of a scope, loaded from disk on first use.
+
+        Returns:
+            dict: Keys of the cached queries and their embeddings as rows of a matrix.
+        """
+        with self.lock:
+            if scope in self.vectors_by_scope:
+                return self.vectors_by_scope[scope]
+        keys, vectors = [], []
+        if self.db_path is not None:
+            with connect(self.db_path) as connection:
+                rows = connection.execute(
+                    "SELECT key, vector FROM answers WHERE scope = ? AND vector IS NOT NULL AND created_at > ?",
+                    (scope, now - self.ttl)).fetchall()
+            keys = [key for key, vector in rows]
+            vectors = [np.frombuffer(vector, dtype=np.float32) for key, vector in rows]
+        with self.lock:
+            return self.vectors_by_scope.setdefault(scope, {
+                'keys': keys, 'vectors': np.stack(vectors) if len(vectors) > 0 else None})
+
+    def _normalize_vector(self, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        return vector / max(np.linalg.norm(vector), 1e-12)
+
+    def get(self, scope, query, embed_query=None):
+        """
+        Looks up the answer of a query, by normalized query first and then by similarity of its embedding.
+
+        Args:
+            scope (str): Scope of the answers, see `make_scope`.
+            query (str): Query of the user.
+            embed_query (callable): Embeds the query, required for the semantic lookup. Only called
+                on an exact miss, so that exact hits don't pay for an embedding call.
+
+        Returns:
+            tuple:
+                - bool: Whether an answer was found.
+                - str: The cached answer, None if not found.
+                - list: Embedding of the query, None if it wasn't computed.
+        """
+        now = time.time()
+        answer = self._get_by_key(self._make_key(scope, query), now)
+        if answer is not None:
+            self._count('exact_hits')
+            return True, answer, None
+
+        vector = None
+        if self.similarity_threshold is not None and embed_query is not None:
+            vector = embed_query(query)
+            scope_vectors = self._get_scope_vectors(scope, now)
+            with self.lock:
+                keys, vectors = list(scope_vectors['keys']), scope_vectors['vectors']
+            if vectors is not None:
+                similarities = vectors @ self._normalize_vector(vector)
+                # the most similar queries first, skipping the ones evicted or expired meanwhile
+                for i in np.argsort(-similarities):
+                    if similarities[i] < self.similarity_threshold:
+                        break
+                    answer = self._get_by_key(keys[i], now)
+                    if answer is not None:
+                        self._count('semantic_hits')
+                        return True, answer, vector
+
+        self._count('misses')
+        return False, None, vector
+
+    def set(self, scope, query, answer, vector=None):
+        """
+        Stores the answer of a query in every tier, then evicts expired answers and least recently used
+        ones beyond `max_entries` from disk.
+
+        Args:
+            scope (str): Scope of the answers, see `make_scope`.
+            query (str): Query of the user.
+            answer (str): Answer of the assistant.
+            vector (list): Embedding of the query, stored for semantic lookups.
+        """
+        now = time.time()
+        key = self._make_key(scope, query)
+        self._set_in_memory(key, answer, now)
+
+        if vector is not None:
+            vector = self._normalize_vector(vector)
+            scope_vectors = self._get_scope_vectors(scope, now)
+            with self.lock:
+                if key not in scope_vectors['keys']:
+                    scope_vectors['keys'].append(key)
+                    scope_vectors['vectors'] = vector[None, :] if scope_vectors['vectors'] is None \
+                        else np.vstack([scope_vectors['vectors'], vector])
+                    # the in-memory semantic index is bounded like the on-disk tier
+                    if len(scope_vectors['keys']) > self.max_entries:
+                        scope_vectors['keys'] = scope_vectors['keys'][-self.max_entries:]
+                        scope_vectors['vectors'] = scope_vectors['vectors'][-self.max_entries:]
+
+        if self.db_path is not None:
+            with connect(self.db_path) as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key, scope, self.normalize_query(query), None if vector is None else vector.tobytes(),
+                     answer, now, now))
+                connection.execute("DELETE FROM answers WHERE created_at <= ?", (now - self.ttl,))
+                connection.execute(
+                    "DELETE FROM answers WHERE key NOT IN (SELECT key FROM answers ORDER BY used_at DESC LIMIT ?)",
+                    (self.max_entries,))
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def clear(self):
+        """
+        Removes every answer from every tier.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.vectors_by_scope.clear()
+        if self.db_path is not None:
+            with connect(self.db_path) as connection:
+                connection.execute("DELETE FROM answers")
+
+    def stats(self):
+        """
+        Returns the counters of the cache, for monitoring.
+
+        Returns:
+            dict: Numbers of exact hits, semantic hits and misses, hit rate,
+                and number of answers currently kept in memory.
+        """
+        with self.lock:
+            counts = dict(self.counts)
+            counts['size'] = len(self.entries)
+        lookups = counts['exact_hits'] + counts['semantic_hits'] + counts['misses']
+        counts['hit_rate'] = (counts['exact_hits'] + counts['semantic_hits']) / lookups if lookups > 0 else None
+        return counts
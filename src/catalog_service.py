@@ -0,0 +1,95 @@
+import os
+import threading
+
+from src.catalog_store import CatalogStore
+from src.set_maker import SetMaker
+from src.snapshot_store import SnapshotStore
+
+
+class CatalogService:
+    """
+    A process-wide access point to the catalog and its `SetMaker`.
+
+    The catalog is loaded once and shared by every session: a new `SetMaker` is only built
+    when a new data snapshot is published or the source files change on disk, which is checked
+    with a read of the snapshot pointer and a cheap `os.stat` of each file instead of re-reading them
+    on every rerun. Sessions holding the previous `SetMaker` keep using the previous snapshot.
+    """
+    def __init__(self, catalog_store=None, defense_rules_csv="src/data/rules/defense_skills.csv", result_cache=None,
+                 decorations_csv=None, snapshot_store=None):
+        """
+        Args:
+            catalog_store (CatalogStore): Compiled store the catalog is loaded from,
+                compiled from the CSV files of the published snapshot by default.
+            defense_rules_csv (str): Path of the defense bonuses given by defensive skills.
+            result_cache (ResultCache): Optional cache of the results of `SetMaker.make_best_set`.
+            decorations_csv (str): Path of the cleaned decorations, the one of the published snapshot by default.
+            snapshot_store (SnapshotStore): Store of the published data snapshots.
+        """
+        self.catalog_store = catalog_store
+        self.defense_rules_csv = defense_rules_csv
+        self.result_cache = result_cache
+        self.decorations_csv = decorations_csv
+        self.snapshot_store = SnapshotStore() if snapshot_store is None else snapshot_store
+        self.lock = threading.Lock()
+        self.set_maker = None
+        self.files_signature = None
+
+    def _get_sources(self):
+        """
+        Resolves the source files to load, from the published snapshot unless they were given.
+
+        Returns:
+            tuple:
+                - CatalogStore: Compiled store of the catalog.
+                - str: Path of the cleaned decorations.
+        """
+        snapshot_dir = self.snapshot_store.get_current_dir()
+        paths = self.snapshot_store.get_paths(snapshot_dir)
+        catalog_store = self.catalog_store
+        if catalog_store is None:
+            catalog_store = CatalogStore(os.path.join(snapshot_dir, "compiled"), paths['armors'], paths['talismans'],
+                                         paths['skills'])
+        decorations_csv = paths['decorations'] if self.decorations_csv is None else self.decorations_csv
+        return catalog_store, decorations_csv
+
+    def _get_files_signature(self, catalog_store, decorations_csv):
+        """
+        Computes the modification time and size of every source file.
+
+        Args:
+            catalog_store (CatalogStore): Compiled store of the catalog.
+            decorations_csv (str): Path of the cleaned decorations.
+
+        Returns:
+            tuple: Path, modification time in nanoseconds and size of each source file.
+        """
+        paths = [catalog_store.armors_csv, catalog_store.talismans_csv,
+                 catalog_store.skills_info_csv, self.defense_rules_csv, decorations_csv]
+        return tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths)
+
+    def get_set_maker(self):
+        """
+        Returns the shared `SetMaker`, reloading the catalog first if a new snapshot was published
+        or a source file changed on disk.
+
+        Returns:
+            SetMaker: Set maker built on the latest data.
+        """
+        catalog_store, decorations_csv = self._get_sources()
+        files_signature = self._get_files_signature(catalog_store, decorations_csv)
+        with self.lock:
+            if self.set_maker is None or files_signature != self.files_signature:
+                self.set_maker = SetMaker(catalog_store, self.defense_rules_csv, self.result_cache,
+                                         decorations_csv=decorations_csv)
+                self.files_signature = files_signature
+            return self.set_maker
+
+    def get_version(self):
+        """
+        Returns the version token of the data currently served.
+
+        Returns:
+            str: Dataset version of the shared `SetMaker`, see `SetMaker.dataset_version`.
+        """
+        return self.get_set_maker().dataset_version
@@ -0,0 +1,305 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+import numpy as np
+import pandas as pd
+
+from src.table_io import read_table
+
+
+class CatalogStore:
+    """
+    A compiled, array-backed store of the armor, talisman and skill catalog.
+
+    The cleaned CSV files are compiled once into NumPy `.npy` files with a JSON manifest:
+    skill names are interned to integer IDs and every column is stored as a typed array,
+    so that the catalog can be memory-mapped instead of parsed on every load.
+    - Each compilation is written to a new directory, then published by atomically replacing the `CURRENT`
+      pointer file, so that arrays memory-mapped by other sessions are never rewritten.
+    - Freshness is checked with the size and modification time of the source files recorded in the manifest,
+      the files are only hashed when these change.
+    """
+    armor_cat = ['head', 'chest', 'arm', 'waist', 'leg']
+
+    def __init__(
+            self,
+            store_dir="src/data/compiled",
+            armors_csv="src/data/armors.csv",
+            talismans_csv="src/data/talismans.csv",
+            skills_info_csv="src/data/skills.csv"
+            ):
+        self.store_dir = store_dir
+        self.armors_csv = armors_csv
+        self.talismans_csv = talismans_csv
+        self.skills_info_csv = skills_info_csv
+        self.pointer_path = os.path.join(store_dir, "CURRENT")
+
+    def _get_sources_stats(self):
+        """
+        Returns:
+            dict: Size and modification time in nanoseconds of each source file, keyed by file path.
+        """
+        stats = {}
+        for path in [self.armors_csv, self.talismans_csv, self.skills_info_csv]:
+            stat = os.stat(path)
+            stats[path] = [stat.st_size, stat.st_mtime_ns]
+        return stats
+
+    def _get_sources_hashes(self):
+        """
+        Computes the SHA-256 hash of every source CSV file.
+
+        Returns:
+            dict: Hash of each source file, keyed by file path.
+        """
+        hashes = {}
+        for path in [self.armors_csv, self.talismans_csv, self.skills_info_csv]:
+            with open(path, "rb") as f:
+                hashes[path] = hashlib.sha256(f.read()).hexdigest()
+        return hashes
+
+    def _intern(self, names, ids_by_name):
+        """
+        Converts names to integer IDs, missing names being converted to -1.
+
+        Args:
+            names (pandas.Series): Names to convert.
+            ids_by_name (dict): ID of each known name.
+
+        Returns:
+            numpy.ndarray: Integer IDs.
+
+        Raises:
+            ValueError: If a name is neither missing nor known, instead of reading it back as another name.
+        """
+        ids = names.astype(object).map(ids_by_name)
+        unknown = ids.isna() & names.notna()
+        if unknown.any():
+            raise ValueError(f"Unknown names in {names.name}: {sorted(set(names[unknown]))}")
+        return ids.fillna(-1).to_numpy(dtype=np.int16)
+
+    def _get_current_dir(self):
+        """
+        Returns:
+            str or None: Directory of the published compilation, None if the store was never compiled.
+        """
+        try:
+            with open(self.pointer_path) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return os.path.join(self.store_dir, version) if version else None
+
+    def _read_manifest(self):
+        """
+        Returns:
+            tuple:
+                - str or None: Directory of the published compilation, None if the store was never compiled.
+                - dict or None: Its manifest.
+        """
+        current_dir = self._get_current_dir()
+        if current_dir is None:
+            return None, None
+        with open(os.path.join(current_dir, "manifest.json")) as f:
+            return current_dir, json.load(f)
+
+    def _write_manifest(self, compiled_dir, manifest):
+        manifest_path = os.path.join(compiled_dir, "manifest.json")
+        with open(f"{manifest_path}.{uuid.uuid4().hex}.tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f.name, manifest_path)
+
+    def _prune(self, current_dir, max_draft_age=3600):
+        """
+        Removes older compilations, keeping the previous one for readers that resolved the pointer before
+        the last publication, and compilations abandoned for more than `max_draft_age` seconds.
+        """
+        names = [name for name in os.listdir(self.store_dir) if os.path.isdir(os.path.join(self.store_dir, name))]
+        drafts = [name for name in names if name.endswith(".tmp")]
+        published = sorted((name for name in names if not name.endswith(".tmp")
+                            and os.path.join(self.store_dir, name) != current_dir),
+                           key=lambda name: os.path.getmtime(os.path.join(self.store_dir, name)), reverse=True)
+        for name in published[1:]:
+            shutil.rmtree(os.path.join(self.store_dir, name), ignore_errors=True)
+        for name in drafts:
+            if time.time() - os.path.getmtime(os.path.join(self.store_dir, name)) > max_draft_age:
+                shutil.rmtree(os.path.join(self.store_dir, name), ignore_errors=True)
+
+    def compile(self):
+        """
+        Compiles the source CSV files into the store.
+
+        - Interns skill names and armor types to integer IDs.
+        - Saves every column as a typed `.npy` array, with 0 or -1 for missing values.
+        - Writes a manifest with source hashes, sizes and modification times, array shapes and dtypes.
+        - Publishes the new compilation and removes older ones.
+
+        Raises:
+            ValueError: If an armor has an unknown armor type.
+        """
+        # sources are described before they are read, so that a change while compiling is caught by the next load
+        sources_stats = self._get_sources_stats()
+        sources_hashes = self._get_sources_hashes()
+        df_armors = read_table(self.armors_csv)
+        df_talismans = read_table(self.talismans_csv)
+        df_skills = read_table(self.skills_info_csv)
+
+        skill_names = list(df_skills['Skill'])
+        for name in pd.concat([df_armors['Skill_1_name'], df_armors['Skill_2_name'], df_armors['Skill_3_name'],
+                               df_talismans['Skill_name']]).dropna():
+            if name not in skill_names:
+                skill_names.append(name)
+        skill_ids = {name: i for i, name in enumerate(skill_names)}
+
+        skill_cols = ['Skill_1', 'Skill_2', 'Skill_3']
+        decoration_cols_names = ['Decoration_slot_1_size', 'Decoration_slot_2_size', 'Decoration_slot_3_size']
+        arrays = {
+            'skills_name': np.array(skill_names, dtype=str),
+            'skills_type': df_skills['Type'].to_numpy(dtype=str),
+            'skills_effect': df_skills['Effect'].to_numpy(dtype=str),
+            'skills_max_level': df_skills['skill_max_level'].to_numpy(dtype=np.int8),
+            'armors_name': df_armors['Armor'].to_numpy(dtype=str),
+            'armors_defense': df_armors['Defense'].to_numpy(dtype=np.int16),
+            'armors_type': self._intern(df_armors['Armor_type'], {cat: i for i, cat in enumerate(self.armor_cat)}),
+            'armors_skill_id': np.stack([self._intern(df_armors[f'{col}_name'], skill_ids) for col in skill_cols],
+                                        axis=1),
+            'armors_skill_lvl': df_armors[[f'{col}_lvl' for col in skill_cols]].fillna(0).to_numpy(dtype=np.int8),
+            'armors_slot_size': df_armors[decoration_cols_names].fillna(0).to_numpy(dtype=np.int8),
+            'talismans_name': df_talismans['Talisman'].to_numpy(dtype=str),
+            'talismans_rarity': df_talismans['Rarity'].to_numpy(dtype=np.int8),
+            'talismans_skill_id': self._intern(df_talismans['Skill_name'], skill_ids),
+            'talismans_skill_lvl': df_talismans['Skill_lvl'].to_numpy(dtype=np.int8),
+        }
+
+        version = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+        draft_dir = os.path.join(self.store_dir, f"{version}.tmp")
+        os.makedirs(draft_dir)
+        for name, array in arrays.items():
+            np.save(os.path.join(draft_dir, f"{name}.npy"), array)
+        self._write_manifest(draft_dir, {
+            'sources': sources_hashes,
+            'sources_stats': sources_stats,
+            'armor_types': self.armor_cat,
+            'arrays': {name: {'shape': list(array.shape), 'dtype': array.dtype.str} for name, array in arrays.items()},
+        })
+
+        compiled_dir = os.path.join(self.store_dir, version)
+        os.replace(draft_dir, compiled_dir)
+        with open(f"{self.pointer_path}.{version}.tmp", "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f.name, self.pointer_path)
+        self._prune(compiled_dir)
+
+    def is_fresh(self):
+        """
+        Checks whether the store has been compiled from the current source CSV files.
+
+        Returns:
+            bool: True if the store exists and its source hashes match the CSV files.
+        """
+        current_dir, manifest = self._read_manifest()
+        if manifest is None:
+            return False
+        sources_stats = self._get_sources_stats()
+        if manifest.get('sources_stats') == sources_stats:
+            return True
+        if manifest['sources'] != self._get_sources_hashes():
+            return False
+        # the files were touched without being changed, their new stats spare the next loads from hashing them
+        self._write_manifest(current_dir, {**manifest, 'sources_stats': sources_stats})
+        return True
+
+    def get_version(self):
+        """
+        Computes a version token of the compiled catalog, which changes whenever a source CSV file changes.
+
+        Returns:
+            str: SHA-256 hash of the source hashes recorded in the manifest.
+        """
+        current_dir, manifest = self._read_manifest()
+        return hashlib.sha256(json.dumps(manifest['sources'], sort_keys=True).encode()).hexdigest()
+
+    def load(self):
+        """
+        Loads the store as memory-mapped arrays, compiling it first if it is missing or outdated.
+
+        Returns:
+            dict: Read-only arrays of the catalog, keyed by array name.
+        """
+        if not self.is_fresh():
+            self.compile()
+        current_dir, manifest = self._read_manifest()
+        return {name: np.load(os.path.join(current_dir, f"{name}.npy"), mmap_mode='r')
+                for name in manifest['arrays']}
+
+    def _to_column(self, values, missing):
+        """
+        Converts a stored array back to a DataFrame column, with NaN for missing values.
+        Integer columns without missing values are the stored arrays themselves, without copy.
+
+        Args:
+            values (numpy.ndarray): Stored values.
+            missing (numpy.ndarray): Boolean mask of missing values.
+
+        Returns:
+            numpy.ndarray: Column values.
+        """
+        if not missing.any():
+            return values if values.dtype.kind in 'iu' else values.astype(object)
+        column = values.astype(np.float64) if values.dtype.kind in 'iu' else values.astype(object)
+        column[missing] = np.nan
+        return column
+
+    def to_dataframes(self, catalog=None):
+        """
+        Rebuilds the armors, talismans and skills DataFrames from the store, with the same content
+        as reading the source CSV files. Integer columns keep their stored dtypes and stay memory-mapped,
+        read-only, only name columns and columns with missing values are copied.
+
+        Args:
+            catalog (dict): Arrays returned by `load`, loaded if not given.
+
+        Returns:
+            tuple:
+                - pandas.DataFrame: Armor data.
+                - pandas.DataFrame: Talisman data.
+                - pandas.DataFrame: Skill data.
+        """
+        catalog = self.load() if catalog is None else catalog
+        skill_names = np.asarray(catalog['skills_name']).astype(object)
+        nb_skills_info = len(catalog['skills_max_level'])
+
+        df_skills = pd.DataFrame({
+            'Skill': skill_names[:nb_skills_info],
+            'Type': np.asarray(catalog['skills_type']).astype(object),
+            'Effect': np.asarray(catalog['skills_effect']).astype(object),
+            'skill_max_level': catalog['skills_max_level'],
+        }, copy=False)
+
+        armors = {
+            'Armor': np.asarray(catalog['armors_name']).astype(object),
+            'Defense': catalog['armors_defense'],
+            'Armor_type': np.array(self.armor_cat, dtype=object)[np.asarray(catalog['armors_type'])],
+        }
+        for n in range(3):
+            skill_id = catalog['armors_skill_id'][:, n]
+            armors[f'Skill_{n+1}_name'] = self._to_column(skill_names[skill_id], skill_id < 0)
+            armors[f'Skill_{n+1}_lvl'] = self._to_column(catalog['armors_skill_lvl'][:, n], skill_id < 0)
+        for n in range(3):
+            slot_size = catalog['armors_slot_size'][:, n]
+            armors[f'Decoration_slot_{n+1}_size'] = self._to_column(slot_size, slot_size == 0)
+        df_armors = pd.DataFrame(armors, copy=False)
+
+        df_talismans = pd.DataFrame({
+            'Talisman': np.asarray(catalog['talismans_name']).astype(object),
+            'Rarity': catalog['talismans_rarity'],
+            'Skill_name': skill_names[catalog['talismans_skill_id']],
+            'Skill_lvl': catalog['talismans_skill_lvl'],
+        }, copy=False)
+
+        return df_armors, df_talismans, df_skills
@@ -1,5 +1,7 @@
 import pandas as pd
 
+from src.table_io import write_table
+
 
 class Cleaner:
     """
@@ -7,6 +9,19 @@ class Cleaner:
     armors, skills, and talismans. This class prepares and saves structured, cleaned datasets
     for further analysis or machine learning tasks.
     """
+    slot_size_by_char = {"ー": None, "①": 1, "②": 2, "③": 3}
+    # types of the columns of each cleaned table, keyed like `SnapshotStore.file_names`
+    dtypes = {
+        'decorations': {'Decoration_name': 'string', 'Decoration_size': 'Int8', 'Skill_1_name': 'category',
+                        'Skill_1_lvl': 'Int8'},
+        'armors': {'Armor': 'string', 'Defense': 'Int16', 'Armor_type': 'category',
+                   **{f"Skill_{n}_name": 'category' for n in range(1, 4)},
+                   **{f"Skill_{n}_lvl": 'Int8' for n in range(1, 4)},
+                   **{f"Decoration_slot_{n}_size": 'Int8' for n in range(1, 4)}},
+        'skills': {'Skill': 'string', 'Type': 'category', 'Effect': 'string', 'skill_max_level': 'Int8'},
+        'talismans': {'Talisman': 'string', 'Rarity': 'Int8', 'Skill_name': 'category', 'Skill_lvl': 'Int8'},
+    }
+
     def __init__(
             self,
             decoration_csv="src/data/decorations.csv",
@@ -19,181 +34,101 @@ class Cleaner:
         self.skills_info_csv = skills_info_csv
         self.talismans_csv = talismans_csv
 
-    def _get_one_col_per_skill(self, df, skills_col_name, reg_rule):
-        """
-        Extracts individual skill entries from a single string column using a regex pattern,
-        and expands them into separate columns.
-
-        Args:
-            df (pandas.DataFrame): The input DataFrame containing the skills column.
-            skills_col_name (str): Name of the column containing skills data.
-            reg_rule (str): Regular expression rule used to extract each skill.
-
-        Returns:
-            pandas.DataFrame: The updated DataFrame with each skill in its own column.
-        """
-        temp = df[skills_col_name].str.extractall(reg_rule).unstack()
-        temp.columns = temp.columns.droplevel()
-        df = pd.concat([df, temp], axis=1)
-        df.rename(columns={i: f'Skill {i+1}' for i in temp.columns}, inplace=True)
-        return df
-
-    def _get_skill_lvl_from_skill_columns(self, df, n):
-        """
-        Extracts the numerical skill level from the nth skill column and adds it as a new column.
-
-        Args:
-            df (pandas.DataFrame): The DataFrame containing skill columns.
-            n (int): The skill number (e.g., 1 for 'Skill 1') to process.
-
-        Returns:
-            pandas.DataFrame: The DataFrame with an added column for the skill level
-        """
-        temp = df[f'Skill {n}'].str.extractall(r'(\d)').unstack()
-        temp.columns = temp.columns.droplevel()
-        df = pd.concat([df, temp], axis=1)
-        df.rename(columns={0: f"Skill_{n}_lvl"}, inplace=True)
-        return df
-
-    def _slot_size_char_to_int(self, c):
-        """
-        Converts a symbolic representation of slot size to an integer.
-
-        Args:
-            c (str): A character representing slot size (e.g., '①', '②', '③', 'ー').
-
-        Returns:
-            int or None: Integer slot size (1-3) or None if no slot is present.
+    def _get_skill_columns(self, skills, index, nb_skills):
         """
-        match c:
-            case "ー":
-                return None
-            case "①":
-                return 1
-            case "②":
-                return 2
-            case "③":
-                return 3
-
-    def _correct_error_in_skill_col(self, skill):
-        """
-        Ensures skill strings end with a numerical level. If not, appends a default level of '1'.
+        Spreads skills extracted with `str.extractall` into one name and one level column per skill.
 
         Args:
-            skill (str): The raw skill string.
+            skills (pandas.DataFrame): 'name' and 'lvl' of each skill, indexed by row and match number.
+            index (pandas.Index): Index of the rows the skills were extracted from.
+            nb_skills (int): Number of skills to keep.
 
         Returns:
-            str: Corrected skill string ending with a digit.
+            pandas.DataFrame: 'Skill_{n}_name' and 'Skill_{n}_lvl' columns, aligned on `index`.
         """
-        if skill[-1].isnumeric():
-            return skill
-        return skill + "1"
+        skills = skills.unstack('match').reindex(index)
+        columns = {}
+        for n in range(nb_skills):
+            columns[f"Skill_{n+1}_name"] = skills[('name', n)] if ('name', n) in skills else None
+            columns[f"Skill_{n+1}_lvl"] = skills[('lvl', n)] if ('lvl', n) in skills else None
+        return pd.DataFrame(columns, index=index)
 
     def decorations_cleaning(self, df_decorations):
         """
         Cleans and restructures the decorations dataset.
 
-        - Splits combined skill data into individual columns.
-        - Extracts skill name and level from each skill column.
+        - Extracts skill name and level from the skill column.
         - Renames and formats relevant columns.
-        - Outputs a cleaned CSV file to `self.decoration_csv`.
+        - Outputs a cleaned CSV file to `self.decoration_csv`, with a typed Arrow copy.
 
         Args:
             df_decorations (pandas.DataFrame): Raw decorations data.
         """
-        df_decorations = self._get_one_col_per_skill(df_decorations, 'Skill', r'(\D+Lv. \d)')
-        for n in range(1, 2):
-            temp = df_decorations[f'Skill {n}'].str.split(r'(Lv. \d)').str[0]
-            df_decorations[f"Skill_{n}_name"] = temp
-            df_decorations = self._get_skill_lvl_from_skill_columns(df_decorations, n)
-
-        df_decorations.drop(columns=['Skill', 'Skill 1'], inplace=True)
+        df_decorations = pd.concat([
+            df_decorations.drop(columns=['Skill']),
+            self._get_skill_columns(
+                df_decorations['Skill'].str.extractall(r'(?P<name>\D+?)Lv. (?P<lvl>\d)'), df_decorations.index, 1)
+            ], axis=1)
         df_decorations.rename(columns={"Decoration": "Decoration_name", "Slots": "Decoration_size"}, inplace=True)
 
-        df_decorations.to_csv(self.decoration_csv, index=False)
+        write_table(df_decorations, self.decoration_csv, self.dtypes['decorations'])
 
     def armors_cleaning(self, df_armors, df_decorations_slots):
         """
         Cleans and restructures the armors dataset and merges decorations slots information to it.
 
-        - Extracts defense values and corrects skill column inconsistencies.
-        - Parses skill names and levels into structured columns.
-        - Extracts and converts decoration slot sizes from symbols to integers.
+        - Extracts defense values.
+        - Parses skill names and levels into structured columns, a skill without level being level 1.
+        - Converts decoration slot sizes from symbols to integers with a mapping table.
         - Merges armor data with slot information using the 'Armor' column.
         - Normalizes special characters in armor names.
-        - Outputs a cleaned CSV file to `self.armors_csv`.
+        - Outputs a cleaned CSV file to `self.armors_csv`, with a typed Arrow copy.
 
         Args:
             df_armors (pandas.DataFrame): Raw armor data.
             df_decorations_slots (pandas.DataFrame): Decoration slot data associated with each armor.
         """
-        df_armors.reset_index(drop=True, inplace=True)
-
-        df_armors.rename(columns={"": "Defense"}, inplace=True)
-        df_armors["Defense"] = df_armors["Defense"].str.findall(r'\d+').str[0]
-
-        df_armors = self._get_one_col_per_skill(df_armors, 'Skills', r'(\D+\d*)')
-        for n in range(1, 4):
-            df_armors[f'Skill {n}'] = df_armors[f'Skill {n}'].apply(
-                lambda x: x if pd.isnull(x) else self._correct_error_in_skill_col(x)
-                )
-            df_armors[f"Skill_{n}_name"] = df_armors[f'Skill {n}'].str[:-1]
-            df_armors = self._get_skill_lvl_from_skill_columns(df_armors, n)
-
-        df_armors.drop(columns=[
-            'Type 1',
-            'Type 2',
-            'Resistances',
-            'Skills',
-            'Skill 1',
-            'Skill 2',
-            'Skill 3',
-            ], inplace=True)
-
-        df_decorations_slots = df_decorations_slots[~df_decorations_slots["Armor"].isna()]
+        df_armors = df_armors.reset_index(drop=True).rename(columns={"": "Defense"})
+        df_armors["Defense"] = df_armors["Defense"].str.extract(r'(\d+)', expand=False)
 
-        df_slots_size = pd.DataFrame([list(x) for x in df_decorations_slots['Slots']], index=df_decorations_slots.index)
-        slots_size_col_names = ["Decoration_slot_1_size", "Decoration_slot_2_size", "Decoration_slot_3_size"]
-        df_slots_size.columns = slots_size_col_names
+        # a skill without digit is level 1, otherwise its last digit is its level and the others belong to its name
+        skills = df_armors['Skills'].str.extractall(r'(?P<name>\D+)(?P<digits>\d*)')
+        digits = skills['digits'].fillna("").replace("", "1")
+        skills = pd.DataFrame({'name': skills['name'] + digits.str[:-1], 'lvl': digits.str[0]})
+        df_armors = pd.concat([
+            df_armors.drop(columns=['Type 1', 'Type 2', 'Resistances', 'Skills']),
+            self._get_skill_columns(skills, df_armors.index, 3)
+            ], axis=1)
 
-        df_decorations_slots = pd.concat([df_decorations_slots, df_slots_size], axis=1)
-
-        for col in slots_size_col_names:
-            df_decorations_slots[col] = df_decorations_slots[col].apply(lambda x: self._slot_size_char_to_int(x))
+        df_decorations_slots = df_decorations_slots[~df_decorations_slots["Armor"].isna()]
+        df_decorations_slots = df_decorations_slots.drop(columns=['Set', 'Skills'])
+        for n in range(3):
+            df_decorations_slots[f"Decoration_slot_{n+1}_size"] = \
+                df_decorations_slots['Slots'].str[n].map(self.slot_size_by_char)
+        df_decorations_slots = df_decorations_slots.drop(columns=['Slots'])
 
         df_armors = df_armors.merge(df_decorations_slots, how='inner', on='Armor')
 
-        for k, v in {"α": "alpha", "β": "beta", "γ": "upsilon"}.items():
-            df_armors['Armor'] = df_armors['Armor'].str.replace(k, v)
-
-        df_armors.drop(columns=[
-            'Set',
-            'Slots',
-            'Skills'
-            ], inplace=True)
+        df_armors['Armor'] = df_armors['Armor'].replace({"α": "alpha", "β": "beta", "γ": "upsilon"}, regex=True)
 
-        df_armors.to_csv(self.armors_csv, index=False)
+        write_table(df_armors, self.armors_csv, self.dtypes['armors'])
 
     def skills_info_cleaning(self, df_skills_info):
         """
         Cleans the skills information dataset by extracting max skill levels.
 
-        - Parses the 'Effect' column to determine the maximum skill level per skill.
+        - Takes the last level of the 'Effect' column as the maximum skill level of each skill.
         - Filters to keep only skills of type 'Armor'.
-        - Outputs a cleaned CSV file to `self.skills_info_csv`.
+        - Outputs a cleaned CSV file to `self.skills_info_csv`, with a typed Arrow copy.
 
         Args:
             df_skills_info (pandas.DataFrame): Raw skill details and effects.
         """
-        temp = df_skills_info['Effect'].str.extractall(r'(Lv. \d)').unstack()
-        temp.columns = temp.columns.droplevel()
-        temp['final'] = temp.ffill(axis=1).iloc[:, -1]
-        temp['final'] = temp['final'].str.extract(r'(\d)')
-        df_skills_info['skill_max_level'] = temp['final']
+        df_skills_info['skill_max_level'] = df_skills_info['Effect'].str.findall(r'Lv. (\d)').str[-1]
 
         df_skills_info = df_skills_info[df_skills_info['Type'] == 'Armor'].reset_index(drop=True)
 
-        df_skills_info.to_csv(self.skills_info_csv, index=False)
+        write_table(df_skills_info, self.skills_info_csv, self.dtypes['skills'])
 
     def talismans_cleaning(self, df_talismans):
         """
@@ -201,13 +136,13 @@ class Cleaner:
 
         - Extracts the skill name and numeric level from the 'Skill' column.
         - Drops redundant or merged columns.
-        - Outputs a cleaned CSV file to `self.talismans_csv`.
+        - Outputs a cleaned CSV file to `self.talismans_csv`, with a typed Arrow copy.
 
         Args:
             df_talismans (pandas.DataFrame): Raw talisman data.
         """
         df_talismans["Skill_name"] = df_talismans['Skill'].str.split(r'(Lv \d)').str[0]
-        df_talismans["Skill_lvl"] = df_talismans['Skill'].str.extract(r'(\d)')
+        df_talismans["Skill_lvl"] = df_talismans['Skill'].str.extract(r'(\d)', expand=False)
         df_talismans.drop(columns=['Skill'], inplace=True)
 
-        df_talismans.to_csv(self.talismans_csv, index=False)
+        write_table(df_talismans, self.talismans_csv, self.dtypes['talismans'])
@@ -0,0 +1,200 @@
+import hashlib
+import os
+import pickle
+import pandas as pd
+
+from src.catalog_store import CatalogStore
+from src.cleaner import Cleaner
+from src.scraper import Scraper
+from src.snapshot_store import SnapshotStore
+
+
+class DataRefresher:
+    """
+    Refreshes the cleaned CSV files incrementally, only re-cleaning the sources that changed.
+
+    Files are written into a new snapshot of a `SnapshotStore`, which is only published once every
+    file is written and the catalog is compiled, so that readers keep using the previous snapshot meanwhile.
+    The hash of each scraped table is compared with the one of the last refresh:
+    - The `Cleaner` step of an unchanged source is skipped and its CSV file is carried over
+      from the previous snapshot. Without any change, no snapshot is published.
+    - Monster-specific armor pages are hashed one by one, and only changed pages are parsed again;
+      the slot tables of unchanged pages are reused to re-merge `armors.csv`.
+    """
+    def __init__(self, scraper=None, snapshot_store=None, state_path="cache/refresh/state.pkl", cleaner_class=Cleaner):
+        """
+        Args:
+            scraper (Scraper): Scraper of the sources.
+            snapshot_store (SnapshotStore): Store the refreshed files are published to.
+            state_path (str): Path of the hashes and parsed slot tables of the last refresh.
+            cleaner_class (type): Class of the `Cleaner` writing the CSV files of a snapshot.
+        """
+        self.scraper = Scraper() if scraper is None else scraper
+        self.snapshot_store = SnapshotStore() if snapshot_store is None else snapshot_store
+        self.state_path = state_path
+        self.cleaner_class = cleaner_class
+        self.state = self._load_state()
+
+    def _load_state(self):
+        """
+        Returns:
+            dict: Hash of each source, version of the published snapshot and (page hash, slot table)
+                of each monster-specific armor page at the last refresh, empty if there was none.
+        """
+        if not os.path.exists(self.state_path):
+            return {'hashes': {}, 'version': None, 'slots_tables': {}}
+        with open(self.state_path, "rb") as f:
+            return pickle.load(f)
+
+    def _save_state(self):
+        """
+        Writes the state atomically, so that an interrupted refresh keeps the previous state.
+        """
+        os.makedirs(os.path.dirname(self.state_path) or '.', exist_ok=True)
+        with open(self.state_path + ".tmp", "wb") as f:
+            pickle.dump(self.state, f)
+        os.replace(self.state_path + ".tmp", self.state_path)
+
+    def _hash_table(self, df):
+        """
+        Args:
+            df (pandas.DataFrame): A scraped table.
+
+        Returns:
+            str: Hash of the columns and values of the table.
+        """
+        return hashlib.sha256(df.to_csv(index=False).encode()).hexdigest()
+
+    def _refresh_source(self, source, source_hash, csv_path, cleaning):
+        """
+        Cleans a source again if its hash changed since the last refresh or its CSV file is missing.
+
+        Args:
+            source (str): Name of the source.
+            source_hash (str): Hash of the freshly scraped source.
+            csv_path (str): Path of the cleaned CSV file of the source.
+            cleaning (callable): Cleans the scraped source and writes its CSV file.
+
+        Returns:
+            bool: Whether the source was cleaned again.
+        """
+        if self.state['hashes'].get(source) == source_hash and os.path.exists(csv_path):
+            return False
+        cleaning()
+        self.state['hashes'][source] = source_hash
+        return True
+
+    def _scrape_decorations_slots(self, links):
+        """
+        Scrapes the decoration slots of monster-specific armor pages, parsing only the pages that changed.
+
+        Pages that can't be fetched keep their last slot table, if any.
+
+        Args:
+            links (list): Links of the monster-specific armor pages.
+
+        Returns:
+            tuple:
+                - pandas.DataFrame: Decoration slot information per armor piece.
+                - list: Links of the pages that changed since the last refresh.
+        """
+        slots_tables = {}
+        changed_links = []
+        for link, page in zip(links, self.scraper.fetcher.get_many(links)):
+            previous = self.state['slots_tables'].get(link)
+            try:
+                if isinstance(page, Exception):
+                    raise page
+                page_hash = hashlib.sha256(page.encode()).hexdigest()
+                if previous is None or previous[0] != page_hash:
+                    previous = (page_hash, self.scraper.decorations_slots_scraping(page))
+                    changed_links.append(link)
+            except Exception as e:
+                print(e)
+                print(link)
+                print("".join(['-' for i in range(50)]))
+            if previous is not None:
+                slots_tables[link] = previous
+
+        changed_links += [link for link in self.state['slots_tables'] if link not in slots_tables]
+        self.state['slots_tables'] = slots_tables
+        df_decorations_slots = pd.concat([table for page_hash, table in slots_tables.values()]) \
+            if len(slots_tables) > 0 else pd.DataFrame()
+        return df_decorations_slots, changed_links
+
+    def refresh(self):
+        """
+        Scrapes every source, cleans the ones that changed since the last refresh into a new snapshot,
+        and publishes it if any source changed.
+
+        Returns:
+            dict: Whether each source was refreshed, the links of the changed monster-specific armor pages
+                under 'changed_slots_pages', and the published snapshot version under 'version',
+                None if nothing changed.
+        """
+        # hashes only describe the published snapshot they were recorded for
+        if self.state.get('version') != self.snapshot_store.get_current_version():
+            self.state['hashes'] = {}
+
+        snapshot_dir = self.snapshot_store.create()
+        try:
+            refreshed = self._refresh_snapshot(snapshot_dir)
+            version = None
+            if any(refreshed[source] for source in self.snapshot_store.file_names):
+                # compiled before publication, so that readers don't have to compile it on their first load
+                paths = self.snapshot_store.get_paths(snapshot_dir)
+                CatalogStore(os.path.join(snapshot_dir, "compiled"), paths['armors'], paths['talismans'],
+                             paths['skills']).compile()
+                version = self.snapshot_store.publish(snapshot_dir, {
+                    'refreshed': [source for source in self.snapshot_store.file_names if refreshed[source]]})
+            else:
+                self.snapshot_store.discard(snapshot_dir)
+        except BaseException:
+            self.snapshot_store.discard(snapshot_dir)
+            self.state = self._load_state()
+            raise
+
+        self.state['version'] = self.snapshot_store.get_current_version()
+        self._save_state()
+        refreshed['version'] = version
+        return refreshed
+
+    def _refresh_snapshot(self, snapshot_dir):
+        """
+        Scrapes every source and cleans the ones that changed into a snapshot.
+
+        Args:
+            snapshot_dir (str): Directory of an unpublished snapshot, holding a copy of the previous files.
+
+        Returns:
+            dict: Whether each source was refreshed, and the links of the changed
+                monster-specific armor pages under 'changed_slots_pages'.
+        """
+        paths = self.snapshot_store.get_paths(snapshot_dir)
+        cleaner = self.cleaner_class(paths['decorations'], paths['armors'], paths['skills'], paths['talismans'])
+        refreshed = {}
+
+        df_decorations = self.scraper.decorations_scraping()
+        refreshed['decorations'] = self._refresh_source(
+            'decorations', self._hash_table(df_decorations), cleaner.decoration_csv,
+            lambda: cleaner.decorations_cleaning(df_decorations))
+
+        df_armors, links = self.scraper.armors_by_type_scraping()
+        df_decorations_slots, changed_links = self._scrape_decorations_slots(links)
+        pages_hashes = [self.state['slots_tables'][link][0] for link in links if link in self.state['slots_tables']]
+        refreshed['armors'] = self._refresh_source(
+            'armors', hashlib.sha256("".join([self._hash_table(df_armors)] + pages_hashes).encode()).hexdigest(),
+            cleaner.armors_csv, lambda: cleaner.armors_cleaning(df_armors, df_decorations_slots))
+
+        df_skills_info = self.scraper.skills_info_scraping()
+        refreshed['skills'] = self._refresh_source(
+            'skills', self._hash_table(df_skills_info), cleaner.skills_info_csv,
+            lambda: cleaner.skills_info_cleaning(df_skills_info))
+
+        df_talismans = self.scraper.talismans_scraping()
+        refreshed['talismans'] = self._refresh_source(
+            'talismans', self._hash_table(df_talismans), cleaner.talismans_csv,
+            lambda: cleaner.talismans_cleaning(df_talismans))
+
+        refreshed['changed_slots_pages'] = changed_links
+        return refreshed
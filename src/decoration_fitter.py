@@ -0,0 +1,149 @@
+from functools import lru_cache
+import numpy as np
+
+
+class DecorationFitter:
+    """
+    Decides whether decorations (jewels) can close the skill deficits of an armor set with its free slots.
+
+    A jewel fits in any slot at least as big as itself and gives levels of a single skill.
+    Assignments are searched with a memoized recursion over (free slots by size, deficit and headroom
+    of each skill), each jewel going to the smallest free slot it fits in. Among the assignments closing
+    every deficit, the one using the least slot capacity is kept, then the one using the fewest size 1
+    slots, so that the armor set keeps the best free slots for `SetMaker.get_best_set`.
+    The memo is shared by every call, so armor sets with the same slot profile and the same deficits
+    are only solved once.
+    """
+    def __init__(self, df_decorations, df_skills):
+        """
+        Args:
+            df_decorations (pandas.DataFrame): Decoration data, as cleaned by `Cleaner.decorations_cleaning`.
+            df_skills (pandas.DataFrame): Skill data, decorations of other skills are ignored.
+        """
+        df_decorations = df_decorations[df_decorations['Skill_1_name'].isin(df_skills['Skill'])]
+        df_decorations = df_decorations.sort_values(by=['Decoration_size', 'Skill_1_lvl'], ascending=[True, False])
+
+        self.jewels_by_skill = {}
+        for id, decoration in df_decorations.iterrows():
+            self.jewels_by_skill.setdefault(decoration['Skill_1_name'], []).append(
+                (decoration['Decoration_name'], int(decoration['Decoration_size']), int(decoration['Skill_1_lvl'])))
+        self.skill_by_jewel = {jewel_name: (skill_name, jewel_lvl)
+                               for skill_name, jewels in self.jewels_by_skill.items()
+                               for jewel_name, jewel_size, jewel_lvl in jewels}
+        self._fit = lru_cache(maxsize=2**18)(self._fit_uncached)
+
+    def __getstate__(self):
+        # the memo isn't picklable, worker processes start with an empty one
+        state = self.__dict__.copy()
+        del state['_fit']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._fit = lru_cache(maxsize=2**18)(self._fit_uncached)
+
+    def get_jewel_skill(self, jewel_name):
+        """
+        Args:
+            jewel_name (str): Name of a decoration.
+
+        Returns:
+            tuple: Name of the skill given by the decoration and its level.
+        """
+        return self.skill_by_jewel[jewel_name]
+
+    def _fit_uncached(self, slots, needs):
+        """
+        Searches jewels closing every deficit with the given free slots.
+
+        Args:
+            slots (tuple): Number of free slots of size 1, 2 and 3.
+            needs (tuple): (skill name, deficit, headroom) of each skill, the headroom being the number
+                of levels a jewel may add beyond the deficit without exceeding the skill max level.
+
+        Returns:
+            tuple or None:
+                - tuple: Slot capacity and number of size 1 slots used by the jewels.
+                - tuple: (jewel name, slot size) of each placed jewel.
+            None if the deficits can't be closed.
+        """
+        needs = tuple(need for need in needs if need[1] > 0)
+        if len(needs) == 0:
+            return (0, 0), ()
+
+        best = None
+        skill_name, deficit, headroom = needs[0]
+        for jewel_name, jewel_size, jewel_lvl in self.jewels_by_skill.get(skill_name, []):
+            if jewel_lvl > deficit + headroom:
+                continue
+            slot_size = next((size for size in range(jewel_size, 4) if slots[size - 1] > 0), None)
+            if slot_size is None:
+                continue
+
+            remaining_slots = tuple(nb - 1 if size == slot_size else nb for size, nb in enumerate(slots, start=1))
+            overshoot = max(0, jewel_lvl - deficit)
+            remaining_needs = ((skill_name, deficit - jewel_lvl + overshoot, headroom - overshoot),) + needs[1:]
+            fit = self._fit(remaining_slots, remaining_needs)
+            if fit is None:
+                continue
+            cost = (fit[0][0] + slot_size, fit[0][1] + (slot_size == 1))
+            if best is None or cost < best[0]:
+                best = (cost, ((jewel_name, slot_size),) + fit[1])
+        return best
+
+    def fit(self, slots, deficits, headrooms):
+        """
+        Searches the jewels closing the skill deficits of an armor set with the least slot capacity.
+
+        Args:
+            slots (tuple): Number of free slots of size 1, 2 and 3.
+            deficits (dict): Number of missing levels of each skill.
+            headrooms (dict): Number of levels each skill may get beyond its deficit.
+
+        Returns:
+            list or None: (jewel name, slot size) of each placed jewel, None if the deficits can't be closed.
+        """
+        needs = tuple((skill_name, int(deficit), int(headrooms.get(skill_name, 0)))
+                      for skill_name, deficit in deficits.items())
+        fit = self._fit(tuple(int(nb) for nb in slots), needs)
+        return None if fit is None else list(fit[1])
+
+    def fit_many(self, skill_names, slots, deficits, headrooms):
+        """
+        Fits jewels for many armor sets at once, solving each distinct profile only once.
+
+        Args:
+            skill_names (list): Skills of the deficit and headroom columns.
+            slots (numpy.ndarray): Free slots of size 1, 2 and 3 of each armor set.
+            deficits (numpy.ndarray): Missing levels of each skill for each armor set.
+            headrooms (numpy.ndarray): Levels each skill may get beyond its deficit for each armor set.
+
+        Returns:
+            tuple:
+                - numpy.ndarray: Whether the deficits of each armor set can be closed.
+                - numpy.ndarray: Slots of size 1, 2 and 3 used by the jewels of each armor set.
+                - numpy.ndarray: Levels of each skill given by the jewels of each armor set.
+        """
+        profiles = np.concatenate([slots, deficits, headrooms], axis=1).astype(np.int64)
+        if len(profiles) == 0:
+            return (np.zeros(0, dtype=bool), np.zeros((0, 3), dtype=np.int64),
+                    np.zeros((0, len(skill_names)), dtype=np.int64))
+        unique_profiles, inverse = np.unique(profiles, axis=0, return_inverse=True)
+
+        feasible = np.zeros(len(unique_profiles), dtype=bool)
+        used_slots = np.zeros((len(unique_profiles), 3), dtype=np.int64)
+        gained_levels = np.zeros((len(unique_profiles), len(skill_names)), dtype=np.int64)
+        for i, profile in enumerate(unique_profiles):
+            placements = self.fit(
+                profile[:3], dict(zip(skill_names, profile[3:3 + len(skill_names)])),
+                dict(zip(skill_names, profile[3 + len(skill_names):])))
+            if placements is None:
+                continue
+            feasible[i] = True
+            for jewel_name, slot_size in placements:
+                used_slots[i, slot_size - 1] += 1
+                skill_name, jewel_lvl = self.get_jewel_skill(jewel_name)
+                gained_levels[i, skill_names.index(skill_name)] += jewel_lvl
+
+        inverse = inverse.reshape(-1)
+        return feasible[inverse], used_slots[inverse], gained_levels[inverse]
@@ -0,0 +1,165 @@
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.sqlite_db import connect, create_tables
+
+
+class EmbeddingCache:
+    """
+    An on-disk, content-addressed cache of embeddings.
+
+    Vectors are keyed by embedding model and SHA-256 hash of the embedded text, so that a text
+    is only embedded once per model, whatever document or data snapshot it comes from.
+    """
+    def __init__(self, db_path="cache/embeddings.sqlite"):
+        """
+        Args:
+            db_path (str): Path of the SQLite database of the cache.
+        """
+        self.db_path = db_path
+        create_tables(self.db_path,
+                      "CREATE TABLE IF NOT EXISTS embeddings (model TEXT, content_hash TEXT, vector BLOB, "
+                      "PRIMARY KEY (model, content_hash))")
+
+    def get_many(self, model, content_hashes):
+        """
+        Looks up vectors.
+
+        Args:
+            model (str): Name of the embedding model.
+            content_hashes (list): Hashes of the embedded texts.
+
+        Returns:
+            dict: Vector of each cached hash, as a float32 array.
+        """
+        vectors = {}
+        with connect(self.db_path) as connection:
+            # bounded batches, to stay under the SQLite limit of bound parameters
+            for start in range(0, len(content_hashes), 500):
+                batch = content_hashes[start:start + 500]
+                rows = connection.execute(
+                    f"SELECT content_hash, vector FROM embeddings WHERE model = ? "
+                    f"AND content_hash IN ({', '.join('?' * len(batch))})", [model, *batch]).fetchall()
+                vectors.update({content_hash: np.frombuffer(vector, dtype=np.float32) for content_hash, vector in rows})
+        return vectors
+
+    def set_many(self, model, vectors):
+        """
+        Stores vectors.
+
+        Args:
+            model (str): Name of the embedding model.
+            vectors (dict): Vector of each hash of an embedded text.
+        """
+        with connect(self.db_path) as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(model, content_hash, np.asarray(vector, dtype=np.float32).tobytes())
+                 for content_hash, vector in vectors.items()])
+
+    def clear(self):
+        """
+        Removes every vector from the cache.
+        """
+        with connect(self.db_path) as connection:
+            connection.execute("DELETE FROM embeddings")
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of cached vectors per embedding model.
+        """
+        with connect(self.db_path) as connection:
+            return dict(connection.execute("SELECT model, COUNT(*) FROM embeddings GROUP BY model").fetchall())
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings served from an `EmbeddingCache`, only the cache misses being sent to the embedding client.
+
+    Misses are deduplicated and embedded in batches of `batch_size` texts, with at most `max_workers`
+    batches in flight. Hits, misses and embedding calls are counted for monitoring.
+    """
+    def __init__(self, embeddings, cache, model, batch_size=128, max_workers=4):
+        """
+        Args:
+            embeddings (Embeddings): Embedding client of the cache misses.
+            cache (EmbeddingCache): Cache of the vectors.
+            model (str): Name of the embedding model, part of the cache key.
+            batch_size (int): Maximum number of texts per embedding call.
+            max_workers (int): Maximum number of embedding calls in flight.
+        """
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.counts = {'hits': 0, 'misses': 0, 'embed_calls': 0, 'embedded_texts': 0}
+
+    def _count(self, **counts):
+        with self.lock:
+            for name, count in counts.items():
+                self.counts[name] += count
+
+    def _embed_batch(self, texts):
+        self._count(embed_calls=1, embedded_texts=len(texts))
+        return self.embeddings.embed_documents(texts)
+
+    def embed_documents(self, texts):
+        """
+        Embeds documents, from the cache for texts embedded before.
+
+        Args:
+            texts (list): Texts to embed.
+
+        Returns:
+            list: Vector of each text, in order.
+        """
+        content_hashes = [hashlib.sha256(text.encode()).hexdigest() for text in texts]
+        vectors = self.cache.get_many(self.model, list(set(content_hashes)))
+        missing = {content_hash: text for content_hash, text in zip(content_hashes, texts)
+                   if content_hash not in vectors}
+        nb_misses = sum(content_hash in missing for content_hash in content_hashes)
+        self._count(hits=len(texts) - nb_misses, misses=nb_misses)
+
+        if len(missing) > 0:
+            missing_hashes = list(missing)
+            batches = [missing_hashes[start:start + self.batch_size]
+                       for start in range(0, len(missing_hashes), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                results = executor.map(self._embed_batch, [[missing[h] for h in batch] for batch in batches])
+                for batch, batch_vectors in zip(batches, results):
+                    new_vectors = {h: np.asarray(vector, dtype=np.float32) for h, vector in zip(batch, batch_vectors)}
+                    # stored batch by batch, so that an interrupted run keeps what it paid for
+                    self.cache.set_many(self.model, new_vectors)
+                    vectors.update(new_vectors)
+
+        return [vectors[content_hash].tolist() for content_hash in content_hashes]
+
+    def embed_query(self, text):
+        """
+        Embeds a query, without caching it.
+
+        Args:
+            text (str): Query to embed.
+
+        Returns:
+            list: Vector of the query.
+        """
+        return self.embeddings.embed_query(text)
+
+    def stats(self):
+        """
+        Returns:
+            dict: Numbers of cache hits and misses, cache hit rate, and numbers of embedding calls
+                and embedded texts.
+        """
+        with self.lock:
+            counts = dict(self.counts)
+        lookups = counts['hits'] + counts['misses']
+        counts['hit_rate'] = counts['hits'] / lookups if lookups > 0 else None
+        return counts
@@ -0,0 +1,122 @@
+import threading
+import time
+import requests
+
+from src.sqlite_db import connect, create_tables
+
+
+class CacheMissError(requests.RequestException):
+    """
+    Raised in replay only mode when a page was never recorded in the cache.
+    """
+
+
+class HttpCache:
+    """
+    An on-disk cache of fetched pages, keyed by URL, used by `HttpFetcher` for conditional requests.
+
+    Each page is stored with its ETag and Last-Modified headers, so that the next fetch can ask
+    the server whether it changed and get a bodyless 304 response if it didn't.
+    - Pages not fetched nor revalidated for `max_age` seconds are evicted.
+    - Least recently used pages are evicted beyond `max_size_mb` megabytes of bodies.
+    """
+    def __init__(self, db_path="cache/http/pages.sqlite", max_size_mb=200, max_age=30 * 24 * 3600):
+        """
+        Args:
+            db_path (str): Path of the SQLite database of the cache.
+            max_size_mb (float): Maximum total size of the cached bodies, in megabytes.
+            max_age (float): Number of seconds a page is kept without being fetched or revalidated.
+        """
+        self.db_path = db_path
+        self.max_size_mb = max_size_mb
+        self.max_age = max_age
+        self.lock = threading.Lock()
+
+        create_tables(self.db_path,
+                      "CREATE TABLE IF NOT EXISTS pages (url TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, "
+                      "validated_at REAL, used_at REAL, size INTEGER, body TEXT)")
+
+    def get(self, url, include_expired=False):
+        """
+        Looks up a page.
+
+        Args:
+            url (str): URL of the page.
+            include_expired (bool): Whether to return the page even if it is older than `max_age`,
+                e.g. to replay recorded pages offline.
+
+        Returns:
+            dict or None: Body, ETag and Last-Modified of the page, None if it isn't cached or expired.
+        """
+        now = time.time()
+        min_validated_at = -float('inf') if include_expired else now - self.max_age
+        with connect(self.db_path) as connection:
+            row = connection.execute(
+                "SELECT body, etag, last_modified FROM pages WHERE url = ? AND validated_at > ?",
+                (url, min_validated_at)).fetchone()
+            if row is None:
+                return None
+            connection.execute("UPDATE pages SET used_at = ? WHERE url = ?", (now, url))
+        return {'body': row[0], 'etag': row[1], 'last_modified': row[2]}
+
+    def set(self, url, body, etag=None, last_modified=None):
+        """
+        Stores a page, then evicts expired pages and least recently used ones beyond the size limit.
+
+        Args:
+            url (str): URL of the page.
+            body (str): Decoded body of the page.
+            etag (str): ETag header of the response.
+            last_modified (str): Last-Modified header of the response.
+        """
+        now = time.time()
+        with self.lock, connect(self.db_path) as connection:
+            connection.execute("INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (url, etag, last_modified, now, now, len(body.encode()), body))
+            self._evict(connection, now)
+
+    def revalidate(self, url):
+        """
+        Marks a page as still up to date, after a 304 response.
+
+        Args:
+            url (str): URL of the page.
+        """
+        now = time.time()
+        with connect(self.db_path) as connection:
+            connection.execute("UPDATE pages SET validated_at = ?, used_at = ? WHERE url = ?", (now, now, url))
+
+    def _evict(self, connection, now):
+        """
+        Removes expired pages, then least recently used pages until the size limit is met.
+
+        Args:
+            connection (sqlite3.Connection): Connection to the database.
+            now (float): Current timestamp.
+        """
+        connection.execute("DELETE FROM pages WHERE validated_at <= ?", (now - self.max_age,))
+        max_size = self.max_size_mb * 2**20
+        total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        if total_size <= max_size:
+            return
+        for url, size in connection.execute("SELECT url, size FROM pages ORDER BY used_at").fetchall():
+            connection.execute("DELETE FROM pages WHERE url = ?", (url,))
+            total_size -= size
+            if total_size <= max_size:
+                break
+
+    def clear(self):
+        """
+        Removes every page from the cache.
+        """
+        with connect(self.db_path) as connection:
+            connection.execute("DELETE FROM pages")
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of cached pages and total size of their bodies in bytes.
+        """
+        with connect(self.db_path) as connection:
+            nb_pages, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM pages").fetchone()
+        return {'pages': nb_pages, 'size': size}
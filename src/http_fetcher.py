@@ -0,0 +1,144 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.http_cache import CacheMissError
+
+
+class HttpFetcher:
+    """
+    A concurrent HTTP fetch layer for the scraper.
+
+    Pages are fetched with one shared `requests.Session`, whose connections are kept alive and pooled,
+    by a bounded pool of threads.
+    - Every request has a timeout, and failed requests (connection errors, 429 and 5xx responses)
+      are retried with an exponential backoff.
+    - A politeness delay spaces out the start of consecutive requests, across all threads.
+    - With an `HttpCache`, pages are fetched with conditional requests and unchanged pages are served
+      from the cache after a 304 response. In replay only mode, pages are only served from the cache,
+      without any request.
+    """
+    def __init__(self, max_workers=8, timeout=(5, 30), retries=3, backoff_factor=0.5, delay=0.0,
+                 user_agent="mhw-set-maker", cache=None, replay_only=False):
+        """
+        Args:
+            max_workers (int): Maximum number of requests in flight, also the size of the connection pool.
+            timeout (float or tuple): Timeout of each request in seconds, or (connect, read) timeouts.
+            retries (int): Maximum number of retries of a failed request.
+            backoff_factor (float): Base delay between retries in seconds, doubled after each retry.
+            delay (float): Minimum number of seconds between the start of two requests.
+            user_agent (str): User-Agent header of every request.
+            cache (HttpCache): Optional on-disk cache of the fetched pages.
+            replay_only (bool): Whether to serve pages from the cache only, requires `cache`.
+        """
+        if replay_only and cache is None:
+            raise ValueError("Replay only mode requires a cache")
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.next_request_time = 0.0
+        self.cache = cache
+        self.replay_only = replay_only
+        self.counts = {'downloaded': 0, 'not_modified': 0, 'replayed': 0}
+
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=[429, 500, 502, 503, 504],
+                      allowed_methods=["GET"], respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers['User-Agent'] = user_agent
+
+    def _wait_for_turn(self):
+        """
+        Waits until the politeness delay since the previous request has elapsed.
+        """
+        if self.delay <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_request_time - now
+            self.next_request_time = max(now, self.next_request_time) + self.delay
+        if wait > 0:
+            time.sleep(wait)
+
+    def get(self, url):
+        """
+        Fetches a page.
+
+        Args:
+            url (str): URL of the page.
+
+        Returns:
+            str: Decoded body of the page.
+
+        Raises:
+            requests.RequestException: If the page can't be fetched, after every retry.
+            CacheMissError: If the page isn't cached in replay only mode.
+        """
+        cached = None if self.cache is None else self.cache.get(url, include_expired=self.replay_only)
+        if self.replay_only:
+            if cached is None:
+                raise CacheMissError(f"{url} isn't cached")
+            self._count('replayed')
+            return cached['body']
+
+        headers = {}
+        if cached is not None and cached['etag'] is not None:
+            headers['If-None-Match'] = cached['etag']
+        if cached is not None and cached['last_modified'] is not None:
+            headers['If-Modified-Since'] = cached['last_modified']
+
+        self._wait_for_turn()
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached is not None:
+            self.cache.revalidate(url)
+            self._count('not_modified')
+            return cached['body']
+        response.raise_for_status()
+        if self.cache is not None:
+            self.cache.set(url, response.text, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        self._count('downloaded')
+        return response.text
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def stats(self):
+        """
+        Returns:
+            dict: Number of pages downloaded, revalidated with a 304 response and replayed from the cache.
+        """
+        with self.lock:
+            return dict(self.counts)
+
+    def _get_or_error(self, url):
+        try:
+            return self.get(url)
+        except requests.RequestException as e:
+            return e
+
+    def get_many(self, urls):
+        """
+        Fetches pages concurrently, with at most `max_workers` requests in flight.
+
+        Args:
+            urls (list): URLs of the pages.
+
+        Returns:
+            list: Decoded body of each page in the order of `urls`, or the `requests.RequestException`
+                raised while fetching it, so that one failed page doesn't fail the others.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self._get_or_error, urls))
+
+    def close(self):
+        """
+        Closes the pooled connections.
+        """
+        self.session.close()
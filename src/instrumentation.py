@@ -0,0 +1,302 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def get_rss_bytes():
+    """
+    Returns the current memory usage of the process, read from `/proc/self/statm`.
+
+    Returns:
+        int or None: Resident set size in bytes, None if it can't be measured on this platform.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+def get_process_peak_rss_bytes():
+    """
+    Returns the memory high-water mark of the current process since it started, not of a single run.
+
+    Returns:
+        int or None: Peak resident set size in bytes, None if it can't be measured on this platform.
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes elsewhere
+    return peak_rss if sys.platform == 'darwin' else peak_rss * 1024
+
+
+class Profile:
+    """
+    Measurements of one run of the set making pipeline: wall time of each stage and recorded values
+    such as candidate counts by armor type or numbers of generated, valid and final armor sets.
+
+    The peak memory of the run and of each stage is the highest resident set size sampled at their boundaries
+    and, while the run lasts, every `rss_interval` seconds by a background thread. It includes the memory
+    of concurrent runs of the same process, and misses spikes shorter than the interval.
+    """
+    def __init__(self, labels, rss_interval=None):
+        """
+        Args:
+            labels (dict): Description of the run, e.g. necessary skills, sorting criterion and engine.
+            rss_interval (float): Number of seconds between two samples of the resident set size during the run,
+                None to sample it only at stage boundaries.
+        """
+        self.labels = labels
+        self.stages = {}
+        self.values = {}
+        self.peak_rss_bytes = None
+        self.stages_peak_rss_bytes = {}
+        self.process_peak_rss_bytes = None
+        self.open_stages_peak_rss_bytes = {}
+        self.lock = threading.Lock()
+        self.sample_rss()
+
+        self.stopped = threading.Event()
+        self.sampler = None
+        if rss_interval is not None and self.peak_rss_bytes is not None:
+            self.sampler = threading.Thread(target=self._sample_rss_until_stopped, args=(rss_interval,), daemon=True)
+            self.sampler.start()
+        self.start_time = time.perf_counter()
+        self.total_seconds = None
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Measures the wall time of a stage, added to previous measures of the same stage.
+
+        Args:
+            name (str): Name of the stage.
+        """
+        with self.lock:
+            self.open_stages_peak_rss_bytes[name] = None
+        self.sample_rss()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0) + time.perf_counter() - start
+            self.sample_rss()
+            with self.lock:
+                peak_rss = self.open_stages_peak_rss_bytes.pop(name)
+                if peak_rss is not None:
+                    self.stages_peak_rss_bytes[name] = max(self.stages_peak_rss_bytes.get(name, 0), peak_rss)
+
+    def sample_rss(self):
+        """
+        Samples the resident set size of the process and keeps the highest one of the run and of the open stages.
+        """
+        rss = get_rss_bytes()
+        if rss is None:
+            return
+        with self.lock:
+            self.peak_rss_bytes = rss if self.peak_rss_bytes is None else max(self.peak_rss_bytes, rss)
+            for name, peak_rss in self.open_stages_peak_rss_bytes.items():
+                self.open_stages_peak_rss_bytes[name] = rss if peak_rss is None else max(peak_rss, rss)
+
+    def _sample_rss_until_stopped(self, rss_interval):
+        while not self.stopped.wait(rss_interval):
+            self.sample_rss()
+
+    def stop(self):
+        """
+        Stops sampling the resident set size, with a last sample.
+        """
+        self.stopped.set()
+        if self.sampler is not None:
+            self.sampler.join()
+        self.sample_rss()
+
+    def record(self, name, value):
+        """
+        Records a value of the run.
+
+        Args:
+            name (str): Name of the value.
+            value (object): JSON-serializable value.
+        """
+        self.values[name] = value
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: All measurements of the run.
+        """
+        return {
+            'labels': self.labels,
+            'stages_seconds': self.stages,
+            'values': self.values,
+            'total_seconds': self.total_seconds,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'stages_peak_rss_bytes': self.stages_peak_rss_bytes,
+            'process_peak_rss_bytes': self.process_peak_rss_bytes,
+        }
+
+
+class NullProfile:
+    """
+    A profile measuring nothing, used when instrumentation is disabled so that the pipeline
+    doesn't have to check whether it is instrumented.
+    """
+    def stage(self, name):
+        return nullcontext()
+
+    def record(self, name, value):
+        pass
+
+
+NULL_PROFILE = NullProfile()
+
+
+class Instrumentation:
+    """
+    An opt-in instrumentation layer for the set making pipeline.
+
+    Each run gets a `Profile` from `start`, which is filled by the pipeline and sent
+    to every sink by `finish`.
+    """
+    def __init__(self, sinks, rss_interval=0.01):
+        """
+        Args:
+            sinks (list): Sinks the profiles are sent to, objects with an `emit(profile)` method.
+            rss_interval (float): Number of seconds between two samples of the resident set size during a run,
+                None to sample it only at stage boundaries.
+        """
+        self.sinks = sinks
+        self.rss_interval = rss_interval
+
+    def start(self, **labels):
+        """
+        Starts measuring a run.
+
+        Args:
+            **labels: Description of the run.
+
+        Returns:
+            Profile: Profile of the run.
+        """
+        return Profile(labels, self.rss_interval)
+
+    def finish(self, profile):
+        """
+        Completes a profile with its total time, its peak memory and the memory high-water mark of the process,
+        and sends it to every sink.
+
+        Args:
+            profile (Profile): Profile returned by `start`.
+        """
+        profile.total_seconds = time.perf_counter() - profile.start_time
+        profile.stop()
+        profile.process_peak_rss_bytes = get_process_peak_rss_bytes()
+        for sink in self.sinks:
+            sink.emit(profile)
+
+
+class LogSink:
+    """
+    Writes each profile as one structured JSON log line.
+    """
+    def __init__(self, logger=None, level=logging.INFO):
+        self.logger = logging.getLogger(__name__) if logger is None else logger
+        self.level = level
+
+    def emit(self, profile):
+        self.logger.log(self.level, json.dumps(profile.to_dict(), default=str))
+
+
+class PrometheusTextSink:
+    """
+    Exposes profiles as a Prometheus text file, e.g. for the node exporter textfile collector.
+
+    Gauges give the measurements of the last run, counters are accumulated over every run of the process.
+    """
+    def __init__(self, path, prefix="set_maker"):
+        """
+        Args:
+            path (str): Path of the `.prom` file, rewritten atomically after each run.
+            prefix (str): Prefix of every metric name.
+        """
+        self.path = path
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.runs_total = 0
+        self.stage_seconds_total = {}
+
+    def _format_labels(self, labels):
+        """
+        Args:
+            labels (dict): Label values by label name.
+
+        Returns:
+            str: Labels in the Prometheus text format.
+        """
+        if not labels:
+            return ""
+        escaped = {name: str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                   for name, value in labels.items()}
+        return "{" + ",".join(f'{name}="{value}"' for name, value in escaped.items()) + "}"
+
+    def emit(self, profile):
+        with self.lock:
+            self.runs_total += 1
+            for stage, seconds in profile.stages.items():
+                self.stage_seconds_total[stage] = self.stage_seconds_total.get(stage, 0) + seconds
+
+            metrics = [
+                ('runs_total', 'counter', [({}, self.runs_total)]),
+                ('stage_seconds_total', 'counter',
+                 [({'stage': stage}, seconds) for stage, seconds in self.stage_seconds_total.items()]),
+                ('last_stage_seconds', 'gauge',
+                 [({'stage': stage}, seconds) for stage, seconds in profile.stages.items()]),
+                ('last_total_seconds', 'gauge', [({}, profile.total_seconds)]),
+            ]
+            for name, value in profile.values.items():
+                if isinstance(value, dict):
+                    metrics.append((f'last_{name}', 'gauge',
+                                    [({'armor_type': key}, count) for key, count in value.items()]))
+                elif isinstance(value, (int, float)):
+                    metrics.append((f'last_{name}', 'gauge', [({}, value)]))
+            if profile.peak_rss_bytes is not None:
+                metrics.append(('last_peak_rss_bytes', 'gauge', [({}, profile.peak_rss_bytes)]))
+            if len(profile.stages_peak_rss_bytes) > 0:
+                metrics.append(('last_stage_peak_rss_bytes', 'gauge',
+                                [({'stage': stage}, rss) for stage, rss in profile.stages_peak_rss_bytes.items()]))
+            if profile.process_peak_rss_bytes is not None:
+                metrics.append(('process_peak_rss_bytes', 'gauge', [({}, profile.process_peak_rss_bytes)]))
+
+            lines = []
+            for name, metric_type, samples in metrics:
+                lines.append(f"# TYPE {self.prefix}_{name} {metric_type}")
+                lines += [f"{self.prefix}_{name}{self._format_labels(labels)} {value}" for labels, value in samples]
+
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            with open(self.path + ".tmp", "w") as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(self.path + ".tmp", self.path)
+
+
+class MemorySink:
+    """
+    Keeps the last profiles in memory, e.g. to display them in a diagnostics panel.
+    """
+    def __init__(self, max_profiles=10):
+        self.profiles = deque(maxlen=max_profiles)
+
+    def emit(self, profile):
+        self.profiles.append(profile.to_dict())
@@ -1,14 +1,38 @@
+import hashlib
+import json
 import os
-import pandas as pd
+import shutil
+import threading
+import time
 from langchain_core.documents import Document
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain.vectorstores.faiss import FAISS
 
+from src.answer_cache import AnswerCache
+from src.cleaner import Cleaner
+from src.embedding_cache import CachedEmbeddings, EmbeddingCache
+from src.retrieval_router import RetrievalRouter
+from src.snapshot_store import SnapshotStore
+from src.table_io import read_table
+
 
 class Model:
     """
     A Retrieval-Augmented Generation (RAG) pipeline for querying structured CSV data
     using vector embeddings and a language model.
+
+    The FAISS index is saved to disk with a manifest holding the hash of the embedded documents
+    and the embedding model, so that it is only rebuilt when the data or the model change.
+    It is loaded once and shared by every caller of `get_database`.
+    - Document embeddings go through a content-addressed `EmbeddingCache`, so that only new rows are embedded.
+    - When the data changes, the last saved index is updated incrementally: the vectors of removed rows
+      are deleted and the ones of new rows are added.
+    - Answers go through an `AnswerCache`, scoped by chat model, temperature, `k`, documents of the index
+      and entity names matched in the query by the router.
+    - The `k` vector search results are fused with exact entity name and BM25 matches by a `RetrievalRouter`,
+      which only keeps the documents needed in the prompt.
+    - The chat and embedding clients are created once and reused, with their HTTP connection pools,
+      and answers can be streamed token by token with `rag_stream`.
     """
     def __init__(
             self,
@@ -16,36 +40,100 @@ class Model:
             embedding_model="text-embedding-3-large",
             k=20,
             llm_model="gpt-4.1-mini",
-            temperature=0.2
+            temperature=0.2,
+            snapshot_store=None,
+            embeddings=None,
+            index_dir="cache/faiss",
+            keep_indexes=3,
+            embedding_cache=None,
+            embedding_batch_size=128,
+            embedding_workers=4,
+            answer_cache=None,
+            use_router=True,
+            llm=None,
+            base_url=None
             ):
+        """
+        Args:
+            api_key (str): OpenAI API key.
+            embedding_model (str): Name of the embedding model, also recorded in the index manifest.
+            k (int): Number of documents retrieved per query.
+            llm_model (str): Name of the chat model.
+            temperature (float): Sampling temperature of the chat model.
+            snapshot_store (SnapshotStore): Store of the published data snapshots.
+            embeddings (Embeddings): Embedding client, `OpenAIEmbeddings` of `embedding_model` by default,
+                e.g. a `DeterministicFakeEmbedding` to work offline.
+            index_dir (str): Directory of the saved FAISS indexes.
+            keep_indexes (int): Number of saved FAISS indexes kept, the most recently built ones.
+            embedding_cache (EmbeddingCache): Cache of the document embeddings, stored in `cache/` by default.
+            embedding_batch_size (int): Maximum number of documents per embedding call.
+            embedding_workers (int): Maximum number of embedding calls in flight.
+            answer_cache (AnswerCache): Cache of the answers of `rag`, exact lookups stored in `cache/` by default.
+            use_router (bool): Whether to route retrieval through a `RetrievalRouter` built with the index,
+                otherwise the `k` vector search results are all put in the prompt.
+            llm (BaseChatModel): Chat client, `ChatOpenAI` of `llm_model` created on first use by default.
+            base_url (str): Base URL of an OpenAI compatible API used by the default clients instead of OpenAI,
+                e.g. a local stand-in endpoint.
+        """
         self.api_key = api_key
         self.embedding_model = embedding_model
         self.k = k
         self.llm_model = llm_model
         self.temperature = temperature
+        self.snapshot_store = SnapshotStore() if snapshot_store is None else snapshot_store
+        self.base_url = base_url
+        # clients are created once, so that every call reuses their HTTP connections
+        self.llm = llm
+        embeddings = OpenAIEmbeddings(openai_api_key=self.api_key, model=self.embedding_model,
+                                      base_url=self.base_url) if embeddings is None else embeddings
+        self.embeddings = CachedEmbeddings(embeddings, EmbeddingCache() if embedding_cache is None else embedding_cache,
+                                           self.embedding_model, embedding_batch_size, embedding_workers)
+        self.index_dir = index_dir
+        self.keep_indexes = keep_indexes
+        self.lock = threading.Lock()
+        self.db_faiss = None
+        self.files_signature = None
+        self.last_index_update = None
+        self.answer_cache = AnswerCache() if answer_cache is None else answer_cache
+        self.use_router = use_router
+        self.router = None
+        self.last_answer_latency = None
 
-    def prepare_csv(self):
+    def prepare_csv(self, data_dir=None):
         """
-        Loads and preprocesses all CSV files from the `src/data` directory.
+        Loads and preprocesses all CSV files of the published data snapshot, the bundled `src/data` files
+        if none was published. The snapshot is resolved once, so a refresh publishing a new one meanwhile
+        doesn't mix files of both.
 
         Each cell is prefixed with its column name for added context.
         Rows are converted into LangChain `Document` objects with metadata
-        identifying their source file.
+        identifying their source file and their entity name, the value of their first column.
+
+        Args:
+            data_dir (str): Directory of the CSV files, the one of the published snapshot by default.
 
         Returns:
-            list: A list of document chunks representing all rows across the CSV files in `src/data`.
+            list: A list of document chunks representing all rows across the CSV files of the snapshot.
         """
         chunks = []
 
-        for file in os.listdir('src/data'):
-            df_temp = pd.read_csv(f'src/data/{file}')
+        data_dir = self.snapshot_store.get_current_dir() if data_dir is None else data_dir
+        sources = {file_name: source for source, file_name in self.snapshot_store.file_names.items()}
+        for file in sorted(os.listdir(data_dir)):
+            if not file.endswith('.csv'):
+                continue
+            # typed like the Arrow copies, so that documents are the same whether a copy exists or not
+            df_temp = read_table(os.path.join(data_dir, file), Cleaner.dtypes.get(sources.get(file)))
+            # missing values of typed columns are written as in the CSV files
+            df_temp = df_temp.astype(object).where(df_temp.notna(), float('nan'))
 
+            names = df_temp[df_temp.columns[0]].astype(str).tolist()
             for col in df_temp.columns.tolist():
                 df_temp[col] = df_temp[col].apply(lambda x: f"{col}: {x}")
 
-            for index, row in df_temp.iterrows():
+            for (index, row), name in zip(df_temp.iterrows(), names):
                 content = ", ".join(row.tolist())
-                metadata = {"source": file}
+                metadata = {"source": file, "name": name}
 
                 chunk = Document(
                     page_content=content,
@@ -57,42 +145,253 @@ class Model:
 
     def create_database(self, chunks):
         """
-        Creates a FAISS vector database from document chunks using OpenAI embeddings.
+        Creates a FAISS vector database from document chunks using the embedding client.
+
+        Args:
+            chunks (list): List of LangChain `Document` objects created from CSV files.
+
+        Returns:
+            FAISS: A FAISS vector store containing the embedded document representations.
+        """
+        db_faiss = FAISS.from_documents(chunks, self.embeddings, ids=self._get_document_ids(chunks))
+
+        return db_faiss
+
+    def _get_document_ids(self, chunks):
+        """
+        Computes content-addressed IDs of documents, so that an unchanged row keeps its ID across data versions.
+
+        Args:
+            chunks (list): List of LangChain `Document` objects created from CSV files.
+
+        Returns:
+            list: ID of each document, with an occurrence number to tell identical rows apart.
+        """
+        ids = []
+        occurrences = {}
+        for chunk in chunks:
+            content_id = hashlib.sha256(f"{chunk.metadata['source']}:{chunk.page_content}".encode()).hexdigest()
+            occurrences[content_id] = occurrences.get(content_id, -1) + 1
+            ids.append(f"{content_id}-{occurrences[content_id]}")
+        return ids
+
+    def _update_database(self, db_faiss, chunks):
+        """
+        Updates a FAISS vector database in place to hold exactly the given documents,
+        only deleting the vectors of removed documents and embedding the new ones.
 
         Args:
+            db_faiss (FAISS): A FAISS vector store built from other versions of the documents.
             chunks (list): List of LangChain `Document` objects created from CSV files.
 
+        Returns:
+            tuple: Numbers of added and removed documents.
+        """
+        ids = self._get_document_ids(chunks)
+        current_ids = set(db_faiss.index_to_docstore_id.values())
+        removed_ids = list(current_ids.difference(ids))
+        added = [(doc_id, chunk) for doc_id, chunk in zip(ids, chunks) if doc_id not in current_ids]
+        if len(removed_ids) > 0:
+            db_faiss.delete(removed_ids)
+        if len(added) > 0:
+            db_faiss.add_documents([chunk for doc_id, chunk in added], ids=[doc_id for doc_id, chunk in added])
+        return len(added), len(removed_ids)
+
+    def _get_latest_index_path(self):
+        """
+        Returns:
+            str or None: Path of the most recently used saved index of the embedding model, if any.
+        """
+        if not os.path.isdir(self.index_dir):
+            return None
+        index_paths = []
+        for name in os.listdir(self.index_dir):
+            manifest_path = os.path.join(self.index_dir, name, "manifest.json")
+            if name.endswith(".tmp") or not os.path.exists(manifest_path):
+                continue
+            with open(manifest_path) as f:
+                if json.load(f)['embedding_model'] == self.embedding_model:
+                    index_paths.append(os.path.join(self.index_dir, name))
+        return max(index_paths, key=os.path.getmtime, default=None)
+
+    def _get_data_hash(self, chunks):
+        """
+        Args:
+            chunks (list): List of LangChain `Document` objects created from CSV files.
+
+        Returns:
+            str: Hash of the content and metadata of the documents, in order.
+        """
+        data_hash = hashlib.sha256()
+        for chunk in chunks:
+            data_hash.update(json.dumps([chunk.page_content, chunk.metadata], sort_keys=True).encode())
+        return data_hash.hexdigest()
+
+    def load_or_create_database(self, data_dir=None):
+        """
+        Loads the saved FAISS index of the documents of `data_dir` if one was built with the same
+        embedding model. Otherwise, updates the last saved index of the embedding model incrementally,
+        or creates one if there is none, and saves it with its manifest.
+        The retrieval router is rebuilt from the same documents.
+
+        An index is saved into a temporary directory then renamed, and its manifest is written last,
+        so that other processes never load a half-written index.
+
+        Args:
+            data_dir (str): Directory of the CSV files, the one of the published snapshot by default.
+
         Returns:
             FAISS: A FAISS vector store containing the embedded document representations.
         """
-        embeddings = OpenAIEmbeddings(
-            openai_api_key=self.api_key,
-            model=self.embedding_model
-        )
+        chunks = self.prepare_csv(data_dir)
+        if self.use_router:
+            self.router = RetrievalRouter(chunks, max_k=self.k)
+        data_hash = self._get_data_hash(chunks)
+        index_key = hashlib.sha256(f"{self.embedding_model}:{data_hash}".encode()).hexdigest()[:16]
+        index_path = os.path.join(self.index_dir, index_key)
+
+        manifest_path = os.path.join(index_path, "manifest.json")
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            if manifest['data_hash'] == data_hash and manifest['embedding_model'] == self.embedding_model:
+                os.utime(index_path)
+                self.last_index_update = {'mode': 'loaded', 'added': 0, 'removed': 0}
+                # the docstore was pickled by this application
+                return FAISS.load_local(index_path, self.embeddings, allow_dangerous_deserialization=True)
 
-        db_faiss = FAISS.from_documents(chunks, embeddings)
+        latest_index_path = self._get_latest_index_path()
+        if latest_index_path is not None:
+            db_faiss = FAISS.load_local(latest_index_path, self.embeddings, allow_dangerous_deserialization=True)
+            added, removed = self._update_database(db_faiss, chunks)
+            self.last_index_update = {'mode': 'updated', 'added': added, 'removed': removed}
+        else:
+            db_faiss = self.create_database(chunks)
+            self.last_index_update = {'mode': 'created', 'added': len(chunks), 'removed': 0}
+
+        tmp_path = f"{index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        db_faiss.save_local(tmp_path)
+        with open(os.path.join(tmp_path, "manifest.json"), "w") as f:
+            json.dump({'data_hash': data_hash, 'embedding_model': self.embedding_model,
+                       'nb_documents': len(chunks), 'created_at': time.time(), 'update': self.last_index_update},
+                      f, indent=2)
+        shutil.rmtree(index_path, ignore_errors=True)
+        os.replace(tmp_path, index_path)
+        self._prune_indexes()
 
         return db_faiss
 
-    def rag(self, db_faiss, query):
+    def _prune_indexes(self):
+        """
+        Removes the saved FAISS indexes beyond the `keep_indexes` most recently used ones.
+        """
+        index_paths = [os.path.join(self.index_dir, name) for name in os.listdir(self.index_dir)
+                       if not name.endswith(".tmp")]
+        index_paths.sort(key=os.path.getmtime, reverse=True)
+        for index_path in index_paths[self.keep_indexes:]:
+            shutil.rmtree(index_path, ignore_errors=True)
+
+    def get_embedding_stats(self):
+        """
+        Returns:
+            dict: Embedding cache hits, misses and hit rate, embedding calls and embedded documents
+                of this model, and how the FAISS index was last obtained: 'loaded' as saved,
+                'updated' from a previous index with numbers of added and removed documents, or 'created'.
+        """
+        return {**self.embeddings.stats(), 'last_index_update': self.last_index_update}
+
+    def get_database(self):
         """
-        Performs Retrieval-Augmented Generation (RAG) to answer a query.
+        Returns the shared FAISS vector database, loading or creating it first if a new data snapshot
+        was published or a CSV file changed on disk, which is checked with a cheap `os.stat` of each file.
+
+        Returns:
+            FAISS: A FAISS vector store containing the embedded document representations.
+        """
+        data_dir = self.snapshot_store.get_current_dir()
+        paths = sorted(os.path.join(data_dir, file) for file in os.listdir(data_dir) if file.endswith('.csv'))
+        files_signature = tuple((path, os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths)
+        with self.lock:
+            if self.db_faiss is None or files_signature != self.files_signature:
+                self.db_faiss = self.load_or_create_database(data_dir)
+                self.files_signature = files_signature
+            return self.db_faiss
+
+    def _get_dataset_version(self, db_faiss):
+        """
+        Args:
+            db_faiss (FAISS): FAISS vector store containing embedded documents.
+
+        Returns:
+            str: Hash of the IDs of the documents of the store, which are content-addressed,
+                so that it changes whenever a document changes.
+        """
+        return hashlib.sha256("\n".join(sorted(db_faiss.index_to_docstore_id.values())).encode()).hexdigest()
+
+    def get_llm(self):
+        """
+        Returns the shared chat client, creating the default one on first use, so that indexing and retrieval
+        don't need a chat client nor its API key.
+
+        Returns:
+            BaseChatModel: Chat client of the assistant.
+        """
+        with self.lock:
+            if self.llm is None:
+                self.llm = ChatOpenAI(openai_api_key=self.api_key, model=self.llm_model,
+                                      temperature=self.temperature, base_url=self.base_url)
+            return self.llm
+
+    def get_answer_stats(self):
+        """
+        Returns:
+            dict: Answer cache hits, misses and hit rate, and latency of the last answer, see `rag_stream`.
+        """
+        return {**self.answer_cache.stats(), 'last_answer_latency': self.last_answer_latency}
+
+    def rag_stream(self, db_faiss, query):
+        """
+        Performs Retrieval-Augmented Generation (RAG) to answer a query, yielding the answer as it is generated.
 
         Steps:
-        1. Retrieves the top-k most relevant documents from the FAISS index.
+        0. Yields the cached answer of the same or, with a similarity threshold, a similar query if any.
+        1. Retrieves the top-k most relevant documents from the FAISS index, then fuses them
+           with entity name and lexical matches and keeps the needed ones, if routing is used.
         2. Merges their content into a context string.
         3. Constructs a prompt instructing the LLM to answer the query
            only from the retrieved context.
-        4. Calls the LLM and returns the generated response.
+        4. Streams the LLM response, then caches the full answer once it is complete.
+
+        Retrieval time, time to first token and total time are stored in `last_answer_latency`.
 
         Args:
             db_faiss (FAISS): FAISS vector store containing embedded documents.
             query (str): Natural language query to answer.
 
-        Returns:
-            str: The model's generated response based on retrieved context.
+        Yields:
+            str: Pieces of the model's generated response, in order.
         """
-        output_retrieval = db_faiss.similarity_search(query, k=self.k)
+        start = time.perf_counter()
+        # queries about different entities never share an answer, however similar they are
+        entities = [] if self.router is None else [" ".join(name) for name in self.router.match_names(query)]
+        scope = self.answer_cache.make_scope(self.llm_model, self.temperature, self.k,
+                                             self._get_dataset_version(db_faiss), entities)
+        # the query embedding is computed once on an exact miss, for the semantic lookup and the similarity search
+        found, answer, vector = self.answer_cache.get(scope, query, self.embeddings.embed_query)
+        if found:
+            elapsed = time.perf_counter() - start
+            self.last_answer_latency = {'cache_hit': True, 'retrieval_seconds': None,
+                                        'first_token_seconds': elapsed, 'total_seconds': elapsed}
+            yield answer
+            return
+
+        if vector is None:
+            output_retrieval = db_faiss.similarity_search(query, k=self.k)
+        else:
+            output_retrieval = db_faiss.similarity_search_by_vector(vector, k=self.k)
+        if self.router is not None:
+            output_retrieval = self.router.route(query, output_retrieval)
+        retrieval_seconds = time.perf_counter() - start
 
         output_retrieval_merged = "\n".join([doc.page_content for doc in output_retrieval])
 
@@ -103,12 +402,31 @@ class Model:
         Answer questions only about Monster Hunter Wilds.
         """
 
-        model = ChatOpenAI(
-            openai_api_key=self.api_key,
-            model=self.llm_model,
-            temperature=self.temperature
-        )
+        first_token_seconds = None
+        pieces = []
+        for chunk in self.get_llm().stream(prompt):
+            if len(chunk.content) == 0:
+                continue
+            if first_token_seconds is None:
+                first_token_seconds = time.perf_counter() - start
+            pieces.append(chunk.content)
+            yield chunk.content
+
+        # only reached once the whole answer was generated, a stream stopped midway isn't cached
+        self.last_answer_latency = {'cache_hit': False, 'retrieval_seconds': retrieval_seconds,
+                                    'first_token_seconds': first_token_seconds,
+                                    'total_seconds': time.perf_counter() - start}
+        self.answer_cache.set(scope, query, "".join(pieces), vector)
 
-        response_text = model.invoke(prompt)
+    def rag(self, db_faiss, query):
+        """
+        Performs Retrieval-Augmented Generation (RAG) to answer a query, see `rag_stream`.
 
-        return response_text.content
+        Args:
+            db_faiss (FAISS): FAISS vector store containing embedded documents.
+            query (str): Natural language query to answer.
+
+        Returns:
+            str: The model's generated response based on retrieved context.
+        """
+        return "".join(self.rag_stream(db_faiss, query))
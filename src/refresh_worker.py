@@ -0,0 +1,73 @@
+import threading
+import time
+import traceback
+
+from src.data_refresher import DataRefresher
+
+
+class RefreshWorker:
+    """
+    Runs data refreshes in a background thread, one at a time, and exposes their status for polling.
+
+    A refresh publishes a new snapshot only once it is complete, so requests served while it runs
+    keep using the previous snapshot instead of waiting for it.
+    """
+    def __init__(self, refresher_factory=DataRefresher):
+        """
+        Args:
+            refresher_factory (callable): Builds the `DataRefresher` of each refresh.
+        """
+        self.refresher_factory = refresher_factory
+        self.lock = threading.Lock()
+        self.thread = None
+        self.status = {'state': 'idle', 'started_at': None, 'finished_at': None, 'result': None, 'error': None}
+
+    def start(self):
+        """
+        Starts a refresh in the background, unless one is already running.
+
+        Returns:
+            bool: Whether a refresh was started.
+        """
+        with self.lock:
+            if self.status['state'] == 'running':
+                return False
+            self.status = {'state': 'running', 'started_at': time.time(), 'finished_at': None, 'result': None,
+                           'error': None}
+            self.thread = threading.Thread(target=self._run, name="data-refresh", daemon=True)
+            self.thread.start()
+        return True
+
+    def _run(self):
+        try:
+            result = self.refresher_factory().refresh()
+            update = {'state': 'succeeded', 'result': result}
+        except Exception as e:
+            traceback.print_exc()
+            update = {'state': 'failed', 'error': f"{type(e).__name__}: {e}"}
+        with self.lock:
+            self.status = {**self.status, **update, 'finished_at': time.time()}
+
+    def get_status(self):
+        """
+        Returns:
+            dict: State of the last refresh, 'idle', 'running', 'succeeded' or 'failed', its start and end
+                timestamps, the result of `DataRefresher.refresh` if it succeeded and the error if it failed.
+        """
+        with self.lock:
+            return dict(self.status)
+
+    def join(self, timeout=None):
+        """
+        Waits for the running refresh to finish, if any.
+
+        Args:
+            timeout (float): Maximum number of seconds to wait, no limit by default.
+
+        Returns:
+            dict: Status of the refresh, see `get_status`.
+        """
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.get_status()
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from src.sqlite_db import connect, create_tables
+
+
+class ResultCache:
+    """
+    A two-tier cache of generated armor sets.
+
+    Results are keyed on the ordered necessary skills, the sorting criterion and the version
+    of the dataset they were computed on, so that results computed on older CSV files are never served.
+    - An in-process LRU tier, bounded in size, with entries expiring after a TTL.
+    - An optional SQLite tier, shared by every process using the same database file.
+    """
+    def __init__(self, max_size=256, ttl=24 * 3600, db_path=None):
+        """
+        Args:
+            max_size (int): Maximum number of results kept in memory.
+            ttl (float): Number of seconds a result stays valid.
+            db_path (str): Path of the SQLite database of the on-disk tier, no on-disk tier if not given.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.db_path = db_path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.db_path is not None:
+            create_tables(self.db_path,
+                          "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, created_at REAL, value BLOB)")
+
+    def make_key(self, necessary_skills, sort_on, dataset_version, skill_targets=None):
+        """
+        Builds the cache key of a request.
+
+        Args:
+            necessary_skills (list): Skills required in the armor set, in priority order.
+            sort_on (str): Sorting criterion after skills, 'defense' or 'decorations'.
+            dataset_version (str): Version of the data the result is computed on.
+            skill_targets (dict): Target level of necessary skills reached with decorations, if any.
+
+        Returns:
+            str: Cache key.
+        """
+        request = [list(necessary_skills), sort_on, dataset_version]
+        if skill_targets is not None:
+            request.append(sorted(skill_targets.items()))
+        request = json.dumps(request)
+        return hashlib.sha256(request.encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Looks up a result, in memory first and then on disk.
+
+        Args:
+            key (str): Cache key, see `make_key`.
+
+        Returns:
+            tuple:
+                - bool: Whether the result was found.
+                - object: The cached result, None if not found.
+        """
+        now = time.time()
+        with self.lock:
+            if key in self.entries:
+                created_at, value = self.entries[key]
+                if now - created_at < self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                del self.entries[key]
+
+        if self.db_path is not None:
+            with connect(self.db_path) as connection:
+                row = connection.execute(
+                    "SELECT created_at, value FROM results WHERE key = ? AND created_at > ?",
+                    (key, now - self.ttl)).fetchone()
+            if row is not None:
+                value = pickle.loads(row[1])
+                self._set_in_memory(key, value, row[0])
+                with self.lock:
+                    self.disk_hits += 1
+                return True, value
+
+        with self.lock:
+            self.misses += 1
+        return False, None
+
+    def _set_in_memory(self, key, value, created_at):
+        """
+        Stores a result in the in-process tier, evicting the least recently used ones beyond `max_size`.
+
+        Args:
+            key (str): Cache key.
+            value (object): Result to store.
+            created_at (float): Timestamp the result was computed at.
+        """
+        with self.lock:
+            self.entries[key] = (created_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def set(self, key, value):
+        """
+        Stores a result in every tier, and removes expired results from disk.
+
+        Args:
+            key (str): Cache key, see `make_key`.
+            value (object): Result to store, it must be picklable.
+        """
+        now = time.time()
+        self._set_in_memory(key, value, now)
+        if self.db_path is not None:
+            with connect(self.db_path) as connection:
+                connection.execute("DELETE FROM results WHERE created_at <= ?", (now - self.ttl,))
+                connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                                   (key, now, pickle.dumps(value)))
+
+    def clear(self):
+        """
+        Removes every result from every tier.
+        """
+        with self.lock:
+            self.entries.clear()
+        if self.db_path is not None:
+            with connect(self.db_path) as connection:
+                connection.execute("DELETE FROM results")
+
+    def stats(self):
+        """
+        Returns the counters of the cache, for monitoring.
+
+        Returns:
+            dict: Number of hits in memory and on disk, misses, and results currently kept in memory.
+        """
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'size': len(self.entries),
+            }
@@ -0,0 +1,183 @@
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+import numpy as np
+
+
+def tokenize(text):
+    """
+    Args:
+        text (str): Text to split into terms.
+
+    Returns:
+        list: Terms of the text, in lower case and without accents nor punctuation.
+    """
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return re.sub(r"[^\w\s]|_", " ", text).split()
+
+
+class RetrievalRouter:
+    """
+    A hybrid retriever of the rows of the CSV files, run before the vector search results are sent to the LLM.
+
+    Four rankings of the documents are fused with Reciprocal Rank Fusion (RRF):
+    - An inverted index of entity names (armors, skills, talismans and decorations), matching the names
+      written in full in the query. Rows of a named entity are always kept.
+    - The rows mentioning a named entity, e.g. the armor pieces having a named skill, by BM25 score.
+    - A BM25 lexical index over the content of the rows.
+    - The vector search results.
+    The number of kept documents is cut adaptively: documents whose fused score falls below
+    `cutoff_ratio` times the best one are dropped, keeping between `min_k` and `max_k` documents.
+    """
+    def __init__(self, chunks, min_k=5, max_k=20, cutoff_ratio=0.4, rrf_k=60, bm25_k1=1.2, bm25_b=0.75):
+        """
+        Args:
+            chunks (list): LangChain `Document` objects of the CSV rows, with the entity name of the row
+                under the 'name' metadata.
+            min_k (int): Minimum number of documents kept, besides entity matches.
+            max_k (int): Maximum number of documents kept, besides entity matches.
+            cutoff_ratio (float): Minimum fused score of a kept document, relative to the best one.
+            rrf_k (int): Rank offset of RRF, damping the weight of the first ranks.
+            bm25_k1 (float): Term frequency saturation of BM25.
+            bm25_b (float): Document length normalization of BM25.
+        """
+        self.chunks = chunks
+        self.min_k = min_k
+        self.max_k = max_k
+        self.cutoff_ratio = cutoff_ratio
+        self.rrf_k = rrf_k
+        self.bm25_k1 = bm25_k1
+        self.bm25_b = bm25_b
+        self.position_by_content = {(chunk.metadata['source'], chunk.page_content): i
+                                    for i, chunk in enumerate(chunks)}
+
+        self.positions_by_name = defaultdict(list)
+        for i, chunk in enumerate(chunks):
+            name = str(chunk.metadata.get('name', ""))
+            # decorations are also named without their size and rarity, e.g. "Adapt Jewel【1】Rarity 3"
+            for alias in {tuple(tokenize(name)), tuple(tokenize(name.split("【")[0]))}:
+                if len(alias) > 0:
+                    self.positions_by_name[alias].append(i)
+        self.max_name_length = max((len(name) for name in self.positions_by_name), default=0)
+
+        self.postings = defaultdict(list)
+        doc_lengths = []
+        for i, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk.page_content))
+            for term, frequency in terms.items():
+                self.postings[term].append((i, frequency))
+            doc_lengths.append(sum(terms.values()))
+        self.doc_lengths = np.array(doc_lengths, dtype=np.float64)
+        self.average_doc_length = self.doc_lengths.mean() if len(chunks) > 0 else 0.0
+        self.postings = {
+            term: (np.array([i for i, f in postings]), np.array([f for i, f in postings], dtype=np.float64))
+            for term, postings in self.postings.items()}
+
+    def match_names(self, query):
+        """
+        Finds the entity names written in full in a query.
+
+        Args:
+            query (str): Query of the user.
+
+        Returns:
+            list: Matched names as tuples of terms, longest names first, e.g. "Rathalos Helm alpha"
+                before a skill named "Helm".
+        """
+        terms = tokenize(query)
+        names = set()
+        for start in range(len(terms)):
+            for end in range(start + 1, min(start + self.max_name_length, len(terms)) + 1):
+                if tuple(terms[start:end]) in self.positions_by_name:
+                    names.add(tuple(terms[start:end]))
+        return sorted(names, key=len, reverse=True)
+
+    def match_entities(self, names):
+        """
+        Args:
+            names (list): Entity names, see `match_names`.
+
+        Returns:
+            list: Positions of the rows of the entities, in the order of `names`.
+        """
+        positions = []
+        for name in names:
+            positions += [i for i in self.positions_by_name[name] if i not in positions]
+        return positions
+
+    def match_mentions(self, names):
+        """
+        Finds the rows mentioning entities, e.g. the armor pieces having a named skill.
+
+        Args:
+            names (list): Entity names, see `match_names`.
+
+        Returns:
+            set: Positions of the rows holding every term of one of the names.
+        """
+        positions = set()
+        for name in names:
+            if all(term in self.postings for term in name):
+                positions.update(set.intersection(*(set(self.postings[term][0].tolist()) for term in name)))
+        return positions
+
+    def bm25_search(self, query, k):
+        """
+        Ranks the rows by BM25 score.
+
+        Args:
+            query (str): Query of the user.
+            k (int): Maximum number of rows returned.
+
+        Returns:
+            list: Positions of the best rows with a positive score, best first.
+        """
+        scores = np.zeros(len(self.chunks))
+        for term in set(tokenize(query)):
+            if term not in self.postings:
+                continue
+            positions, frequencies = self.postings[term]
+            idf = math.log(1 + (len(self.chunks) - len(positions) + 0.5) / (len(positions) + 0.5))
+            length_ratio = self.doc_lengths[positions] / self.average_doc_length
+            norm = self.bm25_k1 * (1 - self.bm25_b + self.bm25_b * length_ratio)
+            scores[positions] += idf * frequencies * (self.bm25_k1 + 1) / (frequencies + norm)
+        best = np.argsort(-scores, kind='stable')[:k]
+        return [int(i) for i in best if scores[i] > 0]
+
+    def route(self, query, vector_docs):
+        """
+        Fuses the entity, lexical and vector rankings of the rows and keeps the ones needed to answer.
+
+        Args:
+            query (str): Query of the user.
+            vector_docs (list): Documents returned by the vector search, best first.
+
+        Returns:
+            list: Documents to put in the prompt, most relevant first.
+        """
+        names = self.match_names(query)
+        entity_positions = self.match_entities(names)
+        mention_positions = self.match_mentions(names)
+        vector_keys = [(doc.metadata['source'], doc.page_content) for doc in vector_docs]
+        vector_positions = [self.position_by_content[key] for key in vector_keys if key in self.position_by_content]
+        bm25_positions = self.bm25_search(query, len(self.chunks))
+        rankings = [entity_positions, [i for i in bm25_positions if i in mention_positions],
+                    bm25_positions[:len(vector_docs) or self.max_k], vector_positions]
+
+        scores = defaultdict(float)
+        for ranking in rankings:
+            for rank, position in enumerate(ranking):
+                scores[position] += 1 / (self.rrf_k + rank + 1)
+        fused = sorted(scores, key=lambda position: -scores[position])
+
+        kept = []
+        for position in fused:
+            if len(kept) >= self.max_k or (len(kept) >= self.min_k and
+                                          scores[position] < self.cutoff_ratio * scores[fused[0]]):
+                break
+            kept.append(position)
+        # named entities are what the question is about, they are never cut
+        kept = entity_positions + [position for position in kept if position not in entity_positions]
+        return [self.chunks[position] for position in kept]
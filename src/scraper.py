@@ -1,7 +1,168 @@
-import requests
-from bs4 import BeautifulSoup
+from html.parser import HTMLParser
 import pandas as pd
 
+from src.http_cache import HttpCache
+from src.http_fetcher import HttpFetcher
+
+
+class TableParser(HTMLParser):
+    """
+    A streaming HTML parser extracting the first table that has a given column header, as plain lists.
+
+    Only table elements are tracked, and the page is fed in chunks so that parsing stops as soon as
+    the matching table is closed. Like with BeautifulSoup, a nested table is part of every table containing it:
+    its headers, rows and cells are also theirs, so the first table to open with the header is the outermost one.
+    Cell texts are built like `get_text(strip=True)` of BeautifulSoup: every text node is stripped once complete,
+    a node being fed in several pieces when it crosses chunks.
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, text):
+        """
+        Args:
+            text (str): Text content to match in one of the table headers (e.g., 'Slots').
+        """
+        super().__init__()
+        self.text = text
+        self.tables = []
+        self.table = None
+        self.skip_depth = 0
+        self.text_parts = []
+
+    def _close_text(self):
+        """
+        Adds the text node ended by a tag, a comment or the end of the page to the open cells.
+        """
+        if len(self.text_parts) == 0:
+            return
+        text = "".join(self.text_parts)
+        self.text_parts = []
+        # the text of a cell includes the text of the tables it contains
+        for table in self.tables:
+            if table['cell'] is not None:
+                table['cell']['parts'].append(text)
+
+    def _get_text(self, cell):
+        return "".join(part.strip() for part in cell['parts'])
+
+    def _close_cell(self, table):
+        cell = table['cell']
+        if cell is None:
+            return
+        table['cell'] = None
+        if cell['tag'] == 'th' and "".join(cell['parts']) == self.text:
+            # the header is also one of the tables containing this one
+            for open_table in self.tables:
+                open_table['matched'] = True
+
+    def _close_row(self, table):
+        self._close_cell(table)
+        table['row'] = None
+
+    def _close_table(self):
+        table = self.tables.pop()
+        self._close_row(table)
+        # tables containing a matching table match too, so the first one to open is the first to close at top level
+        if table['matched'] and len(self.tables) == 0 and self.table is None:
+            self.table = {
+                'columns': [self._get_text(cell) for cell in table['columns']],
+                'rows': [[self._get_text(cell) for cell in row['cells']] for row in table['rows']],
+                'body_rows': [[self._get_text(cell) for cell in row['cells']] for row in table['body_rows']],
+                'body_links': [row['link'] for row in table['body_rows']],
+            }
+
+    def handle_starttag(self, tag, attrs):
+        self._close_text()
+        if tag in ['script', 'style']:
+            self.skip_depth += 1
+        elif tag == 'table':
+            # tbody_depth is None until the first tbody of the table, the only one read, and 0 once it is closed
+            self.tables.append({'columns': [], 'rows': [], 'body_rows': [], 'matched': False,
+                                'tbody_depth': None, 'row': None, 'cell': None})
+        elif len(self.tables) > 0:
+            table = self.tables[-1]
+            match tag:
+                case 'tbody':
+                    for open_table in self.tables:
+                        if open_table['tbody_depth'] is None:
+                            open_table['tbody_depth'] = 1
+                        elif open_table['tbody_depth'] > 0:
+                            open_table['tbody_depth'] += 1
+                case 'tr':
+                    self._close_row(table)
+                    table['row'] = {'cells': [], 'link': None, 'has_anchor': False}
+                    for open_table in self.tables:
+                        open_table['rows'].append(table['row'])
+                        if open_table['tbody_depth'] is not None and open_table['tbody_depth'] > 0:
+                            open_table['body_rows'].append(table['row'])
+                case 'th':
+                    self._close_cell(table)
+                    table['cell'] = {'tag': tag, 'parts': []}
+                    for open_table in self.tables:
+                        open_table['columns'].append(table['cell'])
+                case 'td':
+                    self._close_cell(table)
+                    table['cell'] = {'tag': tag, 'parts': []}
+                    for open_table in self.tables:
+                        if open_table['row'] is not None:
+                            open_table['row']['cells'].append(table['cell'])
+                case 'a':
+                    for open_table in self.tables:
+                        row = open_table['row']
+                        if row is not None and not row['has_anchor']:
+                            row['has_anchor'] = True
+                            row['link'] = dict(attrs).get('href')
+
+    def handle_endtag(self, tag):
+        self._close_text()
+        if tag in ['script', 'style']:
+            self.skip_depth = max(0, self.skip_depth - 1)
+        elif len(self.tables) > 0:
+            table = self.tables[-1]
+            match tag:
+                case 'table':
+                    self._close_table()
+                case 'tbody':
+                    for open_table in self.tables:
+                        if open_table['tbody_depth'] is not None and open_table['tbody_depth'] > 0:
+                            open_table['tbody_depth'] -= 1
+                case 'tr':
+                    self._close_row(table)
+                case 'th' | 'td':
+                    self._close_cell(table)
+
+    def handle_comment(self, data):
+        self._close_text()
+
+    def handle_data(self, data):
+        if self.skip_depth == 0:
+            self.text_parts.append(data)
+
+    def parse(self, html):
+        """
+        Parses a page until the first table with the column header is closed, tables left open by the page
+        being closed at its end.
+
+        Args:
+            html (str): The webpage content.
+
+        Returns:
+            dict or None: The table if found, otherwise None, with:
+                - 'columns': Texts of every header cell.
+                - 'rows': Texts of the data cells of every row.
+                - 'body_rows': Texts of the data cells of every row of the table body.
+                - 'body_links': Link of the first anchor of every row of the table body, None if there is none.
+        """
+        for start in range(0, len(html), self.chunk_size):
+            self.feed(html[start:start + self.chunk_size])
+            if self.table is not None:
+                return self.table
+        self.close()
+        self._close_text()
+        while len(self.tables) > 0 and self.table is None:
+            self._close_table()
+        return self.table
+
 
 class Scraper:
     """
@@ -10,6 +171,8 @@ class Scraper:
     This class retrieves tables containing information about decorations, armors,
     skills, and talismans from various pre-defined URLs. The resulting data is returned
     as pandas DataFrames ready for further processing.
+    Pages are fetched through an `HttpFetcher`, concurrently when several pages are needed,
+    and with conditional requests against an on-disk `HttpCache` by default.
     """
     def __init__(
             self,
@@ -23,6 +186,7 @@ class Scraper:
             armors_by_monster_high_url="https://game8.co/games/Monster-Hunter-Wilds/archives/500343",
             skills_info_url="https://game8.co/games/Monster-Hunter-Wilds/archives/482545",
             talismans_url="https://game8.co/games/Monster-Hunter-Wilds/archives/497353",
+            fetcher=None,
             ):
         self.decoration_url = decoration_url
         self.head_armors_url = head_armors_url
@@ -34,6 +198,20 @@ class Scraper:
         self.armors_by_monster_high_url = armors_by_monster_high_url
         self.skills_info_url = skills_info_url
         self.talismans_url = talismans_url
+        self.fetcher = HttpFetcher(cache=HttpCache()) if fetcher is None else fetcher
+
+    def _get_table_from_html(self, html, text):
+        """
+        Retrieves the first HTML table of a page that contains a specific column header.
+
+        Args:
+            html (str): The webpage content.
+            text (str): Text content to match in one of the table headers (e.g., 'Slots').
+
+        Returns:
+            dict: The table as plain lists if found (see `TableParser.parse`), otherwise None.
+        """
+        return TableParser(text).parse(html)
 
     def _get_table_from_url(self, url, text):
         """
@@ -44,14 +222,9 @@ class Scraper:
             text (str): Text content to match in one of the table headers (e.g., 'Slots').
 
         Returns:
-            bs4.element.Tag: The BeautifulSoup table tag if found, otherwise None.
+            dict: The table as plain lists if found (see `TableParser.parse`), otherwise None.
         """
-        page = requests.get(url)
-        soup = BeautifulSoup(page.text, "html.parser")
-        tables = soup.find_all('table')
-        for table in tables:
-            if len(table.find_all('th', text=text)) >= 1:
-                return table
+        return self._get_table_from_html(self.fetcher.get(url), text)
 
     def decorations_scraping(self):
         """
@@ -64,26 +237,22 @@ class Scraper:
             pandas.DataFrame: A DataFrame containing decoration data.
         """
         table = self._get_table_from_url(self.decoration_url, "Slots")
-        columns = [col_name.get_text(strip=True) for col_name in table.find_all("th")]
-        data = []
-
-        for tr in table.find("tbody").find_all("tr"):
-            data.append([td.get_text(strip=True) for td in tr.find_all("td")])
+        columns = table['columns']
+        data = table['body_rows']
         df_decorations = pd.DataFrame(data, columns=columns)
         return df_decorations
 
-    def armors_scraping(self):
+    def armors_by_type_scraping(self):
         """
-        Scrapes armor data from multiple armor-type URLs and retrieves decoration slot info from monster-specific pages.
+        Scrapes armor data from multiple armor-type URLs and lists the monster-specific armor pages.
 
         - Merges armor pieces of different types into a unified DataFrame.
-        - Collects slot sizes by scraping linked monster-specific armor pages.
-        - Converts the raw HTML data into two pandas DataFrame.
+        - Fetches the armor-type and monster index pages concurrently.
 
         Returns:
             tuple:
                 - pandas.DataFrame: Armor data with type labels.
-                - pandas.DataFrame: Decoration slot information per armor piece.
+                - list: Links of the monster-specific armor pages, holding decoration slot info.
         """
         # get data from armors by type (head, chest, arm, waist and leg)
         df_armors = pd.DataFrame()
@@ -96,37 +265,64 @@ class Scraper:
             ]
 
         armor_types = ["head", "chest", "arm", "waist", "leg"]
+        armors_by_monster_urls = [self.armors_by_monster_low_url, self.armors_by_monster_high_url]
 
-        for i, url in enumerate(armors_by_type_urls):
-            table = self._get_table_from_url(url, "Armor")
-            columns = [col_name.get_text(strip=True) for col_name in table.find_all("th")]
-            columns.append("Armor_type")
-            data = []
+        pages = self.fetcher.get_many(armors_by_type_urls + armors_by_monster_urls)
+        for page in pages:
+            if isinstance(page, Exception):
+                raise page
 
-            for tr in table.find("tbody").find_all("tr"):
-                row = [td.get_text(strip=True) for td in tr.find_all("td")]
-                row.append(armor_types[i])
-                data.append(row)
+        for i, page in enumerate(pages[:len(armors_by_type_urls)]):
+            table = self._get_table_from_html(page, "Armor")
+            columns = table['columns'] + ["Armor_type"]
+            data = [row + [armor_types[i]] for row in table['body_rows']]
             df_armors = pd.concat([df_armors, pd.DataFrame(data, columns=columns)])
 
+        armors_decorations_slots_links = []
+        for page in pages[len(armors_by_type_urls):]:
+            table = self._get_table_from_html(page, "Skills")
+            armors_decorations_slots_links += [link for link in table['body_links'] if link is not None]
+
+        return df_armors, armors_decorations_slots_links
+
+    def decorations_slots_scraping(self, page):
+        """
+        Scrapes the decoration slots table of a monster-specific armor page.
+
+        Args:
+            page (str): Content of the monster-specific armor page.
+
+        Returns:
+            pandas.DataFrame: Decoration slot information per armor piece of the page.
+        """
+        table = self._get_table_from_html(page, "Slots")
+        return pd.DataFrame(table['rows'], columns=table['columns'])
+
+    def armors_scraping(self):
+        """
+        Scrapes armor data from multiple armor-type URLs and retrieves decoration slot info from monster-specific pages.
+
+        - Merges armor pieces of different types into a unified DataFrame.
+        - Collects slot sizes by scraping linked monster-specific armor pages.
+        - Fetches the armor-type and monster index pages concurrently, then the monster-specific pages.
+        - Converts the raw HTML data into two pandas DataFrame.
+
+        Returns:
+            tuple:
+                - pandas.DataFrame: Armor data with type labels.
+                - pandas.DataFrame: Decoration slot information per armor piece.
+        """
+        df_armors, armors_decorations_slots_links = self.armors_by_type_scraping()
+
         # get decorations slots from armors by monster
         df_decorations_slots = pd.DataFrame()
 
-        armors_decorations_slots_links = []
-        for armors_by_monster_url in [self.armors_by_monster_low_url, self.armors_by_monster_high_url]:
-            table = self._get_table_from_url(armors_by_monster_url, "Skills")
-            anchors = [tr.find("a") for tr in table.find("tbody").find_all("tr")]
-            armors_decorations_slots_links += [a.get('href') for a in anchors]
-
-        for link in armors_decorations_slots_links:
+        slots_pages = self.fetcher.get_many(armors_decorations_slots_links)
+        for link, page in zip(armors_decorations_slots_links, slots_pages):
             try:
-                table = self._get_table_from_url(link, "Slots")
-                columns = [col_name.get_text(strip=True) for col_name in table.find_all("th")]
-                data = []
-
-                for tr in table.find_all("tr"):
-                    data.append([td.get_text(strip=True) for td in tr.find_all("td")])
-                df_decorations_slots = pd.concat([df_decorations_slots, pd.DataFrame(data, columns=columns)])
+                if isinstance(page, Exception):
+                    raise page
+                df_decorations_slots = pd.concat([df_decorations_slots, self.decorations_slots_scraping(page)])
             except Exception as e:
                 print(e)
                 print(link)
@@ -145,11 +341,8 @@ class Scraper:
             pandas.DataFrame: A DataFrame containing skill names, effects, and related metadata.
         """
         table = self._get_table_from_url(self.skills_info_url, "Type")
-        columns = [col_name.get_text(strip=True) for col_name in table.find_all("th")]
-        data = []
-
-        for tr in table.find("tbody").find_all("tr"):
-            data.append([td.get_text(strip=True) for td in tr.find_all("td")])
+        columns = table['columns']
+        data = table['body_rows']
         df_skills_info = pd.DataFrame(data, columns=columns)
         return df_skills_info
 
@@ -164,10 +357,7 @@ class Scraper:
             pandas.DataFrame: A DataFrame containing talisman information.
         """
         table = self._get_table_from_url(self.talismans_url, "Talisman")
-        columns = [col_name.get_text(strip=True) for col_name in table.find_all("th")]
-        data = []
-
-        for tr in table.find("tbody").find_all("tr"):
-            data.append([td.get_text(strip=True) for td in tr.find_all("td")])
+        columns = table['columns']
+        data = table['body_rows']
         df_talismans = pd.DataFrame(data, columns=columns)
         return df_talismans
@@ -0,0 +1,875 @@
+import heapq
+import multiprocessing
+import os
+import pickle
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from copy import copy
+import numpy as np
+import pandas as pd
+
+from src.armor_set import ArmorSet
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_shard_engine_key = None
+_shard_engine = None
+
+
+def _get_pool(max_workers):
+    """
+    Returns the worker processes shared by every search of this process, started on first use.
+
+    Workers are started by a fork server, or spawned where there is none, but never forked from the caller:
+    forking a multithreaded process such as the Streamlit server can deadlock the children.
+
+    Args:
+        max_workers (int): Number of worker processes.
+
+    Returns:
+        ProcessPoolExecutor: Pool of `max_workers` worker processes.
+    """
+    with _pools_lock:
+        if max_workers not in _pools:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pools[max_workers] = ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context(start_method))
+        return _pools[max_workers]
+
+
+def _discard_pool(max_workers, pool):
+    """
+    Forgets a broken pool, e.g. after a worker was killed, so that the next search starts a new one.
+    """
+    with _pools_lock:
+        if _pools.get(max_workers) is pool:
+            del _pools[max_workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _search_shard(args):
+    """
+    Searches one shard of combinations, unpickling the engine of the search once per worker process.
+
+    Args:
+        args (tuple): Key and pickled engine of the search, number of armors to keep, number of shard categories,
+            first and last shard prefixes.
+
+    Returns:
+        tuple: Ranking keys and flat indices of the k best valid combinations of the shard.
+    """
+    global _shard_engine_key, _shard_engine
+    engine_key, engine_bytes, *shard = args
+    if engine_key != _shard_engine_key:
+        _shard_engine = pickle.loads(engine_bytes)
+        _shard_engine_key = engine_key
+    return _shard_engine._exhaustive_search_shard(*shard)
+
+
+class SetEngine:
+    """
+    A vectorized armor set search engine working on dense per-category matrices.
+
+    Usable armors and talismans are loaded once into NumPy arrays (defense, skill levels,
+    decoration slots) and every head/chest/arm/waist/leg/talisman combination is evaluated
+    in chunks with broadcasted sums instead of one `ArmorSet` object per combination.
+    Combinations are enumerated in the same order as `SetMaker._armor_set_recursion`,
+    so ties are broken exactly like the legacy pipeline.
+    """
+    armor_cat = ['head', 'chest', 'arm', 'waist', 'leg']
+    categories = armor_cat + ['talisman']
+    # below it, the 'parallel' strategy searches in the calling process, see `parallel_search`: sending the shards
+    # to warm workers costs about 10 ms, the time of ~20k combinations, so 100k leaves a clear gain with 2 workers
+    parallel_min_combinations = 100_000
+
+    def __init__(self, df_usable_armors, filtered_df_talismans, df_skills, necessary_skills, defense_rules,
+                 sort_on='defense', chunk_size=1_000_000, memory_limit_mb=None, decoration_fitter=None,
+                 skill_targets=None):
+        """
+        Args:
+            df_usable_armors (pandas.DataFrame): Candidate armors (relevant ones and best ones by type),
+                with a 'Decorations_score' column.
+            filtered_df_talismans (pandas.DataFrame): Talismans filtered by relevant skills.
+            df_skills (pandas.DataFrame): Skill data containing max level for each skill.
+            necessary_skills (list): Skills required in the final armor set, in priority order.
+            defense_rules (dict): Percentage and flat defense bonus arrays indexed by level, keyed by skill name,
+                as loaded by `SetMaker._load_defense_rules`.
+            sort_on (str): Criteria to sort by after skills; either 'defense' or 'decorations'.
+            chunk_size (int): Maximum number of combinations evaluated at once.
+            memory_limit_mb (float): Optional memory ceiling of a chunk, in megabytes. The chunk size
+                is reduced to fit it.
+            decoration_fitter (DecorationFitter): Fitter of the decorations closing the skill targets,
+                required with `skill_targets`.
+            skill_targets (dict): Optional target level of necessary skills. Combinations below a target
+                are only valid if decorations can close the gap with their free slots, and are then ranked
+                with the skill levels and free slots left after the decorations.
+        """
+        self.necessary_skills = necessary_skills
+        self.sort_on = sort_on
+        self.chunk_size = chunk_size
+        self.decoration_fitter = decoration_fitter
+        self.skill_targets = skill_targets
+
+        self.rows = {cat: [armor for id, armor in df_usable_armors[df_usable_armors['Armor_type'] == cat].iterrows()]
+                     for cat in self.armor_cat}
+        self.rows['talisman'] = [talisman for id, talisman in filtered_df_talismans.iterrows()]
+        self.sizes = [len(self.rows[cat]) for cat in self.categories]
+        self.n_combinations = int(np.prod(self.sizes, dtype=np.int64))
+
+        self._load_matrices(df_skills, defense_rules)
+        if memory_limit_mb is not None:
+            self.chunk_size = max(1, min(chunk_size, int(memory_limit_mb * 2**20 // self._get_bytes_per_combination())))
+
+    def _get_skill_levels(self, row, cat):
+        """
+        Lists the (skill name, skill level) pairs given by an armor piece or a talisman.
+
+        Args:
+            row (pandas.Series): The armor or talisman data.
+            cat (str): The category of the row ('head', ..., 'leg' or 'talisman').
+
+        Returns:
+            list: Pairs of skill name and skill level.
+        """
+        if cat == 'talisman':
+            return [(row['Skill_name'], row['Skill_lvl'])]
+        return [(row[f'{col}_name'], row[f'{col}_lvl']) for col in ['Skill_1', 'Skill_2', 'Skill_3']
+                if not pd.isnull(row[f'{col}_name'])]
+
+    def _load_matrices(self, df_skills, defense_rules):
+        """
+        Builds the dense matrices of every category.
+
+        Only "active" skills are kept as matrix columns: necessary skills, defensive skills and
+        skills that could exceed their max level. Other skills can never change validity nor ranking.
+
+        Args:
+            df_skills (pandas.DataFrame): Skill data containing max level for each skill.
+            defense_rules (dict): Defense bonus arrays indexed by level, keyed by skill name.
+        """
+        skill_max_levels = df_skills.set_index('Skill')['skill_max_level']
+        defense_skill_names = sorted(defense_rules)
+
+        levels_by_cat = {cat: [dict() for row in self.rows[cat]] for cat in self.categories}
+        for cat in self.categories:
+            for levels, row in zip(levels_by_cat[cat], self.rows[cat]):
+                for skill_name, skill_lvl in self._get_skill_levels(row, cat):
+                    levels[skill_name] = levels.get(skill_name, 0) + int(skill_lvl)
+
+        reachable = {}
+        for cat in self.categories:
+            best_by_skill = {}
+            for levels in levels_by_cat[cat]:
+                for skill_name, skill_lvl in levels.items():
+                    best_by_skill[skill_name] = max(best_by_skill.get(skill_name, 0), skill_lvl)
+            for skill_name, skill_lvl in best_by_skill.items():
+                reachable[skill_name] = reachable.get(skill_name, 0) + skill_lvl
+
+        self.skill_names = [skill_name for skill_name in reachable
+                            if skill_name in self.necessary_skills
+                            or skill_name in defense_skill_names
+                            or reachable[skill_name] > skill_max_levels.get(skill_name, np.inf)]
+        for skill_name in self.necessary_skills:
+            if skill_name not in self.skill_names:
+                self.skill_names.append(skill_name)
+        skill_index = {skill_name: i for i, skill_name in enumerate(self.skill_names)}
+        self.max_levels = np.array([skill_max_levels.get(skill_name, np.iinfo(np.int16).max)
+                                    for skill_name in self.skill_names], dtype=np.int16)
+
+        self.skills, self.defense, self.nb_decorations, self.decorations_score = {}, {}, {}, {}
+        for cat in self.categories:
+            skills = np.zeros((len(self.rows[cat]), len(self.skill_names)), dtype=np.int16)
+            for i, levels in enumerate(levels_by_cat[cat]):
+                for skill_name, skill_lvl in levels.items():
+                    if skill_name in skill_index:
+                        skills[i, skill_index[skill_name]] = skill_lvl
+            self.skills[cat] = skills
+
+            if cat == 'talisman':
+                self.defense[cat] = np.zeros(len(self.rows[cat]), dtype=np.int64)
+                self.nb_decorations[cat] = np.zeros((len(self.rows[cat]), 3), dtype=np.int16)
+                self.decorations_score[cat] = np.zeros(len(self.rows[cat]), dtype=np.int64)
+                continue
+
+            decoration_cols_names = ['Decoration_slot_1_size', 'Decoration_slot_2_size', 'Decoration_slot_3_size']
+            self.defense[cat] = np.array([row['Defense'] for row in self.rows[cat]], dtype=np.int64)
+            slots = np.array([[row[col] for col in decoration_cols_names] for row in self.rows[cat]],
+                             dtype=np.float64).reshape(-1, 3)
+            self.nb_decorations[cat] = np.stack([(slots == size).sum(axis=1) for size in [1, 2, 3]],
+                                                axis=1).astype(np.int16)
+            self.decorations_score[cat] = np.array([row['Decorations_score'] for row in self.rows[cat]],
+                                                   dtype=np.float64).round().astype(np.int64)
+
+        # defense bonuses as level-indexed lookup arrays, applied in the same order as the legacy pipeline
+        self.defense_rules = []
+        for skill_name in defense_skill_names:
+            if skill_name not in skill_index:
+                continue
+            percentage, flat = defense_rules[skill_name]
+            self.defense_rules.append((skill_index[skill_name], percentage, flat))
+
+        # best bonus reachable at or below each level, used to bound the final defense of partial sets
+        self.bound_defense_rules = [(i, np.maximum.accumulate(percentage), np.maximum.accumulate(flat))
+                                    for i, percentage, flat in self.defense_rules]
+
+        # a skill below its target ends between the target and the overshoot of the last jewel closing it
+        self.target_bound_levels = np.zeros(len(self.skill_names), dtype=np.int16)
+        for skill_name, target in (self.skill_targets or {}).items():
+            jewel_lvls = [jewel_lvl for jewel_name, jewel_size, jewel_lvl
+                          in self.decoration_fitter.jewels_by_skill.get(skill_name, [])]
+            if len(jewel_lvls) > 0:
+                i = skill_index[skill_name]
+                self.target_bound_levels[i] = min(self.max_levels[i], target + max(jewel_lvls) - 1)
+
+    def _bound_levels_with_decorations(self, skills):
+        """
+        Bounds the skill levels combinations can reach once decorations close their skill targets.
+
+        Args:
+            skills (numpy.ndarray): Skill levels before decorations, or optimistic bounds of them,
+                with the active skills on the last axis.
+
+        Returns:
+            numpy.ndarray: Optimistic bounds of the skill levels after decorations.
+        """
+        if self.skill_targets is None:
+            return skills
+        return np.maximum(skills, self.target_bound_levels.astype(skills.dtype))
+
+    def _fit_decorations(self, skills, nb_decorations, decorations_score):
+        """
+        Fits decorations closing the skill targets in the free slots of each combination.
+
+        Args:
+            skills (numpy.ndarray): Skill levels of the combinations.
+            nb_decorations (numpy.ndarray): Decoration counts by size of the combinations.
+            decorations_score (numpy.ndarray): Decorations score of the combinations.
+
+        Returns:
+            tuple:
+                - numpy.ndarray: Whether the targets of each combination can be reached.
+                - numpy.ndarray: Skill levels with the decorations.
+                - numpy.ndarray: Decoration counts by size of the slots left free.
+                - numpy.ndarray: Decorations score of the slots left free.
+        """
+        target_skill_names = list(self.skill_targets)
+        target_idx = [self.skill_names.index(skill_name) for skill_name in target_skill_names]
+        targets = np.array([self.skill_targets[skill_name] for skill_name in target_skill_names], dtype=np.int64)
+        levels = skills[:, target_idx].astype(np.int64)
+        deficits = np.maximum(targets - levels, 0)
+        headrooms = np.maximum(self.max_levels[target_idx] - np.maximum(levels, targets), 0)
+
+        feasible, used_slots, gained_levels = self.decoration_fitter.fit_many(
+            target_skill_names, nb_decorations, deficits, headrooms)
+        skills = skills.copy()
+        skills[:, target_idx] += gained_levels.astype(skills.dtype)
+        nb_decorations = nb_decorations - used_slots.astype(nb_decorations.dtype)
+        decorations_score = decorations_score - used_slots @ np.array([1, 2, 3])
+        return feasible, skills, nb_decorations, decorations_score
+
+    def _get_bytes_per_combination(self):
+        """
+        Estimates the memory used by one combination while a chunk is evaluated.
+
+        Returns:
+            int: Number of bytes per combination.
+        """
+        # skill levels, defense, decorations and flat index, their filtered copies and the ranking keys
+        nb_keys = len(self.necessary_skills) + 3
+        return 2 * (2 * len(self.skill_names) + 8 * 4 + 2 * 3) + 8 * nb_keys
+
+    def _get_final_defense(self, defense, skills, defense_rules=None):
+        """
+        Applies defense bonuses given by defensive skills to base defense values.
+
+        Args:
+            defense (numpy.ndarray): Base defense values.
+            skills (numpy.ndarray): Skill levels, with the active skills on the last axis.
+            defense_rules (list): Lookup arrays to apply, `self.defense_rules` by default.
+
+        Returns:
+            numpy.ndarray: Final defense values, rounded like `SetMaker.add_defense_by_skills_to_armor_sets`.
+        """
+        defense = np.asarray(defense).astype(np.float64)
+        for i, percentage, flat in self.defense_rules if defense_rules is None else defense_rules:
+            lvl = np.clip(skills[..., i], 0, len(percentage) - 1)
+            defense = defense + (percentage[lvl] * defense) + flat[lvl]
+        return np.round(defense).astype(np.int64)
+
+    def _get_partial_sums(self, cats, flat_idx):
+        """
+        Sums the matrices of several categories for the given combinations of these categories.
+
+        Args:
+            cats (list): Categories to combine.
+            flat_idx (numpy.ndarray): Flat indices of combinations, in C order over `cats`.
+
+        Returns:
+            tuple: Skill levels, defense, decoration counts by size and decorations score.
+        """
+        idx = np.unravel_index(flat_idx, [self.sizes[self.categories.index(cat)] for cat in cats])
+        skills = sum(self.skills[cat][i] for cat, i in zip(cats, idx))
+        defense = sum(self.defense[cat][i] for cat, i in zip(cats, idx))
+        nb_decorations = sum(self.nb_decorations[cat][i] for cat, i in zip(cats, idx))
+        decorations_score = sum(self.decorations_score[cat][i] for cat, i in zip(cats, idx))
+        return skills, defense, nb_decorations, decorations_score
+
+    def _get_rank_keys(self, skills, defense, nb_decorations, decorations_score):
+        """
+        Builds the ranking keys used by `SetMaker.get_best_set`, most significant first.
+
+        Returns:
+            list: Key arrays, all to be sorted in descending order.
+        """
+        keys = [skills[..., self.skill_names.index(skill_name)] for skill_name in self.necessary_skills]
+        match self.sort_on:
+            case "defense":
+                keys += [defense, decorations_score]
+            case "decorations":
+                keys += [decorations_score, defense]
+        return keys + [nb_decorations[..., 0]]
+
+    def _get_packing_widths(self):
+        """
+        Computes how many bits each ranking key needs so that keys can be packed into one integer.
+
+        Returns:
+            list or None: Bit width of each key, or None if keys don't fit in a 63 bits integer.
+        """
+        max_skills = np.maximum(self.max_levels, 0).astype(np.int64)
+        max_defense = float(sum(int(self.defense[cat].max(initial=0)) for cat in self.categories))
+        for i, percentage, flat in self.defense_rules:
+            max_defense = max_defense + (percentage.max() * max_defense) + flat.max()
+        max_defense = round(max_defense)
+        max_decorations_score = sum(int(self.decorations_score[cat].max(initial=0)) for cat in self.categories)
+        max_nb_decorations = sum(self.nb_decorations[cat].max(axis=0, initial=0).astype(np.int64)
+                                 for cat in self.categories)
+        max_keys = self._get_rank_keys(max_skills, max_defense, max_nb_decorations, max_decorations_score)
+        widths = [int(max_key).bit_length() for max_key in max_keys]
+        if sum(widths) > 62:
+            return None
+        return widths
+
+    def _get_pareto_front(self, points):
+        """
+        Keeps the points that aren't dominated by another point on every coordinate.
+
+        Args:
+            points (numpy.ndarray): 2D array of points, one per row.
+
+        Returns:
+            numpy.ndarray: The distinct non-dominated points.
+        """
+        points = np.unique(points, axis=0)
+        points = points[np.argsort(-points.sum(axis=1, dtype=np.int64), kind='stable')]
+        front = []
+        for point in points:
+            if not front or not (np.array(front) >= point).all(axis=1).any():
+                front.append(point)
+        return np.array(front, dtype=points.dtype).reshape(-1, points.shape[1])
+
+    def _select_top(self, keys, flat_idx, k, widths):
+        """
+        Selects the k best combinations, ties being broken by enumeration order.
+
+        Args:
+            keys (list): Ranking key arrays, most significant first.
+            flat_idx (numpy.ndarray): Flat indices of the combinations.
+            k (int): Number of combinations to keep.
+            widths (list or None): Bit widths used to pack keys, see `_get_packing_widths`.
+
+        Returns:
+            tuple: Selected keys and flat indices, in ranking order.
+        """
+        if widths is not None and len(flat_idx) > k:
+            score = np.zeros(len(flat_idx), dtype=np.int64)
+            for key, width in zip(keys, widths):
+                score = (score << width) | key.astype(np.int64)
+            threshold = np.partition(score, len(score) - k)[len(score) - k]
+            candidates = score >= threshold
+            keys = [key[candidates] for key in keys]
+            flat_idx = flat_idx[candidates]
+
+        order = np.lexsort([flat_idx] + [-key.astype(np.int64) for key in reversed(keys)])[:k]
+        return [key[order] for key in keys], flat_idx[order]
+
+    def _split_categories(self, max_inner_size):
+        """
+        Splits categories in an outer part and an inner part, the inner part being the longest
+        suffix of categories whose number of combinations stays under `max_inner_size`.
+
+        Args:
+            max_inner_size (int): Maximum number of combinations of the inner part.
+
+        Returns:
+            int: Index of the first inner category.
+        """
+        split = len(self.categories) - 1
+        while split > 0 and np.prod(self.sizes[split - 1:], dtype=np.int64) <= max_inner_size:
+            split -= 1
+        return split
+
+    def _exhaustive_search_shard(self, k, nb_shard_cats, first_prefix, last_prefix):
+        """
+        Evaluates chunk by chunk the combinations whose first categories are in a range of prefixes,
+        and keeps the k best valid ones.
+
+        Categories are split in an outer part and an inner part: the inner part is precomputed
+        as one table of partial sums and broadcasted against blocks of outer combinations.
+
+        Args:
+            k (int): Number of armor sets to keep.
+            nb_shard_cats (int): Number of leading categories making the shard prefixes.
+            first_prefix (int): First flat index of the shard over the leading categories.
+            last_prefix (int): Flat index after the last one of the shard over the leading categories.
+
+        Returns:
+            tuple: Ranking keys (None if no combination is valid) and flat indices of the k best valid
+                combinations, in ranking order.
+        """
+        split = max(self._split_categories(self.chunk_size), nb_shard_cats)
+        outer_cats, inner_cats = self.categories[:split], self.categories[split:]
+        n_inner = int(np.prod(self.sizes[split:], dtype=np.int64))
+        n_outer_by_prefix = int(np.prod(self.sizes[nb_shard_cats:split], dtype=np.int64))
+        inner = self._get_partial_sums(inner_cats, np.arange(n_inner))
+        block_size = max(1, self.chunk_size // n_inner)
+        widths = self._get_packing_widths()
+
+        best_keys, best_idx = None, np.array([], dtype=np.int64)
+        first_outer, last_outer = first_prefix * n_outer_by_prefix, last_prefix * n_outer_by_prefix
+        for start in range(first_outer, last_outer, block_size):
+            outer_flat_idx = np.arange(start, min(start + block_size, last_outer))
+            outer = self._get_partial_sums(outer_cats, outer_flat_idx) if outer_cats \
+                else tuple(np.zeros((1,) + part.shape[1:], dtype=part.dtype) for part in inner)
+
+            skills, defense, nb_decorations, decorations_score = (
+                (outer_part[:, None] + inner_part[None, :]).reshape((-1,) + inner_part.shape[1:])
+                for outer_part, inner_part in zip(outer, inner))
+            flat_idx = (outer_flat_idx[:, None] * n_inner + np.arange(n_inner)[None, :]).reshape(-1)
+
+            valid = (skills <= self.max_levels).all(axis=1)
+            skills, defense, nb_decorations, decorations_score, flat_idx = \
+                skills[valid], defense[valid], nb_decorations[valid], decorations_score[valid], flat_idx[valid]
+            if self.skill_targets is not None:
+                valid, skills, nb_decorations, decorations_score = self._fit_decorations(
+                    skills, nb_decorations, decorations_score)
+                skills, defense, nb_decorations, decorations_score, flat_idx = \
+                    skills[valid], defense[valid], nb_decorations[valid], decorations_score[valid], flat_idx[valid]
+            if len(flat_idx) == 0:
+                continue
+
+            keys = self._get_rank_keys(skills, self._get_final_defense(defense, skills),
+                                       nb_decorations, decorations_score)
+            if best_keys is not None:
+                keys = [np.concatenate([best_key, key]) for best_key, key in zip(best_keys, keys)]
+                flat_idx = np.concatenate([best_idx, flat_idx])
+            best_keys, best_idx = self._select_top(keys, flat_idx, k, widths)
+
+        return best_keys, best_idx
+
+    def exhaustive_search(self, k=1):
+        """
+        Evaluates every combination chunk by chunk and keeps the k best valid ones.
+
+        Args:
+            k (int): Number of armor sets to keep.
+
+        Returns:
+            numpy.ndarray: Flat indices of the k best valid combinations, in ranking order.
+        """
+        if self.n_combinations == 0:
+            return np.array([], dtype=np.int64)
+        best_keys, best_idx = self._exhaustive_search_shard(k, 0, 0, 1)
+        return best_idx
+
+    def parallel_search(self, k=1, max_workers=None, nb_shard_cats=None, min_combinations=None):
+        """
+        Evaluates every combination like `exhaustive_search`, with shards of combinations searched
+        by a pool of worker processes.
+
+        Shards are ranges of head (or head x chest) prefixes, i.e. independent subtrees of
+        `SetMaker._armor_set_recursion`. The worker processes are started once and shared by every search
+        of the process (see `_get_pool`). The engine is pickled once per search, without its armor rows,
+        and unpickled once per worker. The k best combinations of each shard are merged with the same ranking
+        and the same enumeration order tie-break, so the result is identical to the serial search.
+        Below `min_combinations`, or with a single worker, sending shards to the workers costs more than it saves,
+        so combinations are evaluated in this process with `exhaustive_search`.
+
+        Args:
+            k (int): Number of armor sets to keep.
+            max_workers (int): Number of worker processes, the number of CPUs by default.
+            nb_shard_cats (int): Number of leading categories making the shards, 1 or 2. By default, 2
+                if there are too few head armors to balance the workers.
+            min_combinations (int): Minimum number of combinations searched by the workers,
+                `parallel_min_combinations` by default.
+
+        Returns:
+            numpy.ndarray: Flat indices of the k best valid combinations, in ranking order.
+        """
+        if self.n_combinations == 0:
+            return np.array([], dtype=np.int64)
+        min_combinations = self.parallel_min_combinations if min_combinations is None else min_combinations
+        max_workers = os.cpu_count() if max_workers is None else max_workers
+        if self.n_combinations < min_combinations or max_workers <= 1:
+            return self.exhaustive_search(k)
+        if nb_shard_cats is None:
+            nb_shard_cats = 1 if self.sizes[0] >= 4 * max_workers else 2
+        n_prefixes = int(np.prod(self.sizes[:nb_shard_cats], dtype=np.int64))
+        bounds = np.linspace(0, n_prefixes, min(n_prefixes, 4 * max_workers) + 1).astype(np.int64)
+        shards = [(k, nb_shard_cats, int(first), int(last)) for first, last in zip(bounds[:-1], bounds[1:])]
+
+        shard_engine = copy(self)
+        shard_engine.rows = None
+        engine_key, engine_bytes = uuid.uuid4().hex, pickle.dumps(shard_engine, protocol=pickle.HIGHEST_PROTOCOL)
+        pool = _get_pool(max_workers)
+        try:
+            results = list(pool.map(_search_shard, [(engine_key, engine_bytes, *shard) for shard in shards]))
+        except BrokenProcessPool:
+            _discard_pool(max_workers, pool)
+            raise
+
+        results = [(shard_keys, idx) for shard_keys, idx in results if shard_keys is not None]
+        if len(results) == 0:
+            return np.array([], dtype=np.int64)
+        keys = [np.concatenate(shard_keys) for shard_keys in zip(*[shard_keys for shard_keys, idx in results])]
+        flat_idx = np.concatenate([idx for shard_keys, idx in results])
+        best_keys, best_idx = self._select_top(keys, flat_idx, k, self._get_packing_widths())
+        return best_idx
+
+    def branch_and_bound_search(self, k=1, leaf_size=4096):
+        """
+        Walks the categories depth-first and keeps a bounded heap of the k best valid combinations.
+
+        - Drops a partial set as soon as one of its skills goes over its max level.
+        - Computes an optimistic bound of the ranking keys of each partial set from the best
+          remaining per-category skill levels, defense and decorations, and drops the partial set
+          as soon as this bound can't beat the current k-th best set. Necessary skills are bounded
+          jointly with the Pareto front of the levels reachable by the remaining categories.
+        - Evaluates the last categories (up to `leaf_size` combinations) vectorized.
+        - With skill targets, fits decorations at the leaves, and bounds the skill levels of partial sets
+          with the levels decorations can add (see `_bound_levels_with_decorations`).
+
+        Children are visited by decreasing bound to find good sets early; ties are still broken
+        by enumeration order, so the result is the same as `exhaustive_search`.
+
+        Args:
+            k (int): Number of armor sets to keep.
+            leaf_size (int): Maximum number of combinations evaluated at once at the leaves.
+
+        Returns:
+            numpy.ndarray: Flat indices of the k best valid combinations, in ranking order.
+        """
+        if self.n_combinations == 0:
+            return np.array([], dtype=np.int64)
+
+        split = self._split_categories(leaf_size)
+        n_inner = int(np.prod(self.sizes[split:], dtype=np.int64))
+        inner_skills, inner_defense, inner_nb_decorations, inner_decorations_score = \
+            self._get_partial_sums(self.categories[split:], np.arange(n_inner))
+        widths = self._get_packing_widths()
+
+        # best contribution of the remaining categories, from each depth
+        remaining = [None] * (split + 1)
+        remaining[split] = (inner_skills.max(axis=0, initial=0), inner_defense.max(initial=0),
+                            inner_nb_decorations.max(axis=0, initial=0), inner_decorations_score.max(initial=0))
+        for d in reversed(range(split)):
+            cat = self.categories[d]
+            remaining[d] = tuple(best + part.max(axis=0, initial=0) for best, part in zip(remaining[d + 1], (
+                self.skills[cat], self.defense[cat], self.nb_decorations[cat], self.decorations_score[cat])))
+
+        # best necessary skill levels reachable from each depth, kept as Pareto fronts so that the
+        # lexicographic order of `get_best_set` can be bounded jointly instead of skill by skill
+        necessary_idx = [self.skill_names.index(skill_name) for skill_name in self.necessary_skills]
+        necessary_max_levels = self.max_levels[necessary_idx]
+        fronts = [None] * (split + 1)
+        use_fronts = widths is not None and len(necessary_idx) > 0
+        if use_fronts:
+            necessary_widths = np.array(widths[:len(necessary_idx)])
+            shifts = np.cumsum(necessary_widths[::-1])[::-1] - necessary_widths
+            fronts[split] = self._get_pareto_front(np.minimum(inner_skills[:, necessary_idx], necessary_max_levels))
+            for d in reversed(range(1, split)):
+                levels = fronts[d + 1][:, None, :] + self.skills[self.categories[d]][None, :, necessary_idx]
+                fronts[d] = self._get_pareto_front(
+                    np.minimum(levels, necessary_max_levels).reshape(-1, len(necessary_idx)))
+
+        heap = []
+
+        def visit(d, idx, skills, defense, nb_decorations, decorations_score):
+            if d == split:
+                all_skills = skills + inner_skills
+                valid = (all_skills <= self.max_levels).all(axis=1)
+                all_skills, all_defense, all_nb_decorations, all_decorations_score, flat_idx = (
+                    all_skills[valid], defense + inner_defense[valid], nb_decorations + inner_nb_decorations[valid],
+                    decorations_score + inner_decorations_score[valid], idx * n_inner + np.flatnonzero(valid))
+                if self.skill_targets is not None:
+                    valid, all_skills, all_nb_decorations, all_decorations_score = self._fit_decorations(
+                        all_skills, all_nb_decorations, all_decorations_score)
+                    all_skills, all_defense, all_nb_decorations, all_decorations_score, flat_idx = (
+                        all_skills[valid], all_defense[valid], all_nb_decorations[valid],
+                        all_decorations_score[valid], flat_idx[valid])
+                keys = self._get_rank_keys(all_skills, self._get_final_defense(all_defense, all_skills),
+                                           all_nb_decorations, all_decorations_score)
+                keys, flat_idx = self._select_top(keys, flat_idx, k, widths)
+                for key, i in zip(zip(*[key.tolist() for key in keys]), flat_idx.tolist()):
+                    if len(heap) < k:
+                        heapq.heappush(heap, (key, -i))
+                    elif (key, -i) > heap[0]:
+                        heapq.heapreplace(heap, (key, -i))
+                    else:
+                        break
+                return
+
+            cat = self.categories[d]
+            child_skills = skills + self.skills[cat]
+            child_defense = defense + self.defense[cat]
+            child_nb_decorations = nb_decorations + self.nb_decorations[cat]
+            child_decorations_score = decorations_score + self.decorations_score[cat]
+
+            valid = (child_skills <= self.max_levels).all(axis=1)
+            best_skills, best_defense, best_nb_decorations, best_decorations_score = remaining[d + 1]
+            bound_skills = self._bound_levels_with_decorations(np.minimum(child_skills + best_skills, self.max_levels))
+            if use_fronts:
+                levels = np.minimum(child_skills[:, None, necessary_idx] + fronts[d + 1][None, :, :],
+                                    necessary_max_levels).astype(np.int64)
+                # decorations are accounted for before picking the best point of the front
+                levels = np.maximum(levels, self.target_bound_levels[necessary_idx].astype(np.int64))
+                best_front = np.argmax((levels << shifts).sum(axis=2), axis=1)
+                bound_skills[:, necessary_idx] = levels[np.arange(len(levels)), best_front]
+            bound_keys = self._get_rank_keys(
+                bound_skills,
+                self._get_final_defense(child_defense + best_defense, bound_skills, self.bound_defense_rules),
+                child_nb_decorations + best_nb_decorations, child_decorations_score + best_decorations_score)
+            bounds = list(zip(*[key.tolist() for key in bound_keys]))
+            n_below = int(np.prod(self.sizes[d + 1:], dtype=np.int64))
+
+            for i in np.lexsort([-key.astype(np.int64) for key in reversed(bound_keys)]).tolist():
+                if not valid[i]:
+                    continue
+                child_idx = idx * self.sizes[d] + i
+                if len(heap) == k and (bounds[i], -child_idx * n_below) <= heap[0]:
+                    if bounds[i] < heap[0][0]:
+                        break
+                    continue
+                visit(d + 1, child_idx, child_skills[i], child_defense[i],
+                      child_nb_decorations[i], child_decorations_score[i])
+
+        visit(0, 0, np.zeros(len(self.skill_names), dtype=np.int16), 0, np.zeros(3, dtype=np.int16), 0)
+        return np.array([-i for key, i in sorted(heap, reverse=True)], dtype=np.int64)
+
+    def _get_half_table(self, cats):
+        """
+        Builds every combination of the given categories, without the ones going over a max skill level,
+        grouped by skill levels.
+
+        Args:
+            cats (list): Categories of the half.
+
+        Returns:
+            dict: Flat indices, defense, decoration counts and decorations score of the kept combinations
+            ordered by group, distinct skill levels of each group and start of each group in the table.
+        """
+        n = int(np.prod([self.sizes[self.categories.index(cat)] for cat in cats], dtype=np.int64))
+        skills, defense, nb_decorations, decorations_score = self._get_partial_sums(cats, np.arange(n))
+        flat_idx = np.flatnonzero((skills <= self.max_levels).all(axis=1))
+
+        group_skills, group_idx = np.unique(skills[flat_idx], axis=0, return_inverse=True)
+        order = np.argsort(group_idx.reshape(-1), kind='stable')
+        flat_idx = flat_idx[order]
+        starts = np.concatenate([[0], np.cumsum(np.bincount(group_idx.reshape(-1), minlength=len(group_skills)))])
+        table = {
+            'flat_idx': flat_idx,
+            'defense': defense[flat_idx],
+            'nb_decorations': nb_decorations[flat_idx],
+            'decorations_score': decorations_score[flat_idx],
+            'group_skills': group_skills,
+            'starts': starts,
+        }
+        table['best'] = {col: np.maximum.reduceat(table[col], starts[:-1]) if len(flat_idx) > 0 else table[col]
+                         for col in ['defense', 'nb_decorations', 'decorations_score']}
+        return table
+
+    def meet_in_the_middle_search(self, k=1, chunk_size=None):
+        """
+        Joins two half-tables, head x chest x arm and waist x leg x talisman, to find the k best
+        valid combinations.
+
+        - Builds each half with its skill level sums, discarding combinations already over a max level.
+        - Groups each half by skill levels and hash-joins the groups whose sums stay under max levels.
+        - Bounds every joined pair of groups (skills are exact, defense and decorations are the best
+          of each group) and expands pairs by decreasing bound until no pair can beat the k-th best set.
+        - With skill targets, bounds pairs with the skill levels decorations can add and fits decorations
+          to the combinations of the expanded pairs.
+
+        Args:
+            k (int): Number of armor sets to keep.
+            chunk_size (int): Maximum number of group pairs or combinations evaluated at once,
+                `self.chunk_size` by default.
+
+        Returns:
+            numpy.ndarray: Flat indices of the k best valid combinations, in ranking order.
+        """
+        if self.n_combinations == 0:
+            return np.array([], dtype=np.int64)
+        chunk_size = chunk_size or self.chunk_size
+
+        first, second = self._get_half_table(self.categories[:3]), self._get_half_table(self.categories[3:])
+        n_second = int(np.prod(self.sizes[3:], dtype=np.int64))
+        widths = self._get_packing_widths()
+
+        # join groups of both halves whose skill level sums stay under max levels
+        pairs = []
+        n_second_groups = len(second['group_skills'])
+        block_size = max(1, chunk_size // max(1, n_second_groups))
+        for start in range(0, len(first['group_skills']), block_size):
+            first_groups = np.arange(start, min(start + block_size, len(first['group_skills'])))
+            skills = first['group_skills'][first_groups][:, None] + second['group_skills'][None, :]
+            i, j = np.nonzero((skills <= self.max_levels).all(axis=2))
+            i = first_groups[i]
+            skills = self._bound_levels_with_decorations(skills[i - start, j])
+            bound_keys = self._get_rank_keys(
+                skills,
+                self._get_final_defense(first['best']['defense'][i] + second['best']['defense'][j], skills),
+                first['best']['nb_decorations'][i] + second['best']['nb_decorations'][j],
+                first['best']['decorations_score'][i] + second['best']['decorations_score'][j])
+            pairs.append((i, j, bound_keys))
+        if sum(len(i) for i, j, bound_keys in pairs) == 0:
+            return np.array([], dtype=np.int64)
+
+        i = np.concatenate([pair[0] for pair in pairs])
+        j = np.concatenate([pair[1] for pair in pairs])
+        bound_keys = [np.concatenate(keys) for keys in zip(*[pair[2] for pair in pairs])]
+        order = np.lexsort([-key.astype(np.int64) for key in reversed(bound_keys)])
+
+        best_keys, best_idx, kth_key = None, np.array([], dtype=np.int64), None
+        for pair in order.tolist():
+            bound = tuple(int(key[pair]) for key in bound_keys)
+            if kth_key is not None and bound < kth_key:
+                break
+
+            first_rows = np.arange(first['starts'][i[pair]], first['starts'][i[pair] + 1])
+            second_rows = np.arange(second['starts'][j[pair]], second['starts'][j[pair] + 1])
+            skills = first['group_skills'][i[pair]] + second['group_skills'][j[pair]]
+            for start in range(0, len(first_rows), max(1, chunk_size // len(second_rows))):
+                rows = first_rows[start:start + max(1, chunk_size // len(second_rows))]
+                defense = (first['defense'][rows][:, None] + second['defense'][second_rows][None, :]).reshape(-1)
+                rows_skills = np.broadcast_to(skills, (len(defense), len(skills)))
+                nb_decorations = (first['nb_decorations'][rows][:, None]
+                                  + second['nb_decorations'][second_rows][None, :]).reshape(-1, 3)
+                decorations_score = (first['decorations_score'][rows][:, None]
+                                     + second['decorations_score'][second_rows][None, :]).reshape(-1)
+                flat_idx = (first['flat_idx'][rows][:, None] * n_second
+                            + second['flat_idx'][second_rows][None, :]).reshape(-1)
+                if self.skill_targets is not None:
+                    valid, rows_skills, nb_decorations, decorations_score = self._fit_decorations(
+                        rows_skills, nb_decorations, decorations_score)
+                    rows_skills, defense, nb_decorations, decorations_score, flat_idx = (
+                        rows_skills[valid], defense[valid], nb_decorations[valid], decorations_score[valid],
+                        flat_idx[valid])
+                    if len(flat_idx) == 0:
+                        continue
+                keys = self._get_rank_keys(rows_skills, self._get_final_defense(defense, rows_skills),
+                                           nb_decorations, decorations_score)
+                keys = [np.broadcast_to(key, defense.shape) for key in keys]
+                if best_keys is not None:
+                    keys = [np.concatenate([best_key, key]) for best_key, key in zip(best_keys, keys)]
+                    flat_idx = np.concatenate([best_idx, flat_idx])
+                best_keys, best_idx = self._select_top(keys, flat_idx, k, widths)
+
+            if len(best_idx) == k:
+                kth_key = tuple(int(key[-1]) for key in best_keys)
+
+        return best_idx
+
+    def to_armor_sets(self, flat_idx):
+        """
+        Materializes combinations into the DataFrame layout produced by the legacy pipeline
+        after `SetMaker.add_defense_by_skills_to_armor_sets`.
+
+        With skill targets, skill levels and decoration slots are the ones after the decorations,
+        and the decorations of each armor set are listed in the `decorations` entry of `DataFrame.attrs`.
+
+        Args:
+            flat_idx (numpy.ndarray): Flat indices of the combinations to materialize.
+
+        Returns:
+            pandas.DataFrame: One row per armor set, in the given order.
+        """
+        armor_sets = []
+        decorations = []
+        for idx in zip(*np.unravel_index(flat_idx, self.sizes)):
+            armor_set = ArmorSet()
+            for cat, i in zip(self.armor_cat, idx):
+                armor_set.update_armors(armor_type=cat, df_armors_filtered_by_type=self.rows[cat][i])
+            armor_set.update_talisman(self.rows['talisman'][idx[-1]])
+            if self.skill_targets is not None:
+                decorations.append(self._add_decorations(armor_set))
+
+            skills = np.array([armor_set.skills.get(skill_name, 0) for skill_name in self.skill_names], dtype=np.int64)
+            armor_set.defense = int(self._get_final_defense(np.array(armor_set.defense), skills))
+            armor_sets.append(armor_set)
+
+        if len(armor_sets) == 0:
+            return pd.DataFrame()
+        all_armor_sets = pd.concat([pd.json_normalize(armor_set.__dict__, sep='_') for armor_set in armor_sets])
+        all_armor_sets = all_armor_sets.fillna(0).reset_index(drop=True)
+        if self.skill_targets is not None:
+            all_armor_sets.attrs['decorations'] = decorations
+        return all_armor_sets
+
+    def _add_decorations(self, armor_set):
+        """
+        Adds to an armor set the decorations closing its skill targets.
+
+        Args:
+            armor_set (ArmorSet): Armor set reaching the skill targets with decorations.
+
+        Returns:
+            list: Names of the decorations of the armor set.
+        """
+        slots = (armor_set.nb_decorations_size_1, armor_set.nb_decorations_size_2, armor_set.nb_decorations_size_3)
+        levels = {skill_name: int(armor_set.skills.get(skill_name, 0)) for skill_name in self.skill_targets}
+        max_levels = {skill_name: int(self.max_levels[self.skill_names.index(skill_name)])
+                      for skill_name in self.skill_targets}
+        placements = self.decoration_fitter.fit(
+            slots,
+            {skill_name: max(target - levels[skill_name], 0) for skill_name, target in self.skill_targets.items()},
+            {skill_name: max(max_levels[skill_name] - max(levels[skill_name], target), 0)
+             for skill_name, target in self.skill_targets.items()})
+
+        for jewel_name, slot_size in placements:
+            skill_name, jewel_lvl = self.decoration_fitter.get_jewel_skill(jewel_name)
+            armor_set.skills[skill_name] = armor_set.skills.get(skill_name, 0) + jewel_lvl
+            setattr(armor_set, f'nb_decorations_size_{slot_size}',
+                    getattr(armor_set, f'nb_decorations_size_{slot_size}') - 1)
+            armor_set.decorations_score -= slot_size
+        return [jewel_name for jewel_name, slot_size in placements]
+
+    def best_sets(self, k=1, strategy='exhaustive', max_workers=None):
+        """
+        Searches the k best valid armor sets.
+
+        Args:
+            k (int): Number of armor sets to return.
+            strategy (str): 'exhaustive' to evaluate every combination, 'branch_and_bound'
+                to prune partial sets that can't make it into the k best ones, or 'meet_in_the_middle'
+                to join two half-tables of combinations, or 'parallel' to evaluate every combination
+                with a pool of worker processes.
+            max_workers (int): Number of worker processes of the 'parallel' strategy.
+
+        Returns:
+            pandas.DataFrame: The k best armor sets, in ranking order.
+        """
+        match strategy:
+            case "exhaustive":
+                flat_idx = self.exhaustive_search(k)
+            case "branch_and_bound":
+                flat_idx = self.branch_and_bound_search(k)
+            case "meet_in_the_middle":
+                flat_idx = self.meet_in_the_middle_search(k)
+            case "parallel":
+                flat_idx = self.parallel_search(k, max_workers)
+            case _:
+                raise ValueError(f"Unknown search strategy: {strategy}")
+        return self.to_armor_sets(flat_idx)
@@ -1,8 +1,17 @@
+import hashlib
+import tracemalloc
 import pandas as pd
 import numpy as np
+from contextlib import contextmanager, nullcontext
 from copy import deepcopy
+from itertools import islice
 
 from src.armor_set import ArmorSet
+from src.catalog_store import CatalogStore
+from src.decoration_fitter import DecorationFitter
+from src.instrumentation import NULL_PROFILE
+from src.set_engine import SetEngine
+from src.table_io import read_table
 
 
 class SetMaker:
@@ -13,12 +22,35 @@ class SetMaker:
     computes combinations of armor sets, and returns valid or optimal configurations
     based on defense or decoration potential.
     """
-    def __init__(self):
-        self.df_armors = pd.read_csv("src/data/armors.csv")
-        self.df_talismans = pd.read_csv("src/data/talismans.csv")
-        self.df_skills = pd.read_csv("src/data/skills.csv")
-
-    def _armor_set_recursion(self, i, armor_set, all_armor_sets, df_usable_armors, armor_cat, filtered_df_talismans):
+    def __init__(self, catalog_store=None, defense_rules_csv="src/data/rules/defense_skills.csv", result_cache=None,
+                 instrumentation=None, decorations_csv="src/data/decorations.csv"):
+        """
+        Args:
+            catalog_store (CatalogStore): Compiled store the catalog is loaded from,
+                compiled from the CSV files of `src/data` by default.
+            defense_rules_csv (str): Path of the defense bonuses given by defensive skills.
+            result_cache (ResultCache): Optional cache of the results of `make_best_set`.
+            instrumentation (Instrumentation): Optional instrumentation of `make_best_set` runs.
+            decorations_csv (str): Path of the cleaned decorations, fitted in free slots to reach skill targets.
+        """
+        self.catalog_store = CatalogStore() if catalog_store is None else catalog_store
+        self.df_armors, self.df_talismans, self.df_skills = self.catalog_store.to_dataframes()
+        self.defense_rules = self._load_defense_rules(defense_rules_csv)
+        self.decoration_fitter = DecorationFitter(read_table(decorations_csv), self.df_skills)
+        self.result_cache = result_cache
+        self.instrumentation = instrumentation
+        self.df_scored_armors = self.add_decorations_score_col(self.df_armors.copy())
+        self.best_armors_by_sort_on = {}
+        with open(defense_rules_csv, "rb") as f:
+            defense_rules_hash = hashlib.sha256(f.read()).hexdigest()
+        with open(decorations_csv, "rb") as f:
+            decorations_hash = hashlib.sha256(f.read()).hexdigest()
+        self.dataset_version = hashlib.sha256(
+            f"{self.catalog_store.get_version()}:{defense_rules_hash}:{decorations_hash}".encode()).hexdigest()
+        self.pruned_armors_count = {}
+
+    def _armor_set_recursion(self, i, armor_set, all_armor_sets, df_usable_armors, armor_cat, filtered_df_talismans,
+                             max_level_by_skill=None):
         """
         Recursively builds all possible armor sets by combining armor pieces from each category
         and talismans.
@@ -27,6 +59,8 @@ class SetMaker:
           (head, chest, arm, waist, leg), updates the current `ArmorSet`, and recurses deeper.
         - Once all armor categories are filled (i == 5), it iterates through the filtered talismans,
           attaches one to the set, and appends the completed set to `all_armor_sets`.
+        - If `max_level_by_skill` is given, partial sets exceeding a skill max level are dropped
+          with their whole subtree, since skill levels can only grow.
 
         Args:
             i (int): Current index of the armor category being processed.
@@ -35,6 +69,8 @@ class SetMaker:
             df_usable_armors (pandas.DataFrame): DataFrame containing all candidate armors.
             armor_cat (list): Ordered list of armor categories (e.g., ["head", "chest", "arm", "waist", "leg"]).
             filtered_df_talismans (pandas.DataFrame): DataFrame of talismans filtered by relevant skills.
+            max_level_by_skill (pandas.Series): Optional max level of each skill, indexed by skill name,
+                to validate armor sets during generation (see `_get_max_level_by_skill`).
 
         Returns:
             list: Updated list containing all constructed armor sets.
@@ -43,15 +79,108 @@ class SetMaker:
             for id, armor in df_usable_armors[df_usable_armors['Armor_type'] == armor_cat[i]].iterrows():
                 armor_set_part = deepcopy(armor_set)
                 armor_set_part.update_armors(armor_type=armor_cat[i], df_armors_filtered_by_type=armor)
+                if (max_level_by_skill is not None
+                        and not self._is_within_max_levels(armor_set_part, max_level_by_skill)):
+                    continue
                 all_armor_sets = self._armor_set_recursion(
-                    i+1, armor_set_part, all_armor_sets, df_usable_armors, armor_cat, filtered_df_talismans)
+                    i+1, armor_set_part, all_armor_sets, df_usable_armors, armor_cat, filtered_df_talismans,
+                    max_level_by_skill)
         else:
             for id, talisman in filtered_df_talismans.iterrows():
                 armor_set_talisman = deepcopy(armor_set)
                 armor_set_talisman.update_talisman(talisman)
+                if (max_level_by_skill is not None
+                        and not self._is_within_max_levels(armor_set_talisman, max_level_by_skill)):
+                    continue
                 all_armor_sets.append(armor_set_talisman)
         return all_armor_sets
 
+    def _armor_set_generator(self, i, armor_set, df_usable_armors, armor_cat, filtered_df_talismans,
+                             max_level_by_skill=None):
+        """
+        Lazily builds all possible armor sets, in the same depth-first order as `_armor_set_recursion`.
+
+        Args:
+            i (int): Current index of the armor category being processed.
+            armor_set (ArmorSet): The partially constructed armor set to be expanded.
+            df_usable_armors (pandas.DataFrame): DataFrame containing all candidate armors.
+            armor_cat (list): Ordered list of armor categories (e.g., ["head", "chest", "arm", "waist", "leg"]).
+            filtered_df_talismans (pandas.DataFrame): DataFrame of talismans filtered by relevant skills.
+            max_level_by_skill (pandas.Series): Optional max level of each skill, to validate armor sets
+                during generation.
+
+        Yields:
+            ArmorSet: Each fully constructed armor set.
+        """
+        if i < 5:
+            for id, armor in df_usable_armors[df_usable_armors['Armor_type'] == armor_cat[i]].iterrows():
+                armor_set_part = deepcopy(armor_set)
+                armor_set_part.update_armors(armor_type=armor_cat[i], df_armors_filtered_by_type=armor)
+                if (max_level_by_skill is not None
+                        and not self._is_within_max_levels(armor_set_part, max_level_by_skill)):
+                    continue
+                yield from self._armor_set_generator(
+                    i+1, armor_set_part, df_usable_armors, armor_cat, filtered_df_talismans, max_level_by_skill)
+        else:
+            for id, talisman in filtered_df_talismans.iterrows():
+                armor_set_talisman = deepcopy(armor_set)
+                armor_set_talisman.update_talisman(talisman)
+                if (max_level_by_skill is not None
+                        and not self._is_within_max_levels(armor_set_talisman, max_level_by_skill)):
+                    continue
+                yield armor_set_talisman
+
+    def _get_max_level_by_skill(self, df_skills):
+        """
+        Builds the max level of each skill, indexed by skill name.
+
+        Args:
+            df_skills (pandas.DataFrame): Skill data containing max level for each skill.
+
+        Returns:
+            pandas.Series: Max level of each skill.
+        """
+        return df_skills.set_index('Skill')['skill_max_level']
+
+    def _is_within_max_levels(self, armor_set, max_level_by_skill):
+        """
+        Checks whether no skill of an armor set exceeds its max level.
+
+        Args:
+            armor_set (ArmorSet): The armor set to check.
+            max_level_by_skill (pandas.Series): Max level of each skill, indexed by skill name.
+
+        Returns:
+            bool: True if every skill level is within its max level.
+        """
+        return all(lvl <= max_level_by_skill[skill_name] for skill_name, lvl in armor_set.skills.items())
+
+    def _load_defense_rules(self, defense_rules_csv):
+        """
+        Loads the defense bonuses given by defensive skills as level-indexed lookup arrays.
+
+        Each row of the rules file gives, for a skill at a specific level, a percentage bonus
+        applied to the defense and a flat bonus added to it. Levels missing from the file give no bonus.
+
+        Args:
+            defense_rules_csv (str): Path of the rules file, with 'Skill', 'Level',
+                'Defense_percentage' and 'Defense_flat' columns.
+
+        Returns:
+            dict: Percentage (as a ratio) and flat bonus arrays indexed by level, keyed by skill name
+                in alphabetical order, which is the order bonuses are applied in.
+        """
+        df_rules = pd.read_csv(defense_rules_csv)
+        defense_rules = {}
+        for skill_name, df_skill_rules in sorted(df_rules.groupby('Skill')):
+            levels = df_skill_rules['Level'].to_numpy()
+            percentage = np.zeros(levels.max() + 1)
+            flat = np.zeros(levels.max() + 1)
+            percentage[levels] = df_skill_rules['Defense_percentage'].to_numpy() / 100
+            flat[levels] = df_skill_rules['Defense_flat'].to_numpy()
+            defense_rules[skill_name] = (percentage, flat)
+        return defense_rules
+
     def add_decorations_score_col(self, df_armors):
         """
         Adds a 'Decorations_score' column to the armor DataFrame by summing
@@ -65,8 +194,7 @@ class SetMaker:
         """
         decoration_cols_names = ['Decoration_slot_1_size', 'Decoration_slot_2_size', 'Decoration_slot_3_size']
         df_armors[decoration_cols_names] = df_armors[decoration_cols_names].fillna(0)
-        df_armors['Decorations_score'] = df_armors.apply(
-            lambda x: x['Decoration_slot_1_size'] + x['Decoration_slot_2_size'] + x['Decoration_slot_3_size'], axis=1)
+        df_armors['Decorations_score'] = df_armors[decoration_cols_names].sum(axis=1)
         return df_armors
 
     def filter_relevant_armors_and_talismans(self, skills, df_armors, df_talismans):
@@ -125,7 +253,84 @@ class SetMaker:
 
         return df_best_armors
 
-    def make_armor_sets(self, filtered_df_armors, filtered_df_talismans, df_best_armors):
+    def prune_dominated_armors(self, df_usable_armors, filtered_df_talismans, necessary_skills, df_skills):
+        """
+        Reduces each armor type to its non-dominated armor pieces.
+
+        An armor piece is removed when another piece of the same 'Armor_type' gives at least the same level
+        of every necessary and defensive skill, at least the same 'Defense' and at least as many decoration
+        slots of each size. To keep exactly the same best set as without pruning:
+        - Extra skill levels of the other piece must never be able to exceed their max level.
+        - If both pieces would rank the same, only the one coming first is kept.
+
+        Args:
+            df_usable_armors (pandas.DataFrame): Candidate armors, with a 'Decorations_score' column.
+            filtered_df_talismans (pandas.DataFrame): Talismans filtered by relevant skills.
+            necessary_skills (list): Skills required in the final armor set.
+            df_skills (pandas.DataFrame): Skill data containing max level for each skill.
+
+        Returns:
+            tuple:
+                - pandas.DataFrame: Non-dominated armors, in the same order.
+                - dict: Number of removed armor pieces by armor type.
+        """
+        armor_cat = ['head', 'chest', 'arm', 'waist', 'leg']
+        skill_max_levels = df_skills.set_index('Skill')['skill_max_level']
+        defense_skill_names = set(self.defense_rules)
+
+        skill_names = list(dict.fromkeys(
+            list(df_usable_armors[['Skill_1_name', 'Skill_2_name', 'Skill_3_name']].stack())
+            + list(filtered_df_talismans['Skill_name'])))
+        skill_index = {skill_name: i for i, skill_name in enumerate(skill_names)}
+        max_levels = np.array([skill_max_levels.get(skill_name, np.inf) for skill_name in skill_names])
+        ranked = np.array([skill_name in necessary_skills or skill_name in defense_skill_names
+                           for skill_name in skill_names], dtype=bool)
+        necessary = np.array([skill_name in necessary_skills for skill_name in skill_names], dtype=bool)
+
+        levels = np.zeros((len(df_usable_armors), len(skill_names)))
+        for i, (id, armor) in enumerate(df_usable_armors.iterrows()):
+            for col in ['Skill_1', 'Skill_2', 'Skill_3']:
+                if not pd.isnull(armor[f'{col}_name']):
+                    levels[i, skill_index[armor[f'{col}_name']]] += armor[f'{col}_lvl']
+        slots = df_usable_armors[['Decoration_slot_1_size', 'Decoration_slot_2_size', 'Decoration_slot_3_size']]\
+            .to_numpy(dtype=np.float64)
+        nb_decorations = np.stack([(slots == size).sum(axis=1) for size in [1, 2, 3]], axis=1)
+        defense = df_usable_armors['Defense'].to_numpy(dtype=np.float64)
+        armor_types = df_usable_armors['Armor_type'].to_numpy()
+
+        talisman_levels = np.zeros(len(skill_names))
+        for id, talisman in filtered_df_talismans.iterrows():
+            talisman_levels[skill_index[talisman['Skill_name']]] = max(
+                talisman_levels[skill_index[talisman['Skill_name']]], talisman['Skill_lvl'])
+        best_levels_by_type = {cat: levels[armor_types == cat].max(axis=0, initial=0) for cat in armor_cat}
+
+        keep = np.ones(len(df_usable_armors), dtype=bool)
+        pruned_armors_count = {}
+        for cat in armor_cat:
+            rows = np.flatnonzero(armor_types == cat)
+            if len(rows) == 0:
+                continue
+            reachable_elsewhere = talisman_levels + sum(
+                best_levels for other_cat, best_levels in best_levels_by_type.items() if other_cat != cat)
+            safe = levels[rows] + reachable_elsewhere <= max_levels
+
+            # pairwise comparisons, [i, j] being piece i against piece j
+            more = levels[rows][:, None, :] > levels[rows][None, :, :]
+            at_least = (levels[rows][:, None, ranked] >= levels[rows][None, :, ranked]).all(axis=2)\
+                & (defense[rows][:, None] >= defense[rows][None, :])\
+                & (nb_decorations[rows][:, None, :] >= nb_decorations[rows][None, :, :]).all(axis=2)
+            always_valid = (~more | safe[:, None, :]).all(axis=2)
+            strictly_better = more[:, :, necessary].any(axis=2)\
+                | (nb_decorations[rows][:, None, :] > nb_decorations[rows][None, :, :]).any(axis=2)
+            comes_first = np.arange(len(rows))[:, None] < np.arange(len(rows))[None, :]
+
+            dominated = (at_least & always_valid & (strictly_better | comes_first)).any(axis=0)
+            keep[rows[dominated]] = False
+            pruned_armors_count[cat] = int(dominated.sum())
+
+        return df_usable_armors.loc[keep], pruned_armors_count
+
+    def make_armor_sets(self, filtered_df_armors, filtered_df_talismans, df_best_armors=None, max_level_by_skill=None):
         """
         Generates all possible armor set combinations by recursively combining armor pieces
         (head, chest, arm, waist, leg) with talismans.
@@ -137,7 +342,9 @@ class SetMaker:
         Args:
             filtered_df_armors (pandas.DataFrame): Filtered set of relevant armors.
             filtered_df_talismans (pandas.DataFrame): Filtered set of relevant talismans.
-            df_best_armors (pandas.DataFrame): Best armor pieces by type to supplement combinations.
+            df_best_armors (pandas.DataFrame): Best armor pieces by type to supplement combinations,
+                if they aren't already part of `filtered_df_armors`.
+            max_level_by_skill (pandas.Series): Optional max level of each skill, to only generate valid sets.
 
         Returns:
             pandas.DataFrame: All generated armor set combinations.
@@ -149,7 +356,7 @@ class SetMaker:
         armor_set = ArmorSet()
 
         all_armor_sets = self._armor_set_recursion(
-            0, armor_set, all_armor_sets, df_usable_armors, armor_cat, filtered_df_talismans)
+            0, armor_set, all_armor_sets, df_usable_armors, armor_cat, filtered_df_talismans, max_level_by_skill)
 
         if len(all_armor_sets) > 1:
             all_armor_sets = pd.concat(
@@ -158,12 +365,115 @@ class SetMaker:
             all_armor_sets = pd.json_normalize(all_armor_sets[0].__dict__, sep='_')
         return all_armor_sets
 
+    def make_best_sets_streaming(self, df_usable_armors, filtered_df_talismans, necessary_skills, sort_on='defense',
+                                 k=1, batch_size=10_000, memory_limit_mb=None, validate_during_generation=False):
+        """
+        Generates, filters and ranks armor sets as a stream of fixed-size batches, keeping only a running top-k.
+
+        Each batch of sets from `_armor_set_generator` goes through `filter_valid_armor_sets` and
+        `add_defense_by_skills_to_armor_sets`, then is merged with the current k best sets, so that
+        memory depends on the batch size instead of the number of combinations.
+
+        Args:
+            df_usable_armors (pandas.DataFrame): Candidate armors (relevant ones and best ones by type).
+            filtered_df_talismans (pandas.DataFrame): Filtered set of relevant talismans.
+            necessary_skills (list): Skills required in the final armor set.
+            sort_on (str): Primary sorting criterion after skills, 'defense' or 'decorations'.
+            k (int): Number of armor sets to keep.
+            batch_size (int): Maximum number of armor sets per batch.
+            memory_limit_mb (float): Optional memory ceiling of a batch, in megabytes. The first batch,
+                of at most 100 sets, is measured with `tracemalloc`: the next batches are sized to fit
+                the ceiling from its peak memory per set, from generation to ranking (tens of kilobytes,
+                mostly the one-row DataFrames of the sets before they are concatenated).
+            validate_during_generation (bool): Whether to drop sets exceeding skill max levels
+                while they are generated, instead of once they are in a DataFrame.
+
+        Returns:
+            pandas.DataFrame: The k best valid armor sets, in ranking order.
+        """
+        armor_cat = ['head', 'chest', 'arm', 'waist', 'leg']
+        max_level_by_skill = self._get_max_level_by_skill(self.df_skills) if validate_during_generation else None
+        all_armor_sets = self._armor_set_generator(
+            0, ArmorSet(), df_usable_armors, armor_cat, filtered_df_talismans, max_level_by_skill)
+        measure_batch = memory_limit_mb is not None
+        if measure_batch:
+            # a few megabytes, to stay under the ceiling before sets are measured
+            batch_size = min(batch_size, 100)
+
+        best_sets = None
+        while True:
+            with self._trace_peak_memory() if measure_batch else nullcontext() as memory:
+                armor_sets = list(islice(all_armor_sets, batch_size))
+                nb_sets = len(armor_sets)
+                if nb_sets > 0:
+                    df_armor_sets = pd.concat(
+                        [pd.json_normalize(armor_set.__dict__, sep='_') for armor_set in armor_sets])
+                    del armor_sets
+                    best_sets = self._add_batch_to_best_sets(df_armor_sets, best_sets, necessary_skills, sort_on, k)
+                    del df_armor_sets
+            if nb_sets == 0:
+                break
+            if measure_batch:
+                bytes_per_set = max(memory['peak_bytes'], 1) / nb_sets
+                batch_size = max(1, int(memory_limit_mb * 2**20 // bytes_per_set))
+                measure_batch = False
+
+        if best_sets is None:
+            return pd.DataFrame()
+        return best_sets.reset_index(drop=True)
+
+    def _add_batch_to_best_sets(self, df_armor_sets, best_sets, necessary_skills, sort_on, k):
+        """
+        Filters and ranks a batch of armor sets with the current k best sets.
+
+        Args:
+            df_armor_sets (pandas.DataFrame): A batch of generated armor sets.
+            best_sets (pandas.DataFrame): The k best valid armor sets of the previous batches, None if there is none.
+            necessary_skills (list): Skills required in the final armor set.
+            sort_on (str): Primary sorting criterion after skills, 'defense' or 'decorations'.
+            k (int): Number of armor sets to keep.
+
+        Returns:
+            pandas.DataFrame: The k best valid armor sets of the batch and previous ones, None if there is none.
+        """
+        relevant_sets = self.filter_valid_armor_sets(df_armor_sets, self.df_skills)
+        if len(relevant_sets) == 0:
+            return best_sets
+        relevant_sets = self.add_defense_by_skills_to_armor_sets(relevant_sets)
+
+        if best_sets is not None:
+            relevant_sets = pd.concat([best_sets, relevant_sets]).fillna(0)
+        return self._sort_armor_sets(relevant_sets, necessary_skills, sort_on).head(k)
+
+    @contextmanager
+    def _trace_peak_memory(self):
+        """
+        Measures the peak memory allocated inside the block with `tracemalloc`, traced only meanwhile
+        unless it already was.
+
+        Yields:
+            dict: Filled on exit with 'peak_bytes', the peak traced memory above the memory traced on entry.
+        """
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        start_bytes = tracemalloc.get_traced_memory()[0]
+        memory = {}
+        try:
+            yield memory
+        finally:
+            memory['peak_bytes'] = tracemalloc.get_traced_memory()[1] - start_bytes
+            if not was_tracing:
+                tracemalloc.stop()
+
     def filter_valid_armor_sets(self, all_armor_sets, df_skills):
         """
         Filters out armor sets that exceed the maximum allowed skill levels.
 
-        - Compares each skill in the armor set against its max level.
-        - Keeps only the valid combinations.
+        - Aligns the max level of each skill to the `skills_*` columns.
+        - Compares all skill columns against their max level at once.
+        - Keeps only the valid combinations, with missing skill levels set to 0.
 
         Args:
             all_armor_sets (pandas.DataFrame): All generated armor sets.
@@ -173,13 +483,16 @@ class SetMaker:
             pandas.DataFrame: All valid armor sets.
         """
         all_armor_sets.reset_index(inplace=True, drop=True)
-        all_armor_sets = all_armor_sets.fillna(0)
 
-        filter = True
-        for skill_name in [col_skill for col_skill in all_armor_sets.columns if 'skills' in col_skill]:
-            filter &= (all_armor_sets[skill_name]
-                       <= df_skills[df_skills['Skill'] == skill_name.split('_')[1]]['skill_max_level'].item())
-        all_relevant_sets = all_armor_sets.loc[filter].reset_index(drop=True)
+        skills_cols_names = [col_skill for col_skill in all_armor_sets.columns if 'skills' in col_skill]
+        max_levels = self._get_max_level_by_skill(df_skills).reindex(
+            [col_skill.split('_')[1] for col_skill in skills_cols_names])
+        if max_levels.isna().any():
+            raise ValueError(f"Unknown skills: {list(max_levels.index[max_levels.isna()])}")
+
+        # missing skills are NaN, which never exceed a max level
+        filter = ~(all_armor_sets[skills_cols_names].to_numpy() > max_levels.to_numpy()).any(axis=1)
+        all_relevant_sets = all_armor_sets.loc[filter].fillna(0).reset_index(drop=True)
 
         return all_relevant_sets
 
@@ -192,9 +505,8 @@ class SetMaker:
         - Defense Boost (Lv1-Lv5)
         - Elemental Resistances (e.g., Fire, Ice, Dragon, Thunder, Water) at Lv3
 
-        The skill impact is defined in a dictionary (`defense_by_skills`) where each key represents
-        a skill at a specific level, and the corresponding value is a list:
-        [percentage_bonus, flat_bonus].
+        The bonuses are looked up for all armor sets at once in the level-indexed arrays
+        of `self.defense_rules` (see `_load_defense_rules`), skill by skill in alphabetical order.
 
         Args:
             all_relevant_sets (pandas.DataFrame): All valid armor sets.
@@ -202,53 +514,41 @@ class SetMaker:
         Returns:
             pandas.DataFrame: The same DataFrame with updated defense values reflecting skill-based bonuses.
         """
-        defense_by_skills = {
-            'Defense Boost_lv0': [0/100, 0],
-            'Defense Boost_lv1': [0/100, 5],
-            'Defense Boost_lv2': [0/100, 10],
-            'Defense Boost_lv3': [5/100, 10],
-            'Defense Boost_lv4': [5/100, 20],
-            'Defense Boost_lv5': [8/100, 20],
-            'Dragon Resistance_lv0': [0/100, 0],
-            'Dragon Resistance_lv1': [0/100, 0],
-            'Dragon Resistance_lv2': [0/100, 0],
-            'Dragon Resistance_lv3': [0/100, 10],
-            'Fire Resistance_lv0': [0/100, 0],
-            'Fire Resistance_lv1': [0/100, 0],
-            'Fire Resistance_lv2': [0/100, 0],
-            'Fire Resistance_lv3': [0/100, 10],
-            'Ice Resistance_lv0': [0/100, 0],
-            'Ice Resistance_lv1': [0/100, 0],
-            'Ice Resistance_lv2': [0/100, 0],
-            'Ice Resistance_lv3': [0/100, 10],
-            'Thunder Resistance_lv0': [0/100, 0],
-            'Thunder Resistance_lv1': [0/100, 0],
-            'Thunder Resistance_lv2': [0/100, 0],
-            'Thunder Resistance_lv3': [0/100, 10],
-            'Water Resistance_lv0': [0/100, 0],
-            'Water Resistance_lv1': [0/100, 0],
-            'Water Resistance_lv2': [0/100, 0],
-            'Water Resistance_lv3': [0/100, 10]
-        }
-
-        cols_skills = [col_skill for col_skill in all_relevant_sets.columns if 'skills' in col_skill]
-        defense_skill_names = [defense_skill.split('_')[0] for defense_skill in defense_by_skills.keys()]
-
-        cols_defense_skills = [col_skill for col_skill in cols_skills if col_skill.split('_')[1] in defense_skill_names]
-        cols_defense_skills.sort()
-
-        for col_skill in cols_defense_skills:
-            all_relevant_sets['defense'] = all_relevant_sets.apply(
-                lambda x: x['defense']
-                + (defense_by_skills[f'{col_skill.split('_')[1]}_lv{int(x[col_skill])}'][0] * x['defense'])
-                + defense_by_skills[f'{col_skill.split('_')[1]}_lv{int(x[col_skill])}'][1],
-                axis=1
-                )
-
-        all_relevant_sets['defense'] = all_relevant_sets['defense'].round().astype(int)
+        defense = all_relevant_sets['defense'].to_numpy(dtype=np.float64)
+        for skill_name, (percentage, flat) in self.defense_rules.items():
+            if f'skills_{skill_name}' not in all_relevant_sets.columns:
+                continue
+            lvl = np.clip(all_relevant_sets[f'skills_{skill_name}'].to_numpy(dtype=np.int64), 0, len(percentage) - 1)
+            defense = defense + (percentage[lvl] * defense) + flat[lvl]
+
+        all_relevant_sets['defense'] = np.round(defense).astype(int)
 
         return all_relevant_sets
 
+    def _sort_armor_sets(self, all_relevant_sets, necessary_skills, sort_on='defense'):
+        """
+        Sorts armor sets by skill levels, then defense or decoration score, then slot availability.
+
+        Args:
+            all_relevant_sets (pandas.DataFrame): Valid armor sets.
+            necessary_skills (list): Skills required in the final armor set.
+            sort_on (str): Primary sorting criterion after skills, 'defense' or 'decorations'.
+
+        Returns:
+            pandas.DataFrame: The sorted armor sets, best first.
+        """
+        match sort_on:
+            case "defense":
+                sort_by = [f'skills_{skill_name}' for skill_name in necessary_skills]\
+                    + ['defense', 'decorations_score', 'nb_decorations_size_1']
+            case "decorations":
+                sort_by = [f'skills_{skill_name}' for skill_name in necessary_skills]\
+                    + ['decorations_score', 'defense', 'nb_decorations_size_1']
+        for skill_name in necessary_skills:
+            if f'skills_{skill_name}' not in all_relevant_sets.columns:
+                all_relevant_sets[f'skills_{skill_name}'] = 0
+        return all_relevant_sets.sort_values(by=sort_by, ascending=False)
+
     def get_best_set(self, all_relevant_sets, necessary_skills, sort_on='defense'):
         """
         Selects the best armor set among all valid ones, based on required skills
@@ -265,16 +565,166 @@ class SetMaker:
         Returns:
             pandas.DataFrame: A single-row DataFrame containing the best armor set.
         """
-        match sort_on:
-            case "defense":
-                sort_by = [f'skills_{skill_name}' for skill_name in necessary_skills]\
-                    + ['defense', 'decorations_score', 'nb_decorations_size_1']
-            case "decorations":
-                sort_by = [f'skills_{skill_name}' for skill_name in necessary_skills]\
-                    + ['decorations_score', 'defense', 'nb_decorations_size_1']
-        best_set = all_relevant_sets.sort_values(by=sort_by, ascending=False).iloc[0].to_frame().transpose()
+        best_set = self._sort_armor_sets(all_relevant_sets, necessary_skills, sort_on).iloc[0].to_frame().transpose()
 
         best_set[best_set.columns[11:]] = best_set[best_set.columns[11:]].replace(0, np.nan)
         best_set.dropna(inplace=True, axis=1)
 
         return best_set
+
+    def make_best_set(self, necessary_skills, sort_on='defense', engine='branch_and_bound', prune=True,
+                      batch_size=10_000, memory_limit_mb=None, max_workers=None,
+                      validate_during_generation=False, instrumentation=None, skill_targets=None):
+        """
+        Runs the whole set making pipeline and returns the best armor set.
+
+        - Filters relevant armors and talismans and adds the best armor piece of each type.
+        - Removes dominated armor pieces with `prune_dominated_armors` and keeps the number
+          of removed pieces by type in `self.pruned_armors_count`.
+        - Searches the best valid armor set with the chosen engine.
+        - Formats the result with `get_best_set`.
+
+        If skill targets are given, armor sets below a target are kept when decorations can reach it
+        with their free slots (see `DecorationFitter`), and are ranked with the skill levels and free slots
+        left after the decorations. The decorations of the best set are listed in `best_set.attrs['decorations']`.
+        If a result cache is set, results are looked up and stored by necessary skills, sorting criterion
+        and dataset version, so that the pipeline only runs once per request until the data changes.
+        If instrumentation is set, the wall time of each stage, candidate counts by armor type and numbers
+        of generated, valid and final armor sets are recorded in a profile sent to its sinks.
+
+        Args:
+            necessary_skills (list): Skills required in the final armor set, in priority order.
+            sort_on (str): Primary sorting criterion after skills, 'defense' or 'decorations'.
+            engine (str): 'vectorized' to evaluate every combination with the NumPy `SetEngine`,
+                'branch_and_bound' to let `SetEngine` prune partial sets that can't be the best one,
+                'meet_in_the_middle' to let `SetEngine` join head/chest/arm and waist/leg/talisman halves,
+                'parallel' to evaluate every combination with `SetEngine` in worker processes shared by every run
+                (small searches stay in this process),
+                'legacy' to build every `ArmorSet` with `_armor_set_recursion` (kept to cross-check results),
+                or 'streaming' to build them in batches with `make_best_sets_streaming`.
+            prune (bool): Whether to remove dominated armor pieces before the search.
+            batch_size (int): Maximum number of armor sets per batch with the 'streaming' engine.
+            memory_limit_mb (float): Optional memory ceiling, in megabytes, of a batch of armor sets
+                or of a chunk of combinations evaluated by `SetEngine`.
+            max_workers (int): Number of worker processes with the 'parallel' engine, the number of CPUs by default.
+            validate_during_generation (bool): Whether the 'legacy' and 'streaming' engines drop sets
+                exceeding skill max levels while they are generated.
+            instrumentation (Instrumentation): Instrumentation of this run, `self.instrumentation` by default.
+            skill_targets (dict): Optional target level of necessary skills, reached with decorations if needed.
+                Only the `SetEngine` engines support them, not 'legacy' nor 'streaming'.
+
+        Returns:
+            pandas.DataFrame or None: A single-row DataFrame containing the best armor set,
+            or None if no valid armor set exists.
+        """
+        if skill_targets is not None and engine in ["legacy", "streaming"]:
+            raise ValueError(f"Skill targets aren't supported by the {engine} engine")
+
+        instrumentation = self.instrumentation if instrumentation is None else instrumentation
+        profile = NULL_PROFILE if instrumentation is None else instrumentation.start(
+            necessary_skills=list(necessary_skills), sort_on=sort_on, engine=engine)
+        try:
+            if self.result_cache is None:
+                return self._search_best_set(necessary_skills, sort_on, engine, prune, batch_size, memory_limit_mb,
+                                             max_workers, validate_during_generation, profile, skill_targets)
+
+            key = self.result_cache.make_key(necessary_skills, sort_on, self.dataset_version, skill_targets)
+            found, best_set = self.result_cache.get(key)
+            profile.record('result_cache_hit', int(found))
+            if not found:
+                best_set = self._search_best_set(necessary_skills, sort_on, engine, prune, batch_size,
+                                                 memory_limit_mb, max_workers, validate_during_generation, profile,
+                                                 skill_targets)
+                self.result_cache.set(key, best_set)
+            return None if best_set is None else best_set.copy()
+        finally:
+            if instrumentation is not None:
+                instrumentation.finish(profile)
+
+    def _count_by_armor_type(self, df_armors):
+        """
+        Counts armor pieces of each armor type.
+
+        Args:
+            df_armors (pandas.DataFrame): Armor data.
+
+        Returns:
+            dict: Number of armor pieces by armor type.
+        """
+        counts = df_armors['Armor_type'].value_counts()
+        return {armor_type: int(counts.get(armor_type, 0)) for armor_type in ['head', 'chest', 'arm', 'waist', 'leg']}
+
+    def _search_best_set(self, necessary_skills, sort_on, engine, prune, batch_size, memory_limit_mb, max_workers,
+                         validate_during_generation, profile=NULL_PROFILE, skill_targets=None):
+        """
+        Runs the set making pipeline of `make_best_set`, without looking up the result cache.
+
+        Returns:
+            pandas.DataFrame or None: A single-row DataFrame containing the best armor set,
+            or None if no valid armor set exists.
+        """
+        with profile.stage('filter_relevant_armors_and_talismans'):
+            filtered_df_armors, filtered_df_talismans = self.filter_relevant_armors_and_talismans(
+                necessary_skills, self.df_scored_armors, self.df_talismans)
+        with profile.stage('get_best_armor_for_each_type'):
+            if sort_on not in self.best_armors_by_sort_on:
+                self.best_armors_by_sort_on[sort_on] = self.get_best_armor_for_each_type(
+                    self.df_scored_armors, sort_on)
+            df_best_armors = self.best_armors_by_sort_on[sort_on]
+
+        df_usable_armors = pd.concat([filtered_df_armors, df_best_armors])
+        profile.record('candidates', self._count_by_armor_type(df_usable_armors))
+        profile.record('talismans', len(filtered_df_talismans))
+        self.pruned_armors_count = {}
+        if prune:
+            with profile.stage('prune_dominated_armors'):
+                df_usable_armors, self.pruned_armors_count = self.prune_dominated_armors(
+                    df_usable_armors, filtered_df_talismans, necessary_skills, self.df_skills)
+            profile.record('candidates_after_pruning', self._count_by_armor_type(df_usable_armors))
+        profile.record('combinations', len(filtered_df_talismans) * int(np.prod(
+            list(self._count_by_armor_type(df_usable_armors).values()), dtype=np.int64)))
+
+        match engine:
+            case "legacy":
+                max_level_by_skill = None
+                if validate_during_generation:
+                    max_level_by_skill = self._get_max_level_by_skill(self.df_skills)
+                with profile.stage('make_armor_sets'):
+                    armor_sets = self.make_armor_sets(
+                        df_usable_armors, filtered_df_talismans, max_level_by_skill=max_level_by_skill)
+                profile.record('raw_sets', len(armor_sets))
+                if len(armor_sets) == 0:
+                    return None
+                with profile.stage('filter_valid_armor_sets'):
+                    relevant_sets = self.filter_valid_armor_sets(armor_sets, self.df_skills)
+                profile.record('valid_sets', len(relevant_sets))
+                if len(relevant_sets) == 0:
+                    return None
+                with profile.stage('add_defense_by_skills_to_armor_sets'):
+                    relevant_sets = self.add_defense_by_skills_to_armor_sets(relevant_sets)
+            case "streaming":
+                with profile.stage('make_best_sets_streaming'):
+                    relevant_sets = self.make_best_sets_streaming(
+                        df_usable_armors, filtered_df_talismans, necessary_skills, sort_on, k=1,
+                        batch_size=batch_size, memory_limit_mb=memory_limit_mb,
+                        validate_during_generation=validate_during_generation)
+            case "vectorized" | "branch_and_bound" | "meet_in_the_middle" | "parallel":
+                with profile.stage('load_set_engine'):
+                    set_engine = SetEngine(
+                        df_usable_armors, filtered_df_talismans, self.df_skills, necessary_skills,
+                        self.defense_rules, sort_on, memory_limit_mb=memory_limit_mb,
+                        decoration_fitter=self.decoration_fitter, skill_targets=skill_targets)
+                with profile.stage('search'):
+                    relevant_sets = set_engine.best_sets(
+                        k=1, strategy='exhaustive' if engine == 'vectorized' else engine, max_workers=max_workers)
+            case _:
+                raise ValueError(f"Unknown engine: {engine}")
+
+        profile.record('final_sets', len(relevant_sets))
+        if len(relevant_sets) == 0:
+            return None
+        with profile.stage('get_best_set'):
+            best_set = self.get_best_set(relevant_sets, necessary_skills, sort_on)
+        if skill_targets is not None:
+            best_set.attrs['decorations'] = relevant_sets.attrs['decorations'][0]
+        return best_set
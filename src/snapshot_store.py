@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+
+class SnapshotStore:
+    """
+    Versioned, immutable snapshots of the cleaned data files.
+
+    A refresh writes its files into a new snapshot directory, which readers can't see until it is
+    published: its manifest is written, then the `CURRENT` pointer file is atomically replaced
+    to name it. Readers resolve the pointer once per load, so they keep reading the previous snapshot
+    while a refresh is running and never see half-written files.
+    - The bundled files of `src/data` are served until a first snapshot is published.
+    - The last `keep` published snapshots are kept, older ones and abandoned drafts are removed.
+    """
+    file_names = {
+        'decorations': "decorations.csv",
+        'armors': "armors.csv",
+        'skills': "skills.csv",
+        'talismans': "talismans.csv",
+    }
+
+    def __init__(self, root_dir="src/data/snapshots", bundled_dir="src/data", keep=3, max_draft_age=24 * 3600):
+        """
+        Args:
+            root_dir (str): Directory of the snapshots and of the `CURRENT` pointer file.
+            bundled_dir (str): Directory of the data files served when no snapshot was published.
+            keep (int): Number of published snapshots kept, at least 2 so that readers of the previous
+                snapshot aren't affected by a publication.
+            max_draft_age (float): Number of seconds after which an unpublished snapshot is seen as abandoned.
+        """
+        self.root_dir = root_dir
+        self.bundled_dir = bundled_dir
+        self.keep = max(keep, 2)
+        self.max_draft_age = max_draft_age
+        self.pointer_path = os.path.join(root_dir, "CURRENT")
+
+    def get_current_version(self):
+        """
+        Returns:
+            str or None: Version of the published snapshot, None if no snapshot was published.
+        """
+        try:
+            with open(self.pointer_path) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def get_current_dir(self):
+        """
+        Returns:
+            str: Directory of the published snapshot, or of the bundled data files if there is none.
+        """
+        version = self.get_current_version()
+        return self.bundled_dir if version is None else os.path.join(self.root_dir, version)
+
+    def get_paths(self, snapshot_dir=None):
+        """
+        Args:
+            snapshot_dir (str): Directory of a snapshot, the published one by default.
+
+        Returns:
+            dict: Path of each data file of the snapshot, keyed by source name.
+        """
+        snapshot_dir = self.get_current_dir() if snapshot_dir is None else snapshot_dir
+        return {source: os.path.join(snapshot_dir, file_name) for source, file_name in self.file_names.items()}
+
+    def create(self):
+        """
+        Creates an unpublished snapshot, filled with a copy of the files of the published one
+        so that a refresh only has to rewrite the sources that changed.
+
+        Returns:
+            str: Directory of the new snapshot.
+        """
+        version = f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+        snapshot_dir = os.path.join(self.root_dir, version)
+        os.makedirs(snapshot_dir)
+        current_dir = self.get_current_dir()
+        for file_name in self.file_names.values():
+            # typed Arrow copies are carried over too, their hash check still holds for the copied CSV file
+            for name in [file_name, os.path.splitext(file_name)[0] + ".arrow"]:
+                if os.path.exists(os.path.join(current_dir, name)):
+                    shutil.copy2(os.path.join(current_dir, name), os.path.join(snapshot_dir, name))
+        return snapshot_dir
+
+    def publish(self, snapshot_dir, metadata=None):
+        """
+        Publishes a complete snapshot: writes its manifest, then swaps the `CURRENT` pointer to it.
+
+        Args:
+            snapshot_dir (str): Directory of a snapshot made by `create`.
+            metadata (dict): Additional information recorded in the manifest, e.g. the refreshed sources.
+
+        Returns:
+            str: Version of the published snapshot.
+        """
+        version = os.path.basename(snapshot_dir)
+        files = {}
+        for source, path in self.get_paths(snapshot_dir).items():
+            with open(path, "rb") as f:
+                files[source] = hashlib.sha256(f.read()).hexdigest()
+        manifest = {
+            'version': version,
+            'parent': self.get_current_version(),
+            'published_at': time.time(),
+            'files': files,
+            **(metadata or {}),
+        }
+        with open(os.path.join(snapshot_dir, "manifest.json"), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        # a temporary file of its own, so that concurrent publications don't write into each other's
+        fd, tmp_path = tempfile.mkstemp(prefix="CURRENT.", suffix=".tmp", dir=self.root_dir)
+        with os.fdopen(fd, "w") as f:
+            f.write(version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.pointer_path)
+
+        self.prune()
+        return version
+
+    def discard(self, snapshot_dir):
+        """
+        Removes an unpublished snapshot, e.g. after a failed refresh or a refresh without changes.
+        The published snapshot is never removed.
+
+        Args:
+            snapshot_dir (str): Directory of a snapshot made by `create`.
+        """
+        if os.path.basename(snapshot_dir) == self.get_current_version():
+            return
+        shutil.rmtree(snapshot_dir, ignore_errors=True)
+
+    def get_manifest(self, version=None):
+        """
+        Args:
+            version (str): Version of a published snapshot, the current one by default.
+
+        Returns:
+            dict or None: Manifest of the snapshot, None if no snapshot was published.
+        """
+        version = self.get_current_version() if version is None else version
+        if version is None:
+            return None
+        with open(os.path.join(self.root_dir, version, "manifest.json")) as f:
+            return json.load(f)
+
+    def prune(self):
+        """
+        Removes published snapshots older than the last `keep` ones, and abandoned unpublished snapshots.
+        The published snapshot is never removed.
+        """
+        current_version = self.get_current_version()
+        published, drafts = [], []
+        for version in sorted(os.listdir(self.root_dir)):
+            snapshot_dir = os.path.join(self.root_dir, version)
+            if not os.path.isdir(snapshot_dir) or version == current_version:
+                continue
+            if os.path.exists(os.path.join(snapshot_dir, "manifest.json")):
+                published.append(snapshot_dir)
+            elif time.time() - os.path.getmtime(snapshot_dir) > self.max_draft_age:
+                drafts.append(snapshot_dir)
+
+        # versions sort by creation time, the current snapshot counts as one of the kept ones
+        for snapshot_dir in published[:max(len(published) - (self.keep - 1), 0)] + drafts:
+            shutil.rmtree(snapshot_dir, ignore_errors=True)
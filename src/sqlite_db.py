@@ -0,0 +1,44 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+
+# seconds a connection waits for the writes of other threads and processes before failing
+BUSY_TIMEOUT = 10
+
+
+def create_tables(db_path, *statements):
+    """
+    Creates a SQLite database shared by threads and processes, with its directory and tables if missing.
+
+    The database is switched to write-ahead logging, so that readers don't block the writer and the other way round.
+
+    Args:
+        db_path (str): Path of the database.
+        *statements (str): `CREATE TABLE IF NOT EXISTS` or `CREATE INDEX IF NOT EXISTS` statements.
+    """
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    with connect(db_path) as connection:
+        connection.execute("PRAGMA journal_mode=WAL")
+        for statement in statements:
+            connection.execute(statement)
+
+
+@contextmanager
+def connect(db_path):
+    """
+    Opens a connection to a database made by `create_tables`, waiting for other writers,
+    and commits then closes it on exit, or rolls back on an error.
+
+    Args:
+        db_path (str): Path of the database.
+
+    Yields:
+        sqlite3.Connection: Connection to the database.
+    """
+    connection = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT)
+    try:
+        with connection:
+            yield connection
+    finally:
+        connection.close()
@@ -0,0 +1,71 @@
+import hashlib
+import os
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+
+def get_arrow_path(csv_path):
+    """
+    Args:
+        csv_path (str): Path of a cleaned CSV file.
+
+    Returns:
+        str: Path of its typed Arrow IPC copy, next to it.
+    """
+    return os.path.splitext(csv_path)[0] + ".arrow"
+
+
+def _get_file_hash(path):
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def write_table(df, csv_path, dtypes):
+    """
+    Writes a cleaned table as CSV, and as a typed Arrow IPC copy if pyarrow is installed.
+
+    The Arrow copy holds the content of the CSV file as read by `pandas.read_csv`, cast to `dtypes`,
+    and the hash of the CSV file it was made from, so that it is ignored once the CSV file changes.
+
+    Args:
+        df (pandas.DataFrame): Cleaned table.
+        csv_path (str): Path of the CSV file.
+        dtypes (dict): Type of each column of the Arrow copy, e.g. 'Int8' or 'category'.
+    """
+    df.to_csv(csv_path, index=False)
+    if pyarrow is None:
+        return
+
+    table = pyarrow.Table.from_pandas(pd.read_csv(csv_path).astype(dtypes), preserve_index=False)
+    table = table.replace_schema_metadata({**table.schema.metadata, b'source_sha256': _get_file_hash(csv_path)})
+    arrow_path = get_arrow_path(csv_path)
+    pyarrow.feather.write_feather(table, arrow_path + ".tmp", compression='uncompressed')
+    os.replace(arrow_path + ".tmp", arrow_path)
+
+
+def read_table(csv_path, dtypes=None):
+    """
+    Reads a cleaned table from its typed Arrow IPC copy if it is up to date, from the CSV file otherwise.
+
+    Args:
+        csv_path (str): Path of the CSV file.
+        dtypes (dict): Types of the columns of the Arrow copy, see `write_table`. If given, the CSV file
+            is cast to them, so that both give the same table whether the Arrow copy exists or not.
+
+    Returns:
+        pandas.DataFrame: Cleaned table, with typed columns if read from the Arrow copy or cast to `dtypes`.
+    """
+    arrow_path = get_arrow_path(csv_path)
+    if pyarrow is not None and os.path.exists(arrow_path):
+        with pyarrow.OSFile(arrow_path) as source:
+            reader = pyarrow.ipc.open_file(source)
+            if (reader.schema.metadata or {}).get(b'source_sha256', b'').decode() == _get_file_hash(csv_path):
+                return reader.read_all().to_pandas()
+    df = pd.read_csv(csv_path)
+    return df if dtypes is None else df.astype(dtypes)
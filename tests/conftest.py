@@ -0,0 +1,98 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """
+    A local HTTP server recording the requests it receives, with pages configured by each test.
+
+    Every path answers its own path as body, unless it is one of `pages`. Paths can also be slowed down
+    with `delays`, fail with 503 responses the first `failures` times, or start with `/missing` for a 404.
+    """
+    # slow handlers aren't waited for when the server is closed
+    block_on_close = False
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), FixtureHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.nb_connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.pages = {}
+        self.delays = {}
+        self.failures = {}
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+    def get_requests(self, path):
+        with self.lock:
+            return [request for request in self.requests if request['path'] == path]
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    # keeps connections open between requests
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.nb_connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append({'path': self.path, 'headers': dict(self.headers), 'time': time.monotonic()})
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            failing = server.failures.get(self.path, 0) > 0
+            if failing:
+                server.failures[self.path] -= 1
+        try:
+            time.sleep(server.delays.get(self.path, 0))
+            if failing:
+                self._send(503, b"unavailable")
+            elif self.path.startswith("/missing"):
+                self._send(404, b"not found")
+            elif self.path in server.pages:
+                page = server.pages[self.path]
+                validators = {'ETag': page.get('etag'), 'Last-Modified': page.get('last_modified')}
+                validators = {name: value for name, value in validators.items() if value is not None}
+                if ((page.get('etag') is not None and self.headers.get('If-None-Match') == page['etag'])
+                        or (page.get('last_modified') is not None
+                            and self.headers.get('If-Modified-Since') == page['last_modified'])):
+                    self._send(304, headers=validators)
+                else:
+                    self._send(200, page['body'].encode(), {'Content-Type': "text/html; charset=utf-8", **validators})
+            else:
+                self._send(200, self.path.encode(), {'Content-Type': "text/html; charset=utf-8"})
+        except (BrokenPipeError, ConnectionResetError):
+            # the client gave up, e.g. after a timeout
+            self.close_connection = True
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+@pytest.fixture
+def http_server():
+    server = FixtureServer()
+    threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
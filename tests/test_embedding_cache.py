@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from benchmarks.bench_retrieval import HashingEmbeddings
+from src.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class RecordingEmbeddings(HashingEmbeddings):
+    """
+    The offline hashing embeddings, recording the texts of every `embed_documents` call.
+    """
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return EmbeddingCache(str(tmp_path / "embeddings.sqlite"))
+
+
+def assert_vectors_equal(vectors, texts):
+    expected = HashingEmbeddings().embed_documents(texts)
+    np.testing.assert_allclose(np.array(vectors), np.array(expected, dtype=np.float32))
+
+
+def test_cache_hits_skip_the_embedding_client(cache):
+    CachedEmbeddings(RecordingEmbeddings(), cache, "hashing").embed_documents(["Attack Boost", "Critical Eye"])
+    embeddings = RecordingEmbeddings()
+    cached_embeddings = CachedEmbeddings(embeddings, cache, "hashing")
+
+    vectors = cached_embeddings.embed_documents(["Critical Eye", "Attack Boost"])
+
+    assert embeddings.calls == []
+    assert_vectors_equal(vectors, ["Critical Eye", "Attack Boost"])
+    assert cached_embeddings.stats()['hits'] == 2
+
+
+def test_vectors_are_cached_per_model(cache):
+    CachedEmbeddings(RecordingEmbeddings(), cache, "hashing").embed_documents(["Attack Boost", "Critical Eye"])
+    embeddings = RecordingEmbeddings()
+
+    CachedEmbeddings(embeddings, cache, "other-hashing").embed_documents(["Attack Boost", "Critical Eye"])
+
+    assert embeddings.calls == [["Attack Boost", "Critical Eye"]]
+    assert cache.stats() == {'hashing': 2, 'other-hashing': 2}
+
+
+def test_only_misses_of_a_mixed_batch_are_embedded(cache):
+    CachedEmbeddings(RecordingEmbeddings(), cache, "hashing").embed_documents(["Attack Boost", "Critical Eye"])
+    embeddings = RecordingEmbeddings()
+    cached_embeddings = CachedEmbeddings(embeddings, cache, "hashing", batch_size=2, max_workers=1)
+    texts = ["Critical Eye", "Agitator", "Attack Boost", "Agitator", "Burst", "Guard"]
+
+    vectors = cached_embeddings.embed_documents(texts)
+
+    # misses are deduplicated, then embedded in batches
+    assert embeddings.calls == [["Agitator", "Burst"], ["Guard"]]
+    assert_vectors_equal(vectors, texts)
+    stats = cached_embeddings.stats()
+    assert (stats['hits'], stats['misses'], stats['embed_calls'], stats['embedded_texts']) == (2, 4, 2, 3)
+    assert cache.stats() == {'hashing': 5}
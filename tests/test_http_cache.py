@@ -0,0 +1,105 @@
+import pytest
+
+from src.http_cache import CacheMissError, HttpCache
+from src.http_fetcher import HttpFetcher
+from src.scraper import Scraper
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr("src.http_cache.time.time", clock)
+    return clock
+
+
+def test_unchanged_page_is_served_from_the_cache_after_a_304(http_server, tmp_path):
+    http_server.pages = {"/page": {'body': "<p>page</p>", 'etag': '"v1"',
+                                   'last_modified': "Wed, 01 Oct 2025 00:00:00 GMT"}}
+    fetcher = HttpFetcher(cache=HttpCache(str(tmp_path / "pages.sqlite")))
+
+    assert fetcher.get(http_server.url("/page")) == "<p>page</p>"
+    # the server answers without the body from now on
+    http_server.pages["/page"]['body'] = ""
+    assert fetcher.get(http_server.url("/page")) == "<p>page</p>"
+
+    first, second = http_server.get_requests("/page")
+    assert "If-None-Match" not in first['headers']
+    assert second['headers']['If-None-Match'] == '"v1"'
+    assert second['headers']['If-Modified-Since'] == "Wed, 01 Oct 2025 00:00:00 GMT"
+    assert fetcher.stats() == {'downloaded': 1, 'not_modified': 1, 'replayed': 0}
+
+
+def test_changed_page_is_downloaded_again(http_server, tmp_path):
+    http_server.pages = {"/page": {'body': "old", 'etag': '"v1"'}}
+    cache = HttpCache(str(tmp_path / "pages.sqlite"))
+    fetcher = HttpFetcher(cache=cache)
+
+    fetcher.get(http_server.url("/page"))
+    http_server.pages["/page"] = {'body': "new", 'etag': '"v2"'}
+
+    assert fetcher.get(http_server.url("/page")) == "new"
+    assert cache.get(http_server.url("/page")) == {'body': "new", 'etag': '"v2"', 'last_modified': None}
+
+
+def test_replay_only_serves_recorded_pages_without_requests(http_server, tmp_path, clock):
+    cache = HttpCache(str(tmp_path / "pages.sqlite"), max_age=100)
+    cache.set(http_server.url("/recorded"), "recorded")
+    clock.now += 1000
+    fetcher = HttpFetcher(cache=cache, replay_only=True)
+
+    # even once expired
+    assert fetcher.get(http_server.url("/recorded")) == "recorded"
+    with pytest.raises(CacheMissError):
+        fetcher.get(http_server.url("/not-recorded"))
+    assert http_server.requests == []
+
+
+def test_scraper_runs_offline_on_recorded_pages(tmp_path):
+    cache = HttpCache(str(tmp_path / "pages.sqlite"))
+    cache.set("https://example.com/decorations",
+              "<table><thead><tr><th>Decoration</th><th>Slots</th></tr></thead>"
+              "<tbody><tr><td>Attack Jewel [1]</td><td>1</td></tr></tbody></table>")
+    scraper = Scraper(decoration_url="https://example.com/decorations",
+                      fetcher=HttpFetcher(cache=cache, replay_only=True))
+
+    df_decorations = scraper.decorations_scraping()
+
+    assert df_decorations.to_dict('records') == [{'Decoration': "Attack Jewel [1]", 'Slots': "1"}]
+
+
+def test_pages_older_than_max_age_are_evicted(tmp_path, clock):
+    cache = HttpCache(str(tmp_path / "pages.sqlite"), max_age=100)
+    cache.set("old", "old")
+    clock.now += 60
+    cache.set("recent", "recent")
+
+    clock.now += 60
+    assert cache.get("old") is None
+    assert cache.get("old", include_expired=True)['body'] == "old"
+    cache.set("new", "new")
+    assert cache.get("old", include_expired=True) is None
+    assert cache.stats()['pages'] == 2
+
+
+def test_least_recently_used_pages_are_evicted_beyond_max_size(tmp_path, clock):
+    cache = HttpCache(str(tmp_path / "pages.sqlite"), max_size_mb=2.5 * 1000 / 2**20)
+    for url in ["a", "b"]:
+        cache.set(url, url * 1000)
+        clock.now += 1
+    cache.get("a")
+    clock.now += 1
+
+    cache.set("c", "c" * 1000)
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    assert cache.stats() == {'pages': 2, 'size': 2000}
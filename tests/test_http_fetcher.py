@@ -0,0 +1,66 @@
+import time
+
+import pytest
+import requests
+
+from src.http_fetcher import HttpFetcher
+
+
+def test_get_many_returns_pages_in_order(http_server):
+    paths = [f"/page/{i}" for i in range(8)]
+    # the first pages answer last
+    http_server.delays = {path: 0.05 * (len(paths) - i) for i, path in enumerate(paths)}
+    fetcher = HttpFetcher(max_workers=4)
+
+    pages = fetcher.get_many([http_server.url(path) for path in paths] + [http_server.url("/missing")])
+
+    assert pages[:-1] == paths
+    assert isinstance(pages[-1], requests.HTTPError)
+
+
+def test_get_retries_after_a_503(http_server):
+    http_server.failures = {"/flaky": 2}
+    fetcher = HttpFetcher(retries=3, backoff_factor=0.01)
+
+    assert fetcher.get(http_server.url("/flaky")) == "/flaky"
+    assert len(http_server.get_requests("/flaky")) == 3
+
+
+def test_get_raises_once_retries_are_exhausted(http_server):
+    http_server.failures = {"/down": 10}
+    fetcher = HttpFetcher(retries=2, backoff_factor=0.01)
+
+    with pytest.raises(requests.RequestException):
+        fetcher.get(http_server.url("/down"))
+    assert len(http_server.get_requests("/down")) == 3
+
+
+def test_get_times_out_on_a_slow_page(http_server):
+    http_server.delays = {"/slow": 2}
+    fetcher = HttpFetcher(timeout=0.2, retries=0)
+
+    start = time.monotonic()
+    with pytest.raises(requests.RequestException):
+        fetcher.get(http_server.url("/slow"))
+    assert time.monotonic() - start < 1
+
+
+def test_requests_are_spaced_by_the_delay(http_server):
+    fetcher = HttpFetcher(max_workers=4, delay=0.2)
+
+    fetcher.get_many([http_server.url(f"/page/{i}") for i in range(4)])
+
+    times = sorted(request['time'] for request in http_server.requests)
+    assert all(later - earlier >= 0.18 for earlier, later in zip(times, times[1:]))
+
+
+def test_get_many_keeps_at_most_max_workers_requests_in_flight(http_server):
+    paths = [f"/page/{i}" for i in range(12)]
+    http_server.delays = {path: 0.1 for path in paths}
+    fetcher = HttpFetcher(max_workers=3)
+
+    fetcher.get_many([http_server.url(path) for path in paths])
+
+    assert http_server.max_in_flight == 3
+    # connections of the shared session are reused by the next requests
+    assert http_server.nb_connections <= 3
@@ -0,0 +1,43 @@
+import time
+
+import numpy as np
+import pytest
+
+from src.instrumentation import Instrumentation, MemorySink, get_rss_bytes
+
+
+pytestmark = pytest.mark.skipif(get_rss_bytes() is None, reason="the resident set size can't be measured")
+
+
+def allocate_and_free(nb_bytes):
+    values = np.ones(nb_bytes // 8)
+    time.sleep(0.1)
+    del values
+
+
+def test_peak_memory_inside_a_stage_is_measured():
+    sink = MemorySink()
+    instrumentation = Instrumentation([sink], rss_interval=0.01)
+
+    profile = instrumentation.start()
+    with profile.stage('allocate'):
+        allocate_and_free(200 * 2**20)
+    with profile.stage('idle'):
+        time.sleep(0.05)
+    instrumentation.finish(profile)
+
+    measures = sink.profiles[-1]
+    rss = get_rss_bytes()
+    # the memory was given back to the system before the end of the stage
+    assert rss < measures['stages_peak_rss_bytes']['allocate'] - 150 * 2**20
+    assert measures['peak_rss_bytes'] == measures['stages_peak_rss_bytes']['allocate']
+    assert measures['stages_peak_rss_bytes']['idle'] < measures['stages_peak_rss_bytes']['allocate'] - 150 * 2**20
+
+
+def test_sampling_stops_when_the_run_is_finished():
+    instrumentation = Instrumentation([], rss_interval=0.01)
+
+    profile = instrumentation.start()
+    instrumentation.finish(profile)
+
+    assert not profile.sampler.is_alive()
@@ -0,0 +1,178 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+import src.model
+from benchmarks.bench_retrieval import HashingEmbeddings
+from src.answer_cache import AnswerCache
+from src.embedding_cache import EmbeddingCache
+from src.model import Model
+
+
+class CountingEmbeddings(HashingEmbeddings):
+    """
+    The offline hashing embeddings, counting the embedded documents.
+    """
+    def __init__(self):
+        super().__init__()
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded += texts
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    data_dir = tmp_path / "data"
+    data_dir.mkdir()
+    for file_name, nb_rows in [("skills.csv", 30), ("talismans.csv", 20)]:
+        pd.read_csv(os.path.join("src/data", file_name)).head(nb_rows).to_csv(data_dir / file_name, index=False)
+    return data_dir
+
+
+def make_model(tmp_path, embeddings, embedding_model="hashing", **kwargs):
+    kwargs = {'answer_cache': AnswerCache(db_path=None), 'use_router': False, **kwargs}
+    return Model(api_key="offline", embedding_model=embedding_model, embeddings=embeddings,
+                 index_dir=str(tmp_path / "faiss"), embedding_cache=EmbeddingCache(str(tmp_path / "embeddings.sqlite")),
+                 **kwargs)
+
+
+def get_vectors(db_faiss):
+    """
+    Returns:
+        dict: Content and vector of every document of the index, by document ID.
+    """
+    return {doc_id: (db_faiss.docstore.search(doc_id).page_content, db_faiss.index.reconstruct(i).tolist())
+            for i, doc_id in db_faiss.index_to_docstore_id.items()}
+
+
+def test_saved_index_is_reused_when_the_data_is_unchanged(tmp_path, data_dir):
+    make_model(tmp_path, HashingEmbeddings()).load_or_create_database(str(data_dir))
+    embeddings = CountingEmbeddings()
+    model = make_model(tmp_path, embeddings)
+
+    db_faiss = model.load_or_create_database(str(data_dir))
+
+    assert model.last_index_update == {'mode': 'loaded', 'added': 0, 'removed': 0}
+    assert embeddings.embedded == []
+    assert db_faiss.index.ntotal == 50
+
+
+def test_index_is_updated_when_the_data_changes(tmp_path, data_dir):
+    make_model(tmp_path, HashingEmbeddings()).load_or_create_database(str(data_dir))
+    df_skills = pd.read_csv(data_dir / "skills.csv")
+    df_skills.loc[3, 'Effect'] = "A changed effect."
+    df_skills.drop(index=5).to_csv(data_dir / "skills.csv", index=False)
+    embeddings = CountingEmbeddings()
+    model = make_model(tmp_path, embeddings)
+
+    db_faiss = model.load_or_create_database(str(data_dir))
+
+    assert model.last_index_update == {'mode': 'updated', 'added': 1, 'removed': 2}
+    assert embeddings.embedded == [chunk.page_content for chunk in model.prepare_csv(str(data_dir))
+                                   if "A changed effect." in chunk.page_content]
+    assert db_faiss.index.ntotal == 49
+
+
+def test_index_is_rebuilt_when_the_embedding_model_changes(tmp_path, data_dir):
+    make_model(tmp_path, HashingEmbeddings()).load_or_create_database(str(data_dir))
+    embeddings = CountingEmbeddings()
+    model = make_model(tmp_path, embeddings, embedding_model="other-hashing")
+
+    model.load_or_create_database(str(data_dir))
+
+    assert model.last_index_update == {'mode': 'created', 'added': 50, 'removed': 0}
+    assert len(embeddings.embedded) == 50
+
+
+def test_updated_index_equals_a_full_rebuild(tmp_path, data_dir):
+    make_model(tmp_path, HashingEmbeddings()).load_or_create_database(str(data_dir))
+    df_skills = pd.read_csv(data_dir / "skills.csv")
+    df_skills.loc[0, 'Effect'] = "A changed effect."
+    pd.concat([df_skills.drop(index=[7, 8]), df_skills.iloc[[1]]]).to_csv(data_dir / "skills.csv", index=False)
+    model = make_model(tmp_path, HashingEmbeddings())
+
+    db_faiss = model.load_or_create_database(str(data_dir))
+    rebuilt_db_faiss = model.create_database(model.prepare_csv(str(data_dir)))
+
+    assert model.last_index_update['mode'] == 'updated'
+    assert get_vectors(db_faiss) == get_vectors(rebuilt_db_faiss)
+    query = np.array(HashingEmbeddings().embed_query("attack power after an evade"), dtype=np.float32)
+    assert ([doc.page_content for doc in db_faiss.similarity_search_by_vector(query, k=10)]
+            == [doc.page_content for doc in rebuilt_db_faiss.similarity_search_by_vector(query, k=10)])
+
+
+ANSWER = "The Rathalos is weak to dragon, my young hunter."
+
+
+class StandInChat(FakeListChatModel):
+    """
+    A stand-in chat model streaming the same answer character by character, counting the streamed prompts.
+    """
+    responses: list = [ANSWER]
+    nb_streams: int = 0
+
+    def stream(self, *args, **kwargs):
+        self.nb_streams += 1
+        return super().stream(*args, **kwargs)
+
+
+@pytest.fixture
+def chat_clients(monkeypatch):
+    """
+    Replaces the default chat client by stand-ins, returning the created ones.
+    """
+    chat_clients = []
+
+    def create_chat_client(**kwargs):
+        chat_clients.append(StandInChat())
+        return chat_clients[-1]
+
+    monkeypatch.setattr(src.model, "ChatOpenAI", create_chat_client)
+    return chat_clients
+
+
+def test_streamed_pieces_make_the_answer(tmp_path, data_dir):
+    model = make_model(tmp_path, HashingEmbeddings(), llm=StandInChat())
+    db_faiss = model.load_or_create_database(str(data_dir))
+
+    pieces = list(model.rag_stream(db_faiss, "What is the Rathalos weak to?"))
+
+    assert len(pieces) > 1
+    assert "".join(pieces) == ANSWER
+    assert model.last_answer_latency['cache_hit'] is False
+
+
+def test_chat_client_is_created_on_first_use(tmp_path, data_dir, chat_clients):
+    model = make_model(tmp_path, HashingEmbeddings())
+    db_faiss = model.load_or_create_database(str(data_dir))
+    assert chat_clients == []
+
+    model.rag(db_faiss, "What is the Rathalos weak to?")
+    model.rag(db_faiss, "What does Attack Boost do?")
+
+    assert len(chat_clients) == 1
+    assert chat_clients[0].nb_streams == 2
+
+
+def test_answer_is_cached_once_streamed(tmp_path, data_dir):
+    llm = StandInChat()
+    model = make_model(tmp_path, HashingEmbeddings(), llm=llm,
+                       answer_cache=AnswerCache(str(tmp_path / "answers.sqlite")))
+    db_faiss = model.load_or_create_database(str(data_dir))
+
+    # a stream stopped midway isn't cached
+    stream = model.rag_stream(db_faiss, "What is the Rathalos weak to?")
+    next(stream)
+    stream.close()
+    assert "".join(model.rag_stream(db_faiss, "What is the Rathalos weak to?")) == ANSWER
+    assert llm.nb_streams == 2
+
+    assert list(model.rag_stream(db_faiss, "What is the Rathalos weak to?")) == [ANSWER]
+    assert llm.nb_streams == 2
+    assert model.last_answer_latency['cache_hit'] is True
+    assert model.answer_cache.stats()['exact_hits'] == 1
@@ -0,0 +1,41 @@
+import pytest
+
+from benchmarks.bench_table_extraction import make_page
+from src.scraper import TableParser
+
+
+PAGE = (
+    "<html><body><p>Decorations</p>"
+    "<table><thead><tr><th>Name</th><th>Slots</th></tr></thead><tbody>"
+    '<tr><td><a href="/1">Hello world again</a></td><td> Lv 2 </td></tr>'
+    "<tr><td>a &amp; b</td><td>Lv<!-- comment -->1</td></tr>"
+    "<tr><td>Nested<table><tr><td>inner cell</td></tr></table></td><td>&#9312; slot</td></tr>"
+    "</tbody></table></body></html>"
+)
+
+
+def parse(html, chunk_size):
+    parser = TableParser("Slots")
+    parser.chunk_size = chunk_size
+    return parser.parse(html)
+
+
+def test_parse_returns_the_table_texts():
+    table = parse(PAGE, len(PAGE))
+
+    assert table['columns'] == ["Name", "Slots"]
+    assert table['body_rows'] == [["Hello world again", "Lv 2"], ["a & b", "Lv1"],
+                                  ["Nestedinner cell", "inner cell", "① slot"], ["inner cell"]]
+    assert table['body_links'] == ["/1", None, None, None]
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 16, 64])
+def test_parse_doesnt_depend_on_chunks(chunk_size):
+    assert parse(PAGE, chunk_size) == parse(PAGE, len(PAGE))
+
+
+@pytest.mark.parametrize('chunk_size', [5, 97, 1024])
+def test_parse_doesnt_depend_on_chunks_of_a_game8_page(chunk_size):
+    html = make_page(50, "Slots")
+
+    assert parse(html, chunk_size) == parse(html, len(html))
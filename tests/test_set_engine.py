@@ -0,0 +1,43 @@
+import pandas as pd
+import pytest
+
+import src.set_engine
+from src.set_engine import SetEngine
+from src.set_maker import SetMaker
+
+
+@pytest.fixture(scope="module")
+def set_maker():
+    return SetMaker()
+
+
+def make_set_engine(set_maker, nb_armors_by_type=None):
+    necessary_skills = ['Agitator', 'Weakness Exploit']
+    df_armors, df_talismans = set_maker.filter_relevant_armors_and_talismans(
+        necessary_skills, set_maker.df_scored_armors, set_maker.df_talismans)
+    df_armors = pd.concat([df_armors, set_maker.get_best_armor_for_each_type(set_maker.df_scored_armors, 'defense')])
+    if nb_armors_by_type is not None:
+        df_armors = df_armors.groupby('Armor_type').head(nb_armors_by_type)
+    return SetEngine(df_armors, df_talismans, set_maker.df_skills, necessary_skills, set_maker.defense_rules,
+                     'defense', decoration_fitter=set_maker.decoration_fitter)
+
+
+def test_small_searches_stay_in_the_calling_process(set_maker, monkeypatch):
+    def get_pool(max_workers):
+        raise AssertionError("no worker pool expected")
+
+    monkeypatch.setattr(src.set_engine, "_get_pool", get_pool)
+    set_engine = make_set_engine(set_maker, nb_armors_by_type=3)
+
+    assert set_engine.n_combinations < SetEngine.parallel_min_combinations
+    assert list(set_engine.parallel_search(k=3, max_workers=2)) == list(set_engine.exhaustive_search(k=3))
+
+
+def test_workers_are_shared_by_searches_and_give_the_serial_result(set_maker):
+    set_engine = make_set_engine(set_maker)
+    expected = list(set_engine.exhaustive_search(k=3))
+
+    assert list(set_engine.parallel_search(k=3, max_workers=2, nb_shard_cats=1, min_combinations=0)) == expected
+    pool = src.set_engine._pools[2]
+    assert list(set_engine.parallel_search(k=3, max_workers=2, nb_shard_cats=2, min_combinations=0)) == expected
+    assert src.set_engine._pools[2] is pool
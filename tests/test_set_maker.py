@@ -0,0 +1,41 @@
+import pandas as pd
+import pytest
+
+from src.set_maker import SetMaker
+
+
+@pytest.fixture(scope="module")
+def set_maker():
+    return SetMaker()
+
+
+def test_memory_limit_makes_smaller_streaming_batches_with_the_same_result(set_maker, monkeypatch):
+    necessary_skills = ['Agitator', 'Weakness Exploit']
+    df_armors, df_talismans = set_maker.filter_relevant_armors_and_talismans(
+        necessary_skills, set_maker.df_scored_armors, set_maker.df_talismans)
+    df_armors = pd.concat([df_armors, set_maker.get_best_armor_for_each_type(set_maker.df_scored_armors, 'defense')])
+    # 3 pieces of each type and 2 talismans, 486 sets
+    df_armors = df_armors.groupby('Armor_type').head(3)
+    df_talismans = df_talismans.head(2)
+    batch_sizes = []
+    add_batch_to_best_sets = set_maker._add_batch_to_best_sets
+
+    def record_batch_size(df_armor_sets, *args):
+        batch_sizes.append(len(df_armor_sets))
+        return add_batch_to_best_sets(df_armor_sets, *args)
+
+    monkeypatch.setattr(set_maker, '_add_batch_to_best_sets', record_batch_size)
+
+    best_sets = set_maker.make_best_sets_streaming(df_armors, df_talismans, necessary_skills, k=3)
+    assert batch_sizes == [486]
+    batch_sizes.clear()
+    limited_best_sets = set_maker.make_best_sets_streaming(df_armors, df_talismans, necessary_skills, k=3,
+                                                           memory_limit_mb=1)
+
+    # the first batch is measured, the next ones are sized from it
+    assert batch_sizes[0] == 100
+    assert 1 < batch_sizes[1] < 100
+    assert set(batch_sizes[1:-1]) == {batch_sizes[1]}
+    assert sum(batch_sizes) == 486
+    assert len(best_sets) == 3
+    pd.testing.assert_frame_equal(limited_best_sets, best_sets)
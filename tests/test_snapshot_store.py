@@ -0,0 +1,37 @@
+import os
+import threading
+
+from src.snapshot_store import SnapshotStore
+
+
+def test_concurrent_publications_swap_the_pointer_atomically(tmp_path):
+    bundled_dir = tmp_path / "data"
+    bundled_dir.mkdir()
+    for file_name in SnapshotStore.file_names.values():
+        (bundled_dir / file_name).write_text("Name\nvalue\n")
+    store = SnapshotStore(str(tmp_path / "snapshots"), str(bundled_dir), keep=100)
+    os.makedirs(store.root_dir)
+    barrier = threading.Barrier(8)
+    versions, errors = [], []
+
+    def publish():
+        try:
+            for i in range(10):
+                snapshot_dir = store.create()
+                barrier.wait()
+                versions.append(store.publish(snapshot_dir))
+        except Exception as e:
+            errors.append(e)
+            barrier.abort()
+
+    threads = [threading.Thread(target=publish) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert store.get_current_version() in versions
+    # no temporary pointer file is left behind
+    files = [name for name in os.listdir(store.root_dir) if not os.path.isdir(os.path.join(store.root_dir, name))]
+    assert files == ["CURRENT"]